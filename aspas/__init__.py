@@ -0,0 +1,72 @@
+# ASPAS engine package
+# Headless inventory, sales, vendor and audit services shared by the Tkinter
+# GUI (test.py) and any script or service that needs to drive the shop.
+
+from .errors import (
+    ASPASError,
+    ValidationError,
+    PartNotFoundError,
+    InsufficientStockError,
+    AuthenticationError,
+    JobCancelled,
+    InventoryImportError,
+    VendorNotFoundError,
+    PurchaseOrderNotFoundError,
+)
+from .events import (
+    subscribe,
+    unsubscribe,
+    emit,
+    INVENTORY_CHANGED,
+    SALES_CHANGED,
+    VENDORS_CHANGED,
+    PURCHASE_ORDERS_CHANGED,
+)
+from .db import connect, get_connection, setup_database
+from .session import current_user, set_current_user, authenticate
+from .audit import (
+    add_audit_log,
+    insert_audit_logs,
+    start_audit_sink,
+    stop_audit_sink,
+    flush_audit_log,
+    audit_filter_values,
+)
+from .archive import apply_audit_retention, archive_audit_month, restore_audit_archive
+from .engine import (
+    add_inventory,
+    delete_inventory,
+    get_part,
+    list_inventory,
+    search_inventory,
+    list_in_stock_parts,
+    add_vendor,
+    list_vendors,
+    set_vendor_part,
+    remove_vendor_part,
+    list_sales,
+    record_sale,
+    record_sales_batch,
+    record_customer_sale,
+    record_sales_group,
+    check_and_auto_order,
+)
+from .forecast import refresh_demand, part_demand, use_demand_reorder_point
+from .imports import import_inventory_csv
+from .jobs import JobExecutor, UIDispatcher
+from .purchasing import (
+    PO_STATUSES,
+    list_purchase_orders,
+    purchase_order_lines,
+    send_purchase_order,
+    receive_purchase_order,
+    cancel_purchase_order,
+)
+from .reorder import (
+    DEFAULT_REORDER_RATIO,
+    set_reorder_threshold,
+    pending_reorders,
+    apply_reorders,
+)
+from .search import search_parts
+from .suppliers import best_vendor, best_vendors, part_vendors, vendor_parts
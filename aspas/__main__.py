@@ -0,0 +1,222 @@
+# ASPAS command line
+# python -m aspas [--db PATH] <command> ...
+
+import argparse
+import sys
+
+from . import db
+from .archive import ARCHIVE_DIR, RETENTION_MONTHS, apply_audit_retention, restore_audit_archive
+from .audit import add_audit_log
+from .errors import ASPASError, InventoryImportError
+from .exports import export_audit_log, export_weekly_demand
+from .forecast import refresh_demand
+from .imports import import_inventory_csv
+from .purchasing import (PO_STATUSES, cancel_purchase_order, list_purchase_orders, receive_purchase_order,
+                         send_purchase_order)
+from .reports import REPORT_DIR, REPORT_KINDS, report_keys, write_reports_parallel
+from .rollups import rebuild_rollups
+from .search import rebuild_search_index, vacuum_database
+
+
+# Migrate command
+def _cmd_migrate(args):
+    db.setup_database()
+    print("Schema is up to date.")
+
+
+# Rebuild rollups command
+def _cmd_rebuild_rollups(args):
+    for table, count in rebuild_rollups().items():
+        print(f"{table}: {count} rows")
+
+
+# Rebuild search command
+def _cmd_rebuild_search(args):
+    if rebuild_search_index() and rebuild_search_index(name="audit_log_search"):
+        print("Part and audit log search indexes rebuilt.")
+    else:
+        print("This SQLite has no FTS5; part and audit log search use a plain scan.")
+
+
+# Vacuum command
+def _cmd_vacuum(args):
+    vacuum_database()
+    print("Database compacted and search indexes rebuilt.")
+
+
+# Progress function
+def _progress(done, total):
+    print(f"\r{done} of {total} rows" if total else f"\r{done} rows", end="", file=sys.stderr)
+
+
+# Export audit command
+def _cmd_export_audit(args):
+    count = export_audit_log(args.output, args.action, args.user, args.date, args.gzip or None, _progress,
+                             args.start, args.end, args.search)
+    print(file=sys.stderr)
+    add_audit_log("EXPORT_AUDIT_LOG", f"Exported audit logs to CSV: {args.output} (command line)")
+    print(f"{count} audit log entries written to {args.output}")
+
+
+# Export weekly demand command
+def _cmd_export_weekly_demand(args):
+    count = export_weekly_demand(args.output, args.start, args.end, args.part, args.gzip or None, _progress)
+    print(file=sys.stderr)
+    add_audit_log("EXPORT_WEEKLY_DEMAND", f"Exported weekly demand report to CSV: {args.output} (command line)")
+    print(f"{count} weekly demand rows written to {args.output}")
+
+
+# Archive audit command
+def _cmd_archive_audit(args):
+    archived = apply_audit_retention(args.keep_months, args.dir)
+    for month, count, path in archived:
+        print(f"{month}: {count} entries moved to {path}")
+    if not archived:
+        print(f"Nothing older than the last {args.keep_months} months to archive.")
+
+
+# Restore audit command
+def _cmd_restore_audit(args):
+    for path in args.files:
+        count = restore_audit_archive(path)
+        add_audit_log("RESTORE_AUDIT_LOG", f"Restored {count} audit log entries from {path} (command line)")
+        print(f"{path}: {count} entries restored")
+
+
+# Import inventory command
+def _cmd_import_inventory(args):
+    try:
+        result = import_inventory_csv(args.file, args.replace_stock, args.skip_invalid, progress=_progress)
+    except InventoryImportError as e:
+        print(file=sys.stderr)
+        sys.exit(str(e))
+    print(file=sys.stderr)
+    for line, message in result['errors']:
+        print(f"Line {line}: {message} (skipped)", file=sys.stderr)
+    print(f"{result['rows']} lines imported: {result['added']} parts added, {result['updated']} updated.")
+
+
+# Forecast command
+def _cmd_forecast(args):
+    result = refresh_demand(args.full)
+    if result is None:
+        print("Demand forecasts are already up to date.")
+        return
+    print(f"{result['parts']} parts forecast ({'full' if result['full'] else 'incremental'}): "
+          f"{result['reorder_points_changed']} reorder points changed, {result['queued']} parts queued for reorder.")
+
+
+# Purchase orders command
+def _cmd_purchase_orders(args):
+    if args.action == "list":
+        for po_id, _, vendor_name, status, lines, units, cost, created_at, _, _ in list_purchase_orders(args.status):
+            print(f"{po_id}  {status:<9}  {vendor_name or '(no vendor)':<30}  {lines} lines, {units} units, "
+                  f"{cost:.2f}  {created_at[:16].replace('T', ' ')}")
+        return
+    if not args.orders:
+        sys.exit(f"Give the purchase orders to {args.action}.")
+    action, done = {"send": (send_purchase_order, "sent"), "receive": (receive_purchase_order, "received"),
+                    "cancel": (cancel_purchase_order, "cancelled")}[args.action]
+    for po_id in args.orders:
+        try:
+            result = action(po_id)
+        except ASPASError as e:
+            print(e, file=sys.stderr)
+            continue
+        print(f"{po_id} {done}" + (f": stock added for {len(result)} parts" if result else ""))
+
+
+# Report command
+def _cmd_report(args):
+    keys = report_keys(args.kind) if args.all or args.kind == "monthly" else args.keys
+    if not keys:
+        sys.exit(f"Give one or more {args.kind} keys, or --all.")
+    written = 0
+    for kind, key, filename in write_reports_parallel([(args.kind, key) for key in keys], args.workers,
+                                                      args.dir):
+        if filename:
+            written += 1
+            print(filename)
+        else:
+            print(f"{kind} {key}: no sales, nothing written", file=sys.stderr)
+    add_audit_log("EXPORT_PDF", f"Exported {written} {args.kind} sales report(s) as PDF to {args.dir} "
+                                f"(command line)")
+
+
+# Main function
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m aspas", description="ASPAS maintenance commands")
+    parser.add_argument("--db", default=db.DB_NAME, help="database file (default: %(default)s)")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    commands.add_parser("migrate", help="apply pending schema migrations").set_defaults(func=_cmd_migrate)
+    commands.add_parser("rebuild-rollups", help="recompute the sales rollup tables from sales"
+                        ).set_defaults(func=_cmd_rebuild_rollups)
+    commands.add_parser("rebuild-search", help="re-index every part and audit entry for search"
+                        ).set_defaults(func=_cmd_rebuild_search)
+    commands.add_parser("vacuum", help="compact the database (use this, not a bare VACUUM: it also rebuilds "
+                                       "the search indexes)").set_defaults(func=_cmd_vacuum)
+
+    export = commands.add_parser("export-audit", help="stream the audit log to CSV")
+    export.add_argument("output", help="CSV file to write (.gz for gzip)")
+    export.add_argument("--action", help="only this action type")
+    export.add_argument("--user", help="only this username")
+    export.add_argument("--date", help="timestamp prefix: YYYY, YYYY-MM or YYYY-MM-DD")
+    export.add_argument("--from", dest="start", help="from this time on: YYYY-MM-DD[THH:MM...]")
+    export.add_argument("--to", dest="end", help="up to and including this day (or month, year)")
+    export.add_argument("--search", help="words that must appear in the details")
+    export.add_argument("--gzip", action="store_true", help="compress even without a .gz name")
+    export.set_defaults(func=_cmd_export_audit)
+
+    export = commands.add_parser("export-weekly-demand", help="stream the weekly demand report to CSV")
+    export.add_argument("output", help="CSV file to write (.gz for gzip)")
+    export.add_argument("--start", help="first day, YYYY-MM-DD")
+    export.add_argument("--end", help="last day, YYYY-MM-DD")
+    export.add_argument("--part", help="only this part ID")
+    export.add_argument("--gzip", action="store_true", help="compress even without a .gz name")
+    export.set_defaults(func=_cmd_export_weekly_demand)
+
+    archive = commands.add_parser("archive-audit", help="move old months of the audit log to archive files")
+    archive.add_argument("--keep-months", type=int, default=RETENTION_MONTHS,
+                         help="months kept in the database, including this one (default: %(default)s)")
+    archive.add_argument("--dir", default=ARCHIVE_DIR, help="archive directory (default: %(default)s)")
+    archive.set_defaults(func=_cmd_archive_audit)
+
+    restore = commands.add_parser("restore-audit", help="load audit log archive files back into the database")
+    restore.add_argument("files", nargs="+", help="archive files (.csv.gz)")
+    restore.set_defaults(func=_cmd_restore_audit)
+
+    forecast = commands.add_parser("forecast", help="update demand forecasts and reorder points (run nightly)")
+    forecast.add_argument("--full", action="store_true", help="recompute from the whole window, not just new days")
+    forecast.set_defaults(func=_cmd_forecast)
+
+    importer = commands.add_parser("import-inventory", help="add or update parts from a supplier CSV")
+    importer.add_argument("file", help="CSV with part name, manufacturer, vehicle type, stock and price columns")
+    importer.add_argument("--replace-stock", action="store_true",
+                          help="set stock to the file's figures instead of adding them")
+    importer.add_argument("--skip-invalid", action="store_true",
+                          help="import the valid lines even if some are invalid")
+    importer.set_defaults(func=_cmd_import_inventory)
+
+    orders = commands.add_parser("purchase-orders", help="list, send, receive or cancel purchase orders")
+    orders.add_argument("action", choices=("list", "send", "receive", "cancel"))
+    orders.add_argument("orders", nargs="*", help="purchase order IDs")
+    orders.add_argument("--status", choices=PO_STATUSES, help="list only orders in this state")
+    orders.set_defaults(func=_cmd_purchase_orders)
+
+    report = commands.add_parser("report", help="write PDF sales reports")
+    report.add_argument("kind", choices=REPORT_KINDS)
+    report.add_argument("keys", nargs="*", help="part IDs, vendor IDs or days (YYYY-MM-DD)")
+    report.add_argument("--all", action="store_true", help="one report for every part, vendor or day")
+    report.add_argument("--workers", type=int, help="worker processes (default: one per CPU)")
+    report.add_argument("--dir", default=REPORT_DIR, help="output directory (default: %(default)s)")
+    report.set_defaults(func=_cmd_report)
+
+    args = parser.parse_args(argv)
+    db.connect(args.db)
+    db.setup_database()
+    args.func(args)
+
+
+if __name__ == '__main__':
+    main()
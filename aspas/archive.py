@@ -0,0 +1,127 @@
+# Audit log retention and archive
+# audit_log holds the recent months; older ones are moved out one calendar
+# month at a time into gzipped CSV files in ARCHIVE_DIR:
+#
+#   audit_archive/audit_log_2024-03.csv.gz
+#
+# Each file is one month's partition of the log, in the same format as the
+# audit log export, so it can be read with any CSV tool or loaded back with
+# restore_audit_archive. A month is deleted from the database only after its
+# file is completely written, and only if the rows deleted are exactly the
+# rows written. apply_audit_retention archives every month older than the
+# months to keep; run it from the command line (python -m aspas archive-audit)
+# e.g. nightly.
+
+import csv
+import gzip
+import os
+from datetime import date
+
+from . import db
+from .audit import FLUSH_TIMEOUT, add_audit_log, flush_audit_log, prune_audit_filter_values
+from .exports import export_audit_log
+
+
+ARCHIVE_DIR = "audit_archive"
+RETENTION_MONTHS = 12
+RESTORE_CHUNK_SIZE = 5000
+
+
+# Audit months function
+# The months (YYYY-MM) that have audit entries, oldest first, up to but not
+# including before. Jumps from month to month on the timestamp index instead
+# of reading every row.
+def audit_months(conn=None, before=None):
+    conn = conn or db.get_connection()
+    months = []
+    month = conn.execute("SELECT substr(MIN(timestamp), 1, 7) FROM audit_log").fetchone()[0]
+    while month and (before is None or month < before):
+        months.append(month)
+        month = conn.execute("SELECT substr(MIN(timestamp), 1, 7) FROM audit_log WHERE timestamp >= ?",
+                             (db.prefix_range(month)[1],)).fetchone()[0]
+    return months
+
+
+# Cutoff month function
+# The oldest month retention keeps: the current month and keep_months - 1
+# before it.
+def _cutoff_month(keep_months, today=None):
+    today = today or date.today()
+    months = today.year * 12 + today.month - 1 - (keep_months - 1)
+    return f"{months // 12:04d}-{months % 12 + 1:02d}"
+
+
+# Archive path function
+# A month archived twice (e.g. restored and archived again) gets a second file.
+def _archive_path(directory, month):
+    os.makedirs(directory, exist_ok=True)
+    n = 0
+    while True:
+        path = os.path.join(directory, f"audit_log_{month}{f'-{n}' if n else ''}.csv.gz")
+        if not os.path.exists(path):
+            return path
+        n += 1
+
+
+# Archive audit month function
+# Moves one month (YYYY-MM) of audit entries to an archive file. Returns
+# (rows moved, path), or (0, None) when the month has no entries.
+def archive_audit_month(month, directory=ARCHIVE_DIR):
+    # Entries still buffered after this stay in the log for a later run
+    flush_audit_log(FLUSH_TIMEOUT)
+    path = _archive_path(directory, month)
+    count = export_audit_log(path, date=month, compress=True)
+    if not count:
+        os.remove(path)
+        return 0, None
+
+    start, end = db.prefix_range(month)
+    try:
+        with db.write_transaction() as conn:
+            deleted = conn.execute("DELETE FROM audit_log WHERE timestamp >= ? AND timestamp < ?",
+                                   (start, end)).rowcount
+            if deleted != count:
+                raise RuntimeError(f"Audit log for {month} changed while it was archived "
+                                   f"({count} rows written, {deleted} found); nothing was deleted.")
+            prune_audit_filter_values(conn)
+    except BaseException:
+        os.remove(path)
+        raise
+    return count, path
+
+
+# Apply audit retention function
+# Archives every month older than the keep_months most recent ones.
+# Returns [(month, rows moved, path)].
+def apply_audit_retention(keep_months=RETENTION_MONTHS, directory=ARCHIVE_DIR, today=None):
+    if keep_months < 1:
+        raise ValueError("Keep at least the current month.")
+    archived = []
+    for month in audit_months(before=_cutoff_month(keep_months, today)):
+        count, path = archive_audit_month(month, directory)
+        if count:
+            archived.append((month, count, path))
+    if archived:
+        add_audit_log("ARCHIVE_AUDIT_LOG", f"Archived {sum(count for _, count, _ in archived)} audit log entries "
+                                           f"from {archived[0][0]} to {archived[-1][0]} into {directory}")
+    return archived
+
+
+# Restore audit archive function
+# Loads an archive file back into audit_log. Entries already present are
+# skipped. Returns the number of entries added.
+def restore_audit_archive(path):
+    added = 0
+    with gzip.open(path, 'rt', newline='') if path.endswith(".gz") else open(path, newline='') as f:
+        reader = csv.reader(f)
+        next(reader, None)
+        with db.write_transaction() as conn:
+            while True:
+                rows = [row for _, row in zip(range(RESTORE_CHUNK_SIZE), reader)]
+                if not rows:
+                    break
+                added += conn.executemany("""
+                    INSERT OR IGNORE INTO audit_log (id, action_type, action_details, timestamp, username, user_role)
+                    VALUES (?, ?, ?, ?, ?, ?)
+                """, rows).rowcount
+    return added
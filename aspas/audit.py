@@ -0,0 +1,216 @@
+# Audit log writer
+# Audit entries can be written three ways:
+#   insert_audit_logs(conn, ...)  inside the caller's transaction (no commit of its own)
+#   add_audit_log(...)            through the buffered sink when it is running,
+#                                 otherwise as its own INSERT + commit
+# The sink keeps entries in memory and a background thread writes them in
+# batches, when batch_size entries are waiting or every flush_interval seconds.
+# Entries get their ID, timestamp and user when they are logged, not when they
+# are written, so buffering does not change what ends up in the table.
+# A batch that fails to write is retried on the next round, up to max_retries
+# times, and then dropped (reported on stderr), so one bad batch cannot stall
+# the sink or make flush() wait forever.
+#
+# audit_filter_values lists the distinct action types and usernames for the
+# audit viewer's filters. A trigger adds new values as entries are inserted,
+# so opening the viewer never has to scan the log for them.
+
+import atexit
+import sqlite3
+import sys
+import threading
+from datetime import datetime
+
+from . import db
+from .ids import generate_audit_id
+from .session import current_user
+
+
+# Audit row function
+def _audit_row(action_type, action_details, timestamp=None):
+    return (generate_audit_id(), action_type, action_details, timestamp or datetime.now().isoformat(),
+            current_user['username'], current_user['role'])
+
+
+# Write rows function
+def _write_rows(conn, rows):
+    conn.executemany("""
+        INSERT INTO audit_log (id, action_type, action_details, timestamp, username, user_role)
+        VALUES (?, ?, ?, ?, ?, ?)
+    """, rows)
+
+
+# Insert audit logs function
+# Writes the entries with the caller's connection and does not commit, so the
+# rows land in the same transaction as the business write they describe.
+def insert_audit_logs(conn, entries):
+    timestamp = datetime.now().isoformat()
+    rows = [_audit_row(action_type, action_details, timestamp) for action_type, action_details in entries]
+    _write_rows(conn, rows)
+    return [row[0] for row in rows]
+
+
+MAX_RETRIES = 3
+FLUSH_TIMEOUT = 5.0    # seconds callers that must not hang wait for a flush
+
+
+class AuditSink:
+    def __init__(self, batch_size=200, flush_interval=1.0, max_retries=MAX_RETRIES):
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.max_retries = max_retries
+        self._buffer = []
+        self._cond = threading.Condition()
+        self._queued = 0      # entries ever handed to the sink
+        self._done = 0        # entries written (or given up on)
+        self._lost = 0        # entries given up on
+        self._failures = 0    # failed attempts at the batch being retried
+        self._flush_requested = False
+        self._closing = False
+        self._thread = threading.Thread(target=self._run, name="aspas-audit-sink", daemon=True)
+        self._thread.start()
+
+    # Write function
+    def write(self, row):
+        with self._cond:
+            if self._closing:
+                raise RuntimeError("Audit sink is closed.")
+            self._buffer.append(row)
+            self._queued += 1
+            if len(self._buffer) >= self.batch_size:
+                self._cond.notify_all()
+
+    # Flush function
+    # Waits until everything logged so far has been dealt with. Returns True
+    # if it was all written, False on timeout or if entries were dropped.
+    def flush(self, timeout=None):
+        with self._cond:
+            target = self._queued
+            lost = self._lost
+            self._flush_requested = True
+            self._cond.notify_all()
+            self._cond.wait_for(lambda: self._done >= target or not self._thread.is_alive(), timeout)
+            return self._done >= target and self._lost == lost
+
+    # Close function
+    def close(self):
+        with self._cond:
+            self._closing = True
+            self._cond.notify_all()
+        self._thread.join()
+
+    # Run function (writer thread)
+    def _run(self):
+        conn = db.open_connection()
+        try:
+            while True:
+                with self._cond:
+                    self._cond.wait_for(lambda: self._closing or self._flush_requested
+                                        or len(self._buffer) >= self.batch_size, self.flush_interval)
+                    rows, self._buffer = self._buffer, []
+                    self._flush_requested = False
+                    closing = self._closing
+
+                lost = 0
+                if rows:
+                    try:
+                        _write_rows(conn, rows)
+                        conn.commit()
+                        self._failures = 0
+                    except sqlite3.Error as e:
+                        conn.rollback()
+                        self._failures += 1
+                        if not closing and self._failures < self.max_retries:
+                            # Put the batch back and retry on the next round
+                            print(f"Audit log write failed, will retry {len(rows)} entries: {e}", file=sys.stderr)
+                            with self._cond:
+                                self._buffer[:0] = rows
+                            continue
+                        print(f"Audit log write failed {self._failures} times, {len(rows)} entries lost: {e}",
+                              file=sys.stderr)
+                        self._failures = 0
+                        lost = len(rows)
+
+                with self._cond:
+                    self._done += len(rows)
+                    self._lost += lost
+                    self._cond.notify_all()
+                    if closing and not self._buffer:
+                        return
+        finally:
+            conn.close()
+
+
+_sink = None
+
+
+# Start audit sink function
+# An in-memory database cannot be opened from the writer thread, so there the
+# sink is not started and entries keep being written synchronously.
+def start_audit_sink(batch_size=200, flush_interval=1.0):
+    global _sink
+    if _sink is not None:
+        return _sink
+    if db.get_db_name() == ':memory:':
+        return None
+    _sink = AuditSink(batch_size, flush_interval)
+    return _sink
+
+
+# Stop audit sink function
+def stop_audit_sink():
+    global _sink
+    if _sink is not None:
+        _sink.close()
+        _sink = None
+
+
+# Flush audit log function
+# Returns False if buffered entries were not all written within timeout
+# seconds (or were dropped).
+def flush_audit_log(timeout=None):
+    if _sink is not None:
+        return _sink.flush(timeout)
+    return True
+
+
+# Guaranteed flush on interpreter exit
+atexit.register(stop_audit_sink)
+
+
+# Add audit log function
+# With conn the entry joins that connection's open transaction; otherwise it
+# goes to the sink, or is written and committed right away if none is running.
+def add_audit_log(action_type, action_details, conn=None):
+    if conn is not None:
+        return insert_audit_logs(conn, [(action_type, action_details)])[0]
+
+    row = _audit_row(action_type, action_details)
+    if _sink is not None:
+        _sink.write(row)
+    else:
+        conn = db.get_connection()
+        _write_rows(conn, [row])
+        conn.commit()
+    return row[0]
+
+
+# Audit filter values function
+# Returns (action_types, usernames), each sorted.
+def audit_filter_values(conn=None):
+    conn = conn or db.get_connection()
+    values = {'action_type': [], 'username': []}
+    for field, value in conn.execute("SELECT field, value FROM audit_filter_values ORDER BY field, value"):
+        values[field].append(value)
+    return values['action_type'], values['username']
+
+
+# Prune audit filter values function
+# Drops values no entry uses any more (e.g. after old entries were archived).
+# Runs on the caller's connection without committing.
+def prune_audit_filter_values(conn):
+    for field in ('action_type', 'username'):
+        conn.execute(f"""
+            DELETE FROM audit_filter_values
+            WHERE field = ? AND NOT EXISTS (SELECT 1 FROM audit_log WHERE {field} = audit_filter_values.value)
+        """, (field,))
@@ -0,0 +1,426 @@
+# ASPAS benchmarks
+# python -m aspas.bench [--db PATH | --parts N --years N --sales-per-day N]
+#                       [--only NAME ...] [--output results.json] [--compare old.json]
+# Times the hot paths of the shop against a synthetic (or copied) database and
+# writes the timings as JSON so runs from different versions can be compared.
+# Every benchmark reports 'seconds' (best of --repeat unless noted); those
+# that replaced an older query also report 'legacy_seconds' for the old one.
+
+import argparse
+import json
+import os
+import platform
+import random
+import shutil
+import sqlite3
+import subprocess
+import tempfile
+import time
+from datetime import datetime, timedelta
+from itertools import zip_longest
+
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+
+from . import db, engine
+from .datagen import generate
+from .demand import analyze_weekly_demand
+from .errors import InsufficientStockError
+from .forecast import refresh_demand
+from .cache import CACHED_INVENTORY_TABLE
+from .charts import ChartPanel, chart_key, plot_weekly_demand
+from .paging import INVENTORY_TABLE, SALES_TABLE, AuditLogTable
+from .purchasing import receive_purchase_order, send_purchase_order
+from .reports import write_monthly_sales_pdf
+from .search import search_parts
+from .suppliers import best_vendor, best_vendors, parse_part_names
+
+
+# Best of function
+# Runs fn repeat times and returns (best seconds, last result).
+def _best_of(fn, repeat):
+    best, result = None, None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best, result
+
+
+# Percentile function
+def _percentile(samples, pct):
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))]
+
+
+# Middle key function
+def _middle_key(conn, table):
+    count = conn.execute(f"SELECT COUNT(*) FROM {table}").fetchone()[0]
+    row = conn.execute(f"SELECT id FROM {table} ORDER BY id LIMIT 1 OFFSET ?", (count // 2,)).fetchone()
+    return row[0] if row else ""
+
+
+# === READ BENCHMARKS ===
+
+# Inventory refresh benchmark
+# The old refresh read the whole table; the paged view reads one page, from
+# the inventory cache once it is loaded.
+def bench_inventory_refresh(ctx):
+    conn = ctx['conn']
+    middle = _middle_key(conn, "inventory")
+    legacy, rows = _best_of(lambda: conn.execute("SELECT * FROM inventory").fetchall(), ctx['repeat'])
+    uncached, _ = _best_of(lambda: INVENTORY_TABLE.first_page(200), ctx['repeat'])
+    deep, _ = _best_of(lambda: INVENTORY_TABLE.page_after(middle, 200), ctx['repeat'])
+    CACHED_INVENTORY_TABLE.first_page(200)
+    first, _ = _best_of(lambda: CACHED_INVENTORY_TABLE.first_page(200), ctx['repeat'])
+    return {'rows': len(rows), 'legacy_seconds': legacy, 'seconds': first, 'uncached_seconds': uncached,
+            'deep_page_seconds': deep}
+
+
+# Part lookup benchmark
+# 1000 lookups of random parts by ID, as sales and the part dropdown make them.
+def bench_part_lookup(ctx):
+    conn = ctx['conn']
+    rng = random.Random(3)
+    part_ids = [row[0] for row in conn.execute("SELECT id FROM inventory")]
+    sample = [rng.choice(part_ids) for _ in range(1000)]
+    legacy, _ = _best_of(lambda: [conn.execute(
+        "SELECT id, part_name, manufacturer, vehicle_type, stock, price, initial_stock FROM inventory WHERE id = ?",
+        (part_id,)).fetchone() for part_id in sample], ctx['repeat'])
+    engine.get_part(sample[0])
+    seconds, _ = _best_of(lambda: [engine.get_part(part_id) for part_id in sample], ctx['repeat'])
+    return {'lookups': len(sample), 'legacy_seconds': legacy, 'seconds': seconds}
+
+
+# Part search benchmark
+# The sale dropdown: the old rebuild listed every in-stock part; type-ahead
+# asks the search index for the top 50 matches of a short prefix.
+def bench_part_search(ctx):
+    conn = ctx['conn']
+    legacy, rows = _best_of(lambda: [f"{part_id} - {name}" for part_id, name in conn.execute(
+        "SELECT id, part_name FROM inventory WHERE stock > 0")], ctx['repeat'])
+    seconds, _ = _best_of(lambda: search_parts("en", 50), ctx['repeat'])
+    narrow, _ = _best_of(lambda: search_parts("brake pad 1", 50), ctx['repeat'])
+    return {'parts': len(rows), 'legacy_seconds': legacy, 'seconds': seconds, 'narrow_seconds': narrow}
+
+
+# Vendor lookup benchmark
+# 1000 "who supplies this part" lookups: the old way matched the part's name
+# against every vendor's parts text; the catalog reads the part's index
+# entries. all_seconds is the best vendor of every part in one query, as
+# reorders use it.
+def bench_vendor_lookup(ctx):
+    conn = ctx['conn']
+    rng = random.Random(5)
+    parts = conn.execute("SELECT id, part_name FROM inventory").fetchall()
+    sample = [rng.choice(parts) for _ in range(1000)]
+
+    def legacy_lookup():
+        for _, part_name in sample:
+            [vendor_id for vendor_id, text in conn.execute("SELECT id, parts FROM vendors")
+             if part_name.lower() in parse_part_names(text)]
+
+    legacy, _ = _best_of(legacy_lookup, ctx['repeat'])
+    seconds, _ = _best_of(lambda: [best_vendor(part_id, conn) for part_id, _ in sample], ctx['repeat'])
+    every, vendors = _best_of(lambda: best_vendors(conn), ctx['repeat'])
+    return {'lookups': len(sample), 'legacy_seconds': legacy, 'seconds': seconds,
+            'parts_with_vendor': len(vendors), 'all_seconds': every}
+
+
+# Sales refresh benchmark
+def bench_sales_refresh(ctx):
+    conn = ctx['conn']
+    middle = _middle_key(conn, "sales")
+    legacy, rows = _best_of(lambda: conn.execute("""
+        SELECT s.id, s.part_id, s.quantity, i.price as unit_price, s.amount, s.date, s.payment_method
+        FROM sales s
+        JOIN inventory i ON s.part_id = i.id
+    """).fetchall(), ctx['repeat'])
+    first, _ = _best_of(lambda: SALES_TABLE.first_page(200), ctx['repeat'])
+    deep, _ = _best_of(lambda: SALES_TABLE.page_after(middle, 200), ctx['repeat'])
+    return {'rows': len(rows), 'legacy_seconds': legacy, 'seconds': first, 'deep_page_seconds': deep}
+
+
+# Legacy weekly demand function
+# The analysis as test.py used to run it: one grouped query over raw sales,
+# then one daily query per (part, week) row for max/min day.
+def _legacy_weekly_demand(conn, start_date, end_date):
+    weekly_data = conn.execute("""
+        SELECT s.part_id, i.part_name, strftime('%Y-%W', s.date) AS week,
+               SUM(s.quantity) AS total_quantity, ROUND(AVG(s.quantity), 2) AS avg_daily
+        FROM sales s
+        JOIN inventory i ON s.part_id = i.id
+        WHERE s.date >= ? AND s.date < ?
+        GROUP BY s.part_id, week
+        ORDER BY s.part_id, week
+    """, (start_date, db.prefix_range(end_date)[1])).fetchall()
+
+    rows = []
+    previous = {}
+    for part_id, part_name, week, total_qty, avg_daily in weekly_data:
+        week_start = datetime.strptime(f"{week}-1", "%Y-%W-%w").strftime("%Y-%m-%d")
+        week_end = (datetime.strptime(f"{week}-1", "%Y-%W-%w") + timedelta(days=6)).strftime("%Y-%m-%d")
+        daily = [qty for _, qty in conn.execute("""
+            SELECT strftime('%Y-%m-%d', date) AS sale_date, SUM(quantity) AS day_qty
+            FROM sales
+            WHERE part_id = ? AND date >= ? AND date <= ?
+            GROUP BY sale_date
+        """, (part_id, week_start, week_end))]
+        max_day, min_day = (max(daily), min(daily)) if daily else (0, 0)
+        prev = previous.get(part_id)
+        trend = "—" if prev is None or prev == total_qty else ("↑" if total_qty > prev else "↓")
+        previous[part_id] = total_qty
+        rows.append((part_id, part_name, week, total_qty, avg_daily, max_day, min_day, trend))
+    return rows
+
+
+# Weekly demand benchmark
+# The default 4-week window of the weekly demand window.
+def bench_weekly_demand(ctx):
+    conn = ctx['conn']
+    end_date = ctx['end_date']
+    start_date = (datetime.fromisoformat(end_date) - timedelta(days=28)).strftime("%Y-%m-%d")
+    legacy, legacy_rows = _best_of(lambda: _legacy_weekly_demand(conn, start_date, end_date), ctx['repeat'])
+    seconds, rows = _best_of(lambda: analyze_weekly_demand(start_date, end_date), ctx['repeat'])
+    # Weekly totals must agree; max/min can differ where the old per-week
+    # query ignored the date filter or dropped the last day of the week
+    for index, (old, new) in enumerate(zip_longest(legacy_rows, rows)):
+        if old is None or new is None or old[:4] != new[:4]:
+            raise RuntimeError(f"Weekly demand differs from the legacy query at row {index}: "
+                               f"legacy {old and old[:4]}, new {new and new[:4]}")
+    return {'rows': len(rows), 'legacy_seconds': legacy, 'seconds': seconds}
+
+
+# Audit filter benchmark
+# One month of one user's entries of one action type, newest first.
+def bench_audit_filter(ctx):
+    conn = ctx['conn']
+    day = ctx['end_date']
+    base = "SELECT * FROM audit_log WHERE action_type = ? AND username = ?"
+    legacy, _ = _best_of(lambda: conn.execute(
+        base + " AND timestamp LIKE ? ORDER BY timestamp DESC",
+        ("RECORD_SALE", "employee1", f"{day[:7]}%")).fetchall(), ctx['repeat'])
+    seconds, rows = _best_of(lambda: conn.execute(
+        base + " AND timestamp >= ? AND timestamp < ? ORDER BY timestamp DESC",
+        ("RECORD_SALE", "employee1") + db.prefix_range(day[:7])).fetchall(), ctx['repeat'])
+    return {'rows': len(rows), 'legacy_seconds': legacy, 'seconds': seconds}
+
+
+# Audit page benchmark
+# The audit viewer's first and next page, and a details search, against
+# loading the whole log newest first as the viewer used to.
+def bench_audit_page(ctx):
+    conn = ctx['conn']
+    legacy, _ = _best_of(lambda: conn.execute("SELECT * FROM audit_log ORDER BY timestamp DESC").fetchall(),
+                         ctx['repeat'])
+    table = AuditLogTable()
+    seconds, rows = _best_of(lambda: table.page_after(table.first_page(200)[-1][0], 200), ctx['repeat'])
+    search = AuditLogTable(text="sale")
+    search_seconds, _ = _best_of(lambda: search.first_page(200), ctx['repeat'])
+    count_seconds, total = _best_of(table.count, ctx['repeat'])
+    return {'rows': len(rows), 'total': total, 'legacy_seconds': legacy, 'seconds': seconds,
+            'search_seconds': search_seconds, 'count_seconds': count_seconds}
+
+
+# PDF export benchmark
+def bench_pdf_export(ctx):
+    filename = os.path.join(ctx['tmp'], "Monthly_Sales_Report.pdf")
+    seconds, _ = _best_of(lambda: write_monthly_sales_pdf(filename), ctx['repeat'])
+    return {'seconds': seconds, 'bytes': os.path.getsize(filename)}
+
+
+# Weekly demand chart benchmark
+# Showing the weekly demand chart again with the same filters. The old window
+# queried and drew a new figure every time; the panel only checks the rollup
+# version.
+def bench_weekly_chart(ctx):
+    def legacy():
+        panel = ChartPanel(plot_weekly_demand, figsize=(8, 4))
+        FigureCanvasAgg(panel.figure)
+        panel.show(None, analyze_weekly_demand())
+        panel.figure.canvas.draw()
+
+    def show(panel):
+        key = chart_key(None, None, None)
+        data = panel.cached(key)
+        if data is None:
+            data = analyze_weekly_demand()
+        if panel.show(key, data):
+            panel.figure.canvas.draw()
+
+    draw, _ = _best_of(legacy, ctx['repeat'])
+    panel = ChartPanel(plot_weekly_demand, figsize=(8, 4))
+    FigureCanvasAgg(panel.figure)
+    show(panel)
+    seconds, _ = _best_of(lambda: show(panel), ctx['repeat'])
+    return {'legacy_seconds': draw, 'seconds': seconds, 'draws': panel.draws}
+
+
+# === WRITE BENCHMARKS (run last, they change the data) ===
+
+# Check and auto order benchmark
+# Single run: the first check puts every low-stock part on purchase orders.
+# receive_seconds sends and receives all of those orders.
+def bench_check_and_auto_order(ctx):
+    start = time.perf_counter()
+    reordered = engine.check_and_auto_order()
+    seconds = time.perf_counter() - start
+    idle, _ = _best_of(engine.check_and_auto_order, ctx['repeat'])
+    orders = list(dict.fromkeys(r['po_id'] for r in reordered))
+    start = time.perf_counter()
+    for po_id in orders:
+        send_purchase_order(po_id)
+        receive_purchase_order(po_id)
+    received = time.perf_counter() - start
+    return {'seconds': seconds, 'reordered': len(reordered), 'purchase_orders': len(orders),
+            'idle_seconds': idle, 'receive_seconds': received}
+
+
+# Record sale benchmark
+# Per-sale latency over ctx['sales'] single-line sales on random parts. The
+# times are None when no sale could be recorded.
+def bench_record_sale(ctx):
+    rng = random.Random(7)
+    part_ids = [row[0] for row in ctx['conn'].execute("SELECT id FROM inventory")]
+    samples = []
+    for _ in range(ctx['sales'] if part_ids else 0):
+        part_id = rng.choice(part_ids)
+        start = time.perf_counter()
+        try:
+            engine.record_sale(part_id, 1, "Cash")
+        except InsufficientStockError:
+            continue
+        samples.append(time.perf_counter() - start)
+    # No parts, or every pick was out of stock: nothing was timed
+    if not samples:
+        return {'sales': 0, 'seconds': None, 'p50_seconds': None, 'p95_seconds': None}
+    return {'sales': len(samples), 'seconds': sum(samples) / len(samples),
+            'p50_seconds': _percentile(samples, 50), 'p95_seconds': _percentile(samples, 95)}
+
+
+# Demand forecast benchmark
+# A full forecast over the history window, then the next night's incremental
+# refresh. Runs last: it changes reorder points.
+def bench_demand_forecast(ctx):
+    day = datetime.fromisoformat(ctx['end_date']).date()
+    start = time.perf_counter()
+    result = refresh_demand(full=True, today=day)
+    full = time.perf_counter() - start
+    start = time.perf_counter()
+    refresh_demand(today=day + timedelta(days=1))
+    seconds = time.perf_counter() - start
+    return {'parts': result['parts'], 'full_seconds': full, 'seconds': seconds}
+
+
+BENCHMARKS = [
+    ("inventory_refresh", bench_inventory_refresh),
+    ("part_lookup", bench_part_lookup),
+    ("part_search", bench_part_search),
+    ("vendor_lookup", bench_vendor_lookup),
+    ("sales_refresh", bench_sales_refresh),
+    ("weekly_demand", bench_weekly_demand),
+    ("audit_filter", bench_audit_filter),
+    ("audit_page", bench_audit_page),
+    ("pdf_export", bench_pdf_export),
+    ("weekly_chart", bench_weekly_chart),
+    ("check_and_auto_order", bench_check_and_auto_order),
+    ("record_sale", bench_record_sale),
+    ("demand_forecast", bench_demand_forecast),
+]
+
+
+# Git revision function
+def _git_revision():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                              cwd=os.path.dirname(os.path.abspath(__file__)), check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+# Run benchmarks function
+# Works on a copy of source_db when given, otherwise on freshly generated data.
+def run_benchmarks(source_db=None, parts=2000, vendors=50, years=1, sales_per_day=300, repeat=3,
+                   sales=200, only=None):
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "bench.db")
+        if source_db:
+            shutil.copyfile(source_db, path)
+            dataset = {'source': os.path.abspath(source_db)}
+        else:
+            dataset = generate(path, parts=parts, vendors=vendors, years=years, sales_per_day=sales_per_day)
+        conn = db.connect(path)
+        db.setup_database()
+        dataset.update({table: conn.execute(f"SELECT COUNT(*) FROM {table}").fetchone()[0]
+                        for table in ("inventory", "sales", "audit_log")})
+
+        last_sale = conn.execute("SELECT MAX(date) FROM sales").fetchone()[0] or datetime.now().isoformat()
+        ctx = {'conn': conn, 'tmp': tmp, 'repeat': repeat, 'sales': sales, 'end_date': last_sale[:10]}
+
+        results = {}
+        for name, bench in BENCHMARKS:
+            if only and name not in only:
+                continue
+            result = bench(ctx)
+            results[name] = {key: round(value, 6) if isinstance(value, float) else value
+                             for key, value in result.items()}
+        conn.close()
+
+    return {
+        'meta': {
+            'timestamp': datetime.now().isoformat(),
+            'revision': _git_revision(),
+            'python': platform.python_version(),
+            'sqlite': sqlite3.sqlite_version,
+            'repeat': repeat,
+            'dataset': dataset,
+        },
+        'results': results,
+    }
+
+
+# Compare function
+# Prints each benchmark's seconds next to a previous run's.
+def _compare(report, baseline):
+    print(f"{'benchmark':<24}{'before':>12}{'after':>12}{'change':>10}")
+    for name, result in report['results'].items():
+        before = baseline.get('results', {}).get(name, {}).get('seconds')
+        after = result['seconds']
+        if after is None:
+            print(f"{name:<24}{f'{before:.6f}' if before else '-':>12}{'-':>12}{'':>10}")
+        elif before:
+            print(f"{name:<24}{before:>12.6f}{after:>12.6f}{(after - before) / before:>+10.1%}")
+        else:
+            print(f"{name:<24}{'-':>12}{after:>12.6f}{'':>10}")
+
+
+# Main function
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m aspas.bench", description="ASPAS benchmarks")
+    parser.add_argument("--db", help="benchmark a copy of this database instead of generated data")
+    parser.add_argument("--parts", type=int, default=2000)
+    parser.add_argument("--vendors", type=int, default=50)
+    parser.add_argument("--years", type=float, default=1)
+    parser.add_argument("--sales-per-day", type=int, default=300)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--sales", type=int, default=200, help="sales to record in the record_sale benchmark")
+    parser.add_argument("--only", nargs="+", choices=[name for name, _ in BENCHMARKS])
+    parser.add_argument("--output", help="write the JSON report to this file")
+    parser.add_argument("--compare", help="previous JSON report to compare against")
+    args = parser.parse_args(argv)
+
+    report = run_benchmarks(args.db, args.parts, args.vendors, args.years, args.sales_per_day, args.repeat,
+                            args.sales, args.only)
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2)
+    else:
+        print(json.dumps(report, indent=2))
+
+    if args.compare:
+        with open(args.compare) as f:
+            _compare(report, json.load(f))
+
+
+if __name__ == '__main__':
+    main()
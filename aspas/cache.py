@@ -0,0 +1,209 @@
+# In-process inventory cache
+# The inventory table is small and read constantly (sale lookups, the part
+# dropdown, the inventory tab), so the main connection keeps a copy of it as
+# compact PartRecord objects keyed by part ID.
+#
+# Reads through the main connection are served from the cache. Writes made
+# through it update the cache after they commit (write-through), so they
+# never force a reload. Anything else that changes the database file bumps
+# the connection's PRAGMA data_version: another counter, the API server, a
+# worker thread's own connection, even the audit sink. The next read then
+# reloads the table. Other connections (job workers, the read pool) are not
+# cached and read SQLite directly.
+
+import bisect
+import threading
+
+from . import db
+from .paging import INVENTORY_TABLE
+
+
+PART_COLUMNS = ("id", "part_name", "manufacturer", "vehicle_type", "stock", "price", "initial_stock",
+                "reorder_point")
+
+
+class PartRecord:
+    __slots__ = PART_COLUMNS
+
+    def __init__(self, id, part_name, manufacturer, vehicle_type, stock, price, initial_stock, reorder_point):
+        self.id = id
+        self.part_name = part_name
+        self.manufacturer = manufacturer
+        self.vehicle_type = vehicle_type
+        self.stock = stock
+        self.price = price
+        self.initial_stock = initial_stock
+        self.reorder_point = reorder_point
+
+    # Row function
+    # The columns get_part / list_inventory return.
+    def row(self):
+        return (self.id, self.part_name, self.manufacturer, self.vehicle_type, self.stock, self.price,
+                self.initial_stock)
+
+    # Display row function
+    # The columns of the inventory tab (paging.INVENTORY_TABLE).
+    def display_row(self):
+        return (self.id, self.part_name, self.manufacturer, self.vehicle_type, self.stock, self.price)
+
+
+class InventoryCache:
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._conn = None
+        self._version = None
+        self._parts = {}
+        self._ids = []      # sorted, for keyset pages
+        self.loads = 0
+
+    # Usable function (caller holds the lock)
+    # True when conn is the main connection and the cache matches the database,
+    # reloading it first if something else has changed the file.
+    def _usable(self, conn):
+        if conn is not db.main_connection():
+            return False
+        version = conn.execute("PRAGMA data_version").fetchone()[0]
+        if conn is not self._conn or version != self._version:
+            rows = conn.execute(f"SELECT {', '.join(PART_COLUMNS)} FROM inventory ORDER BY id").fetchall()
+            self._parts = {row[0]: PartRecord(*row) for row in rows}
+            self._ids = [row[0] for row in rows]
+            self._conn = conn
+            self._version = version
+            self.loads += 1
+        return True
+
+    # Tracking function (caller holds the lock)
+    # Write-through only applies to writes made through the cached connection.
+    def _tracking(self, conn):
+        return conn is self._conn and conn is db.main_connection()
+
+    # === READS ===
+    # Each returns None when conn is not cached; the caller then queries SQLite.
+
+    # Lookup function
+    # Returns {part_id: PartRecord} for the part_ids that exist.
+    def lookup(self, conn, part_ids):
+        with self._lock:
+            if not self._usable(conn):
+                return None
+            return {part_id: self._parts[part_id] for part_id in part_ids if part_id in self._parts}
+
+    # Parts function
+    # Every PartRecord in part ID order.
+    def parts(self, conn):
+        with self._lock:
+            if not self._usable(conn):
+                return None
+            return [self._parts[part_id] for part_id in self._ids]
+
+    # Page function
+    # Up to limit records after (or, with before=True, ending before) key.
+    def page(self, conn, key, limit, before=False):
+        with self._lock:
+            if not self._usable(conn):
+                return None
+            if key is None:
+                ids = self._ids[:limit]
+            elif before:
+                end = bisect.bisect_left(self._ids, key)
+                ids = self._ids[max(0, end - limit):end]
+            else:
+                start = bisect.bisect_right(self._ids, key)
+                ids = self._ids[start:start + limit]
+            return [self._parts[part_id] for part_id in ids]
+
+    # === WRITE-THROUGH (call after the write has committed) ===
+
+    # Put function
+    def put(self, conn, record):
+        with self._lock:
+            if self._tracking(conn):
+                if record.id not in self._parts:
+                    bisect.insort(self._ids, record.id)
+                self._parts[record.id] = record
+
+    # Remove function
+    def remove(self, conn, part_id):
+        with self._lock:
+            if self._tracking(conn) and self._parts.pop(part_id, None) is not None:
+                del self._ids[bisect.bisect_left(self._ids, part_id)]
+
+    # Adjust stock function
+    # changes is {part_id: amount to add (negative for sales)}.
+    def adjust_stock(self, conn, changes):
+        with self._lock:
+            if self._tracking(conn):
+                for part_id, amount in changes.items():
+                    if part_id in self._parts:
+                        self._parts[part_id].stock += amount
+
+    # Set stock function
+    def set_stock(self, conn, stock):
+        with self._lock:
+            if self._tracking(conn):
+                for part_id, value in stock.items():
+                    if part_id in self._parts:
+                        self._parts[part_id].stock = value
+
+    # Refresh function
+    # Re-reads the given parts, for writes whose result was computed in SQL.
+    def refresh(self, conn, part_ids):
+        with self._lock:
+            if not self._tracking(conn):
+                return
+            part_ids = list(part_ids)
+            placeholders = ", ".join("?" * len(part_ids))
+            rows = conn.execute(f"SELECT {', '.join(PART_COLUMNS)} FROM inventory WHERE id IN ({placeholders})",
+                                part_ids).fetchall()
+            for part_id in part_ids:
+                self.remove(conn, part_id)
+            for row in rows:
+                self.put(conn, PartRecord(*row))
+
+    # Invalidate function
+    # Drops the cache; the next read reloads it. For bulk changes.
+    def invalidate(self):
+        with self._lock:
+            self._conn = None
+            self._parts = {}
+            self._ids = []
+
+
+inventory_cache = InventoryCache()
+
+
+class CachedInventoryTable:
+    # The inventory tab's KeysetTable, served from the cache on the main connection
+
+    def __init__(self, table):
+        self.table = table
+
+    # First page function
+    def first_page(self, limit):
+        rows = self._page(None, limit)
+        return self.table.first_page(limit) if rows is None else rows
+
+    # Page after function
+    def page_after(self, key, limit):
+        rows = self._page(key, limit)
+        return self.table.page_after(key, limit) if rows is None else rows
+
+    # Page before function
+    def page_before(self, key, limit):
+        rows = self._page(key, limit, True)
+        return self.table.page_before(key, limit) if rows is None else rows
+
+    # Get rows function
+    def get_rows(self, keys):
+        parts = inventory_cache.lookup(db.get_connection(), keys)
+        if parts is None:
+            return self.table.get_rows(keys)
+        return {part_id: record.display_row() for part_id, record in parts.items()}
+
+    # Page function
+    def _page(self, key, limit, before=False):
+        records = inventory_cache.page(db.get_connection(), key, limit, before)
+        return None if records is None else [record.display_row() for record in records]
+
+
+CACHED_INVENTORY_TABLE = CachedInventoryTable(INVENTORY_TABLE)
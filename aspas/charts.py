@@ -0,0 +1,115 @@
+# Report charts
+# Each chart panel owns one matplotlib Figure for its lifetime and redraws it
+# in place, so showing a chart again never creates another figure or canvas.
+# A panel shows data for a key: the rollup version (aspas.rollups) plus the
+# filters the data was read with. When the key has not changed there is
+# nothing to do: no query, no redraw. Data already loaded for a key is kept
+# (up to max_rows rows per panel, least recently shown dropped first), so
+# going back to earlier filters redraws without querying again.
+#
+# The figures are plain matplotlib Figures, not pyplot ones, so nothing keeps
+# them alive once their panel is gone. Embedding in a window (e.g. with
+# FigureCanvasTkAgg) is left to the front end.
+
+from collections import OrderedDict
+
+from matplotlib.figure import Figure
+
+from .rollups import rollup_version
+
+
+MAX_ROWS = 200000
+TOP_PARTS = 5
+LINE_COLORS = ['b', 'g', 'r', 'c', 'm', 'y']
+
+
+# Plot monthly revenue function
+# totals are monthly_totals() rows: (month, sales, quantity, revenue).
+def plot_monthly_revenue(ax, totals):
+    ax.bar([month for month, _, _, _ in totals], [revenue for _, _, _, revenue in totals], color='skyblue')
+    ax.set_title("Monthly Revenue")
+    ax.set_xlabel("Month")
+    ax.set_ylabel("Revenue (₹)")
+    ax.tick_params(axis='x', rotation=45)
+
+
+# Plot weekly demand function
+# One line per part for the TOP_PARTS best sellers in weekly_data
+# (analyze_weekly_demand rows).
+def plot_weekly_demand(ax, weekly_data):
+    part_data = {}
+    for part_id, part_name, week, total_qty, *_ in weekly_data:
+        data = part_data.setdefault(part_id, {"name": part_name, "weeks": [], "quantities": []})
+        data["weeks"].append(week)
+        data["quantities"].append(total_qty)
+
+    top_parts = sorted(part_data.items(), key=lambda item: sum(item[1]["quantities"]), reverse=True)[:TOP_PARTS]
+    for i, (part_id, data) in enumerate(top_parts):
+        ax.plot(data["weeks"], data["quantities"], marker='o', linestyle='-',
+                color=LINE_COLORS[i % len(LINE_COLORS)], label=f"{data['name']} ({part_id})")
+
+    ax.set_title("Weekly Demand by Part")
+    ax.set_xlabel("Week")
+    ax.set_ylabel("Quantity Sold")
+    ax.legend(loc='upper left', bbox_to_anchor=(1, 1))
+    ax.tick_params(axis='x', rotation=45)
+
+
+# Chart key function
+# The key for data read from the rollups with these filters.
+def chart_key(*filters, conn=None):
+    return (tuple(rollup_version(conn)),) + filters
+
+
+class ChartPanel:
+    # One reused figure and the data it has drawn, by key
+
+    def __init__(self, plot, figsize=(6, 4), max_rows=MAX_ROWS):
+        self.figure = Figure(figsize=figsize)
+        self.key = None
+        self.draws = 0
+        self._plot = plot
+        self._max_rows = max_rows
+        self._data = OrderedDict()
+        self._rows = 0
+
+    # Current function
+    # True if the figure already shows key.
+    def current(self, key):
+        return key == self.key
+
+    # Cached function
+    # The data loaded for key, or None.
+    def cached(self, key):
+        data = self._data.get(key)
+        if data is not None:
+            self._data.move_to_end(key)
+        return data
+
+    # Show function
+    # Draws data for key on the figure unless it already shows key. Returns
+    # True if the figure was redrawn (the caller then refreshes its canvas).
+    def show(self, key, data):
+        if key == self.key:
+            return False
+        self._remember(key, data)
+        self.figure.clear()
+        self._plot(self.figure.add_subplot(), data)
+        self.figure.tight_layout()
+        self.key = key
+        self.draws += 1
+        return True
+
+    # Remember function
+    # Data that alone is over max_rows is drawn but not kept.
+    def _remember(self, key, data):
+        if key in self._data:
+            self._data.move_to_end(key)
+            return
+        if len(data) > self._max_rows:
+            return
+        self._data[key] = data
+        self._rows += len(data)
+        while self._rows > self._max_rows:
+            _, dropped = self._data.popitem(last=False)
+            self._rows -= len(dropped)
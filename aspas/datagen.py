@@ -0,0 +1,177 @@
+# Synthetic ASPAS data generator
+# python -m aspas.datagen OUT.db [--parts N] [--vendors N] [--years N] ...
+# Fills a fresh database with parts, vendors, sales history and audit rows.
+# Sales are skewed the way a real shop's are: a few parts sell far more than
+# the rest (Zipf popularity), Saturdays are busy and Sundays quiet, volume
+# grows over the years, and most lines are 1-2 units with occasional bulk
+# orders. The same seed always produces the same data.
+
+import argparse
+import json
+import os
+import random
+from datetime import datetime, timedelta
+
+from . import db
+from .ids import ids_for_times
+from .rollups import fill_rollups
+
+
+PART_NAMES = ["Engine", "Chassis", "Gearbox", "Seats", "Tyres", "Brake Pad", "Clutch Plate", "Radiator",
+              "Headlamp", "Wiper Blade", "Spark Plug", "Oil Filter", "Air Filter", "Battery", "Alternator",
+              "Shock Absorber", "Fuel Pump", "Timing Belt", "Side Mirror", "Horn"]
+MANUFACTURERS = ["BMW", "Mercedes", "MRF", "Bosch", "Tata", "Mahindra", "Maruti", "Hyundai", "Denso", "Valeo"]
+VEHICLE_TYPES = ["SUV", "Sedan", "Hatchback", "Truck", "Bike"]
+PAYMENT_METHODS = (["Cash", "UPI", "Card", "Transfer", "Cheque"], [35, 40, 15, 7, 3])
+QUANTITIES = ([1, 2, 3, 4, 5], [50, 25, 12, 8, 5])
+WEEKDAY_FACTOR = [1.0, 0.9, 0.9, 1.0, 1.2, 1.4, 0.6]  # Monday .. Sunday
+AUDIT_ACTIONS = (["RECORD_SALE", "VIEW_REPORT", "VIEW_AUDIT_LOG", "LOGIN", "LOGOUT", "ADD_INVENTORY",
+                  "AUTO_REORDER", "VIEW_WEEKLY_DEMAND", "EXPORT_PDF", "ADD_VENDOR"],
+                 [40, 12, 10, 10, 10, 5, 5, 4, 2, 2])
+USERS = (["admin", "employee1", "employee2", "employee3"], [20, 50, 20, 10])
+BULK_ORDER_RATE = 0.02
+
+
+# Millis function
+def _millis(when):
+    return int(when.timestamp() * 1000)
+
+
+# Insert chunk function
+def _insert(conn, table, columns, rows):
+    placeholders = ", ".join("?" * len(columns))
+    conn.executemany(f"INSERT INTO {table} ({', '.join(columns)}) VALUES ({placeholders})", rows)
+
+
+# Generate function
+# Writes into path (which must not exist yet) and returns the row counts.
+# audit_rows defaults to one audit row per sale.
+def generate(path, parts=1000, vendors=50, years=2, sales_per_day=200, audit_rows=None, seed=42,
+             chunk_size=50000):
+    if os.path.exists(path):
+        raise FileExistsError(path)
+    rng = random.Random(seed)
+    conn = db.connect(path)
+    db.setup_database()
+
+    end = datetime.now().replace(hour=0, minute=0, second=0, microsecond=0)
+    start = end - timedelta(days=int(365 * years))
+
+    # === INVENTORY ===
+    created = [start - timedelta(days=1, seconds=n) for n in range(parts)]
+    part_ids = ids_for_times("I", [_millis(when) for when in created])
+    prices = {}
+    inventory = []
+    for n, part_id in enumerate(part_ids):
+        initial_stock = rng.randint(100, 5000)
+        prices[part_id] = round(rng.lognormvariate(7.5, 1.0), 2)
+        inventory.append((part_id, f"{rng.choice(PART_NAMES)} {n}", rng.choice(MANUFACTURERS),
+                          rng.choice(VEHICLE_TYPES), int(initial_stock * rng.uniform(0.35, 1.0)),
+                          prices[part_id], initial_stock, int(initial_stock * 0.3)))
+    with conn:
+        _insert(conn, "inventory", ("id", "part_name", "manufacturer", "vehicle_type", "stock", "price",
+                                    "initial_stock", "reorder_point"), inventory)
+
+    # === VENDORS ===
+    vendor_ids = ids_for_times("V", [_millis(start - timedelta(days=2, seconds=n)) for n in range(vendors)])
+    with conn:
+        _insert(conn, "vendors", ("id", "name", "contact", "parts"), [
+            (vendor_id, f"Vendor {n}", f"+91-{rng.randint(10 ** 9, 10 ** 10 - 1)}",
+             ", ".join(rng.sample(PART_NAMES, rng.randint(1, 5))))
+            for n, vendor_id in enumerate(vendor_ids)])
+
+    # Each part from 1-3 vendors at their own cost and lead time. A generator
+    # of its own so the sales drawn below stay the same for a given seed
+    link_rng = random.Random(seed + 1)
+    vendor_parts = []
+    for part_id in part_ids:
+        for vendor_id in link_rng.sample(vendor_ids, min(len(vendor_ids), link_rng.randint(1, 3))):
+            vendor_parts.append((vendor_id, part_id, round(prices[part_id] * link_rng.uniform(0.55, 0.85), 2),
+                                 link_rng.randint(2, 14)))
+    with conn:
+        _insert(conn, "vendor_parts", ("vendor_id", "part_id", "unit_cost", "lead_time_days"), vendor_parts)
+
+    # === SALES ===
+    # Popularity follows Zipf over a shuffled part order
+    popular = part_ids[:]
+    rng.shuffle(popular)
+    cum_weights = []
+    total = 0.0
+    for rank in range(1, len(popular) + 1):
+        total += 1.0 / rank ** 1.1
+        cum_weights.append(total)
+
+    sale_count = 0
+    chunk = []
+    day = start
+    while day < end:
+        growth = 1.0 + 0.3 * (day - start).days / (365 * years)
+        lines = max(0, int(rng.gauss(sales_per_day * WEEKDAY_FACTOR[day.weekday()] * growth,
+                                     sales_per_day * 0.1)))
+        times = sorted(day + timedelta(hours=9, seconds=rng.randrange(11 * 3600)) for _ in range(lines))
+        sale_ids = ids_for_times("S", [_millis(when) for when in times])
+        chosen = rng.choices(popular, cum_weights=cum_weights, k=lines)
+        for sale_id, part_id, when in zip(sale_ids, chosen, times):
+            if rng.random() < BULK_ORDER_RATE:
+                quantity = rng.randint(10, 50)
+            else:
+                quantity = rng.choices(*QUANTITIES)[0]
+            chunk.append((sale_id, part_id, quantity, round(quantity * prices[part_id], 2), when.isoformat(),
+                          rng.choices(*PAYMENT_METHODS)[0]))
+        if len(chunk) >= chunk_size:
+            with conn:
+                _insert(conn, "sales", ("id", "part_id", "quantity", "amount", "date", "payment_method"), chunk)
+            sale_count += len(chunk)
+            chunk = []
+        day += timedelta(days=1)
+    with conn:
+        _insert(conn, "sales", ("id", "part_id", "quantity", "amount", "date", "payment_method"), chunk)
+    sale_count += len(chunk)
+
+    # === AUDIT LOG ===
+    audit_rows = sale_count if audit_rows is None else audit_rows
+    span = int((end - start).total_seconds() * 1000)
+    written = 0
+    while written < audit_rows:
+        count = min(chunk_size, audit_rows - written)
+        # Each chunk covers its own slice of the period so IDs stay in time order
+        low = _millis(start) + span * written // audit_rows
+        high = _millis(start) + span * (written + count) // audit_rows
+        millis = sorted(rng.randrange(low, max(high, low + 1)) for _ in range(count))
+        rows = []
+        for audit_id, ms in zip(ids_for_times("A", millis), millis):
+            action = rng.choices(*AUDIT_ACTIONS)[0]
+            user = rng.choices(*USERS)[0]
+            rows.append((audit_id, action, f"Synthetic {action.lower().replace('_', ' ')} entry",
+                         datetime.fromtimestamp(ms / 1000).isoformat(), user,
+                         "admin" if user == "admin" else "employee"))
+        with conn:
+            _insert(conn, "audit_log", ("id", "action_type", "action_details", "timestamp", "username",
+                                        "user_role"), rows)
+        written += count
+
+    with conn:
+        fill_rollups(conn)
+
+    return {'parts': parts, 'vendors': vendors, 'vendor_parts': len(vendor_parts), 'sales': sale_count,
+            'audit_rows': audit_rows, 'start': start.date().isoformat(), 'end': end.date().isoformat()}
+
+
+# Main function
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m aspas.datagen", description="Generate a synthetic ASPAS database")
+    parser.add_argument("path", help="database file to create")
+    parser.add_argument("--parts", type=int, default=1000)
+    parser.add_argument("--vendors", type=int, default=50)
+    parser.add_argument("--years", type=float, default=2)
+    parser.add_argument("--sales-per-day", type=int, default=200)
+    parser.add_argument("--audit-rows", type=int, default=None, help="default: one per sale")
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args(argv)
+
+    counts = generate(args.path, args.parts, args.vendors, args.years, args.sales_per_day, args.audit_rows, args.seed)
+    print(json.dumps(counts, indent=2))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,208 @@
+# Database connection and schema setup for ASPAS
+# File databases run in WAL mode, so readers never block the writer and a
+# commit appends to the log instead of locking the whole file.
+#
+#   get_connection()   the calling thread's connection: the thread that called
+#                      connect() gets the main one, every other thread gets its
+#                      own, opened on first use
+#   read_connection()  a pooled read-only connection for reports, which can
+#                      run alongside sales being written on another connection
+
+import queue
+import sqlite3
+import threading
+from contextlib import contextmanager
+
+from .migrations import migrate
+
+
+STORAGE_MODE = 'sqlite'
+DB_NAME = ':memory:' if STORAGE_MODE == 'memory' else 'aspas.db'
+
+# Seconds a connection waits for another's write lock before giving up
+BUSY_TIMEOUT = 30
+# NORMAL is safe with WAL: a power cut can lose the last commits, never corrupt
+PRAGMAS = [
+    ("synchronous", "NORMAL"),
+    ("cache_size", -32000),       # KiB, per connection
+    ("mmap_size", 256 * 1024 * 1024),
+    ("temp_store", "MEMORY"),
+]
+READ_POOL_SIZE = 4
+
+_conn = None
+_db_name = DB_NAME
+_owner = None
+_generation = 0
+_local = threading.local()
+_read_pool = None
+_pool_lock = threading.Lock()
+
+
+# Configure function
+def _configure(conn):
+    for name, value in PRAGMAS:
+        conn.execute(f"PRAGMA {name} = {value}")
+    return conn
+
+
+# Connect function
+# Opens the main connection for the calling thread; connections that other
+# threads or the read pool opened for the previous database are dropped.
+def connect(db_name=None):
+    global _conn, _db_name, _owner, _generation, _read_pool
+    if _conn is not None:
+        _conn.close()
+    if _read_pool is not None:
+        _read_pool.close()
+        _read_pool = None
+    _db_name = db_name or DB_NAME
+    _owner = threading.get_ident()
+    _generation += 1
+    if _db_name == ':memory:':
+        # Every connection to :memory: is a separate database, so all threads share this one
+        _conn = _configure(sqlite3.connect(_db_name, check_same_thread=False))
+    else:
+        _conn = _configure(sqlite3.connect(_db_name, timeout=BUSY_TIMEOUT))
+        _conn.execute("PRAGMA journal_mode = WAL")
+    return _conn
+
+
+# Get db name function
+def get_db_name():
+    return _db_name
+
+
+# Main connection function
+# The connection opened by connect(), or None before the first connect.
+def main_connection():
+    return _conn
+
+
+# Get connection function
+# A thread with a bound connection (see bind_thread_connection) gets that one.
+def get_connection():
+    conn = getattr(_local, 'conn', None)
+    if conn is not None:
+        return conn
+    if _conn is None:
+        connect()
+    if threading.get_ident() == _owner or _db_name == ':memory:':
+        return _conn
+    own = getattr(_local, 'own', None)
+    if own is None or own[0] != _generation:
+        own = (_generation, open_connection())
+        _local.own = own
+    return own[1]
+
+
+# Open connection function
+# A separate connection to the current database. Read-only connections may be
+# handed between threads (the read pool does).
+def open_connection(readonly=False):
+    conn = _configure(sqlite3.connect(_db_name, timeout=BUSY_TIMEOUT, check_same_thread=not readonly))
+    if readonly:
+        conn.execute("PRAGMA query_only = 1")
+    return conn
+
+
+# Bind thread connection function
+# Makes get_connection() return conn on the calling thread; None unbinds.
+def bind_thread_connection(conn):
+    _local.conn = conn
+
+
+class ReadPool:
+    def __init__(self, size=READ_POOL_SIZE):
+        self.size = size
+        self._idle = queue.LifoQueue()
+        self._slots = threading.BoundedSemaphore(size)
+        self._closed = False
+
+    # Connection function
+    # Borrows a connection, waiting while all size of them are in use.
+    @contextmanager
+    def connection(self):
+        with self._slots:
+            try:
+                conn = self._idle.get_nowait()
+            except queue.Empty:
+                conn = open_connection(readonly=True)
+            try:
+                yield conn
+            finally:
+                if conn.in_transaction:
+                    conn.rollback()
+                if self._closed:
+                    conn.close()
+                else:
+                    self._idle.put(conn)
+
+    # Close function
+    # Closes idle connections; borrowed ones are closed when returned.
+    def close(self):
+        self._closed = True
+        while True:
+            try:
+                self._idle.get_nowait().close()
+            except queue.Empty:
+                break
+
+
+# Read connection function
+# with read_connection() as conn: ... borrows a connection from the read pool.
+@contextmanager
+def read_connection():
+    global _read_pool
+    if _conn is None:
+        connect()
+    if _db_name == ':memory:':
+        yield _conn
+        return
+    with _pool_lock:
+        if _read_pool is None:
+            _read_pool = ReadPool()
+        pool = _read_pool
+    with pool.connection() as conn:
+        yield conn
+
+
+# Write transaction function
+# with write_transaction(conn): ... takes the write lock up front (BEGIN
+# IMMEDIATE) instead of at the first write, so reads inside the block see the
+# latest committed data and no other connection or terminal can write until it
+# commits. Rolls back if the block raises.
+@contextmanager
+def write_transaction(conn=None):
+    conn = conn or get_connection()
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        yield conn
+    except BaseException:
+        conn.rollback()
+        raise
+    conn.commit()
+
+
+# Setup database function
+# Brings the schema up to date and seeds the default users.
+def setup_database(conn=None):
+    conn = conn or get_connection()
+    migrate(conn)
+
+    cursor = conn.cursor()
+    cursor.execute("SELECT COUNT(*) FROM users")
+    if cursor.fetchone()[0] == 0:
+        cursor.executemany("INSERT INTO users (username, password, role) VALUES (?, ?, ?)", [
+            ("admin", "admin123", "admin"),
+            ("employee1", "emp123", "employee")
+        ])
+    conn.commit()
+
+
+# Prefix range function
+# Turns a prefix filter (col LIKE 'prefix%') into bounds for
+# col >= low AND col < high, which can use an index on col.
+def prefix_range(prefix):
+    return prefix, prefix[:-1] + chr(ord(prefix[-1]) + 1)
+
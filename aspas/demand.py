@@ -0,0 +1,54 @@
+# Weekly demand analysis
+# One query over the daily sales rollup produces every column of the weekly
+# demand report: weekly totals, average per sale, the busiest and quietest
+# sales day of the week, and the trend against the part's previous week.
+
+from . import db
+
+
+WEEKLY_DEMAND_COLUMNS = ("Part ID", "Part Name", "Week", "Total Quantity", "Avg Daily",
+                         "Max Day", "Min Day", "Week Trend")
+
+
+# Analyze weekly demand function
+# Rows of (part_id, part_name, week, total_quantity, avg_daily, max_day,
+# min_day, trend) ordered by part and week. Dates are YYYY-MM-DD, inclusive.
+# Max/min day only count days inside the date range that had sales.
+def analyze_weekly_demand(start_date=None, end_date=None, part_id=None):
+    filters = ""
+    params = []
+    if start_date:
+        filters += " AND r.day >= ?"
+        params.append(start_date)
+    if end_date:
+        filters += " AND r.day <= ?"
+        params.append(end_date)
+    if part_id:
+        filters += " AND r.part_id = ?"
+        params.append(part_id)
+
+    return db.get_connection().execute(f"""
+        WITH weekly AS (
+            SELECT r.part_id, i.part_name, strftime('%Y-%W', r.day) AS week,
+                   SUM(r.quantity) AS total_quantity,
+                   ROUND(SUM(r.quantity) * 1.0 / SUM(r.sale_count), 2) AS avg_daily,
+                   MAX(r.quantity) AS max_day,
+                   MIN(r.quantity) AS min_day
+            FROM sales_daily r
+            JOIN inventory i ON r.part_id = i.id
+            WHERE 1=1 {filters}
+            GROUP BY r.part_id, week
+        ),
+        with_previous AS (
+            SELECT *, LAG(total_quantity) OVER (PARTITION BY part_id ORDER BY week) AS prev_quantity
+            FROM weekly
+        )
+        SELECT part_id, part_name, week, total_quantity, avg_daily, max_day, min_day,
+               CASE
+                   WHEN prev_quantity IS NULL OR total_quantity = prev_quantity THEN '—'
+                   WHEN total_quantity > prev_quantity THEN '↑'
+                   ELSE '↓'
+               END AS trend
+        FROM with_previous
+        ORDER BY part_id, week
+    """, params).fetchall()
@@ -0,0 +1,404 @@
+# ASPAS engine: inventory, vendor and sales operations
+# Every function here returns plain data and raises typed errors from
+# aspas.errors. Nothing in this module touches Tkinter; front ends react to the
+# change events published through aspas.events.
+
+from datetime import datetime
+
+from . import events, reorder, rollups, suppliers
+from .audit import add_audit_log, insert_audit_logs
+from .cache import PartRecord, inventory_cache
+from .db import get_connection, write_transaction
+from .errors import ValidationError, PartNotFoundError, InsufficientStockError, VendorNotFoundError
+from .ids import generate_inventory_id, generate_vendor_id, generate_sale_id
+
+
+# Parse quantity function
+def _parse_quantity(quantity):
+    try:
+        quantity = int(quantity)
+    except (TypeError, ValueError):
+        raise ValidationError("Quantity must be a number.")
+    if quantity <= 0:
+        raise ValidationError("Quantity must be greater than zero.")
+    return quantity
+
+
+# === INVENTORY ===
+
+# Add inventory function
+def add_inventory(part_name, manufacturer, vehicle_type, stock, price, reorder_ratio=reorder.DEFAULT_REORDER_RATIO):
+    try:
+        stock = int(stock)
+        price = float(price)
+    except (TypeError, ValueError):
+        raise ValidationError("Stock and price must be numbers.")
+    if stock < 0:
+        raise ValidationError("Stock must be a positive number.")
+    if price < 0:
+        raise ValidationError("Price must be a valid number.")
+
+    conn = get_connection()
+    inv_id = generate_inventory_id()
+    record = PartRecord(inv_id, part_name, manufacturer, vehicle_type, stock, price, stock,
+                        reorder.reorder_point_for(stock, reorder_ratio))
+    with conn:
+        conn.execute("INSERT INTO inventory (id, part_name, manufacturer, vehicle_type, stock, price, initial_stock, reorder_point) VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                     record.row() + (record.reorder_point,))
+
+        # Add audit log entry in the same transaction
+        action_details = f"Added part '{part_name}' (ID: {inv_id}), Stock: {stock}, Price: {price}"
+        add_audit_log("ADD_INVENTORY", action_details, conn=conn)
+    inventory_cache.put(conn, record)
+
+    events.emit(events.INVENTORY_CHANGED, {'action': 'add', 'part_ids': [inv_id]})
+    return inv_id
+
+
+# Delete inventory function
+def delete_inventory(item_id):
+    conn = get_connection()
+    with conn:
+        # Get part details before deleting for the audit log
+        part_name = _get_parts(conn, [item_id]).get(item_id, (None, None, None))[2]
+        if part_name is None:
+            raise PartNotFoundError(item_id)
+
+        conn.execute("DELETE FROM inventory WHERE id = ?", (item_id,))
+        conn.execute("DELETE FROM vendor_parts WHERE part_id = ?", (item_id,))
+
+        # Nothing is left to reorder: close its suggestions and take it off
+        # draft orders (a sent order is already with the vendor)
+        conn.execute("UPDATE reorder_queue SET status = 'skipped', applied_at = ? "
+                     "WHERE part_id = ? AND status = 'pending'", (datetime.now().isoformat(), item_id))
+        drafts = [row[0] for row in conn.execute("""
+            SELECT l.po_id FROM purchase_order_lines l
+            JOIN purchase_orders p ON p.id = l.po_id
+            WHERE l.part_id = ? AND p.status = 'draft'
+        """, (item_id,))]
+        conn.executemany("DELETE FROM purchase_order_lines WHERE po_id = ? AND part_id = ?",
+                         [(po_id, item_id) for po_id in drafts])
+        # A draft left with no lines is dropped
+        conn.executemany("DELETE FROM purchase_orders WHERE id = ? AND NOT EXISTS "
+                         "(SELECT 1 FROM purchase_order_lines WHERE po_id = ?)",
+                         [(po_id, po_id) for po_id in drafts])
+
+        # Add audit log entry in the same transaction
+        action_details = f"Deleted part '{part_name}' (ID: {item_id})"
+        add_audit_log("DELETE_INVENTORY", action_details, conn=conn)
+    inventory_cache.remove(conn, item_id)
+
+    events.emit(events.INVENTORY_CHANGED, {'action': 'delete', 'part_ids': [item_id]})
+    if drafts:
+        events.emit(events.PURCHASE_ORDERS_CHANGED, {'action': 'delete', 'po_ids': drafts})
+    return part_name
+
+
+# Get part function
+def get_part(part_id):
+    conn = get_connection()
+    parts = inventory_cache.lookup(conn, [part_id])
+    if parts is not None:
+        if part_id not in parts:
+            raise PartNotFoundError(part_id)
+        return parts[part_id].row()
+    row = conn.execute(
+        "SELECT id, part_name, manufacturer, vehicle_type, stock, price, initial_stock FROM inventory WHERE id = ?",
+        (part_id,)).fetchone()
+    if not row:
+        raise PartNotFoundError(part_id)
+    return row
+
+
+# List inventory function
+def list_inventory():
+    conn = get_connection()
+    parts = inventory_cache.parts(conn)
+    if parts is not None:
+        return [record.row() for record in parts]
+    return conn.execute(
+        "SELECT id, part_name, manufacturer, vehicle_type, stock, price, initial_stock FROM inventory").fetchall()
+
+
+# Search inventory function
+# Parts whose name or manufacturer contains text, in ID order, limit at a time.
+# Pass the last ID of a page as after to get the next one.
+def search_inventory(text=None, after=None, limit=50):
+    query = "SELECT id, part_name, manufacturer, vehicle_type, stock, price FROM inventory WHERE 1=1"
+    params = []
+    if text:
+        query += " AND (part_name LIKE ? OR manufacturer LIKE ?)"
+        params.extend([f"%{text}%"] * 2)
+    if after:
+        query += " AND id > ?"
+        params.append(after)
+    query += " ORDER BY id LIMIT ?"
+    params.append(limit)
+    return get_connection().execute(query, params).fetchall()
+
+
+# List in-stock parts function
+def list_in_stock_parts():
+    conn = get_connection()
+    parts = inventory_cache.parts(conn)
+    if parts is not None:
+        return [(record.id, record.part_name) for record in parts if record.stock > 0]
+    return conn.execute("SELECT id, part_name FROM inventory WHERE stock > 0").fetchall()
+
+
+# Check and auto order function
+# Queues every part at or below its reorder point and puts the queue on draft
+# purchase orders. Returns one dict per part ordered.
+def check_and_auto_order():
+    conn = get_connection()
+    with conn:
+        reorder.scan_low_stock(conn)
+    return reorder.apply_reorders()
+
+
+# === VENDORS ===
+
+# Add vendor function
+def add_vendor(name, contact, parts):
+    conn = get_connection()
+    ven_id = generate_vendor_id()
+    with conn:
+        conn.execute("INSERT INTO vendors (id, name, contact, parts) VALUES (?, ?, ?, ?)", (ven_id, name, contact, parts))
+        suppliers.link_vendor_parts(conn, [ven_id])
+
+        # Add audit log entry in the same transaction
+        action_details = f"Added vendor '{name}' (ID: {ven_id}), Contact: {contact}, Parts: {parts}"
+        add_audit_log("ADD_VENDOR", action_details, conn=conn)
+
+    events.emit(events.VENDORS_CHANGED, {'action': 'add', 'vendor_ids': [ven_id]})
+    return ven_id
+
+
+# List vendors function
+def list_vendors():
+    return get_connection().execute("SELECT id, name, contact, parts FROM vendors").fetchall()
+
+
+# Set vendor part function
+# Links a part to a vendor, or updates the vendor's cost and lead time for it.
+def set_vendor_part(vendor_id, part_id, unit_cost=None, lead_time_days=None):
+    try:
+        unit_cost = None if unit_cost in (None, "") else float(unit_cost)
+        lead_time_days = None if lead_time_days in (None, "") else int(lead_time_days)
+    except (TypeError, ValueError):
+        raise ValidationError("Unit cost and lead time must be numbers.")
+    if unit_cost is not None and unit_cost < 0:
+        raise ValidationError("Unit cost must be a valid number.")
+    if lead_time_days is not None and lead_time_days < 0:
+        raise ValidationError("Lead time must not be negative.")
+
+    conn = get_connection()
+    with conn:
+        vendor = conn.execute("SELECT name FROM vendors WHERE id = ?", (vendor_id,)).fetchone()
+        if vendor is None:
+            raise VendorNotFoundError(vendor_id)
+        part_name = _get_parts(conn, [part_id]).get(part_id, (None, None, None))[2]
+        if part_name is None:
+            raise PartNotFoundError(part_id)
+        conn.execute("""
+            INSERT INTO vendor_parts (vendor_id, part_id, unit_cost, lead_time_days) VALUES (?, ?, ?, ?)
+            ON CONFLICT (vendor_id, part_id) DO UPDATE
+            SET unit_cost = excluded.unit_cost, lead_time_days = excluded.lead_time_days
+        """, (vendor_id, part_id, unit_cost, lead_time_days))
+
+        # Add audit log entry in the same transaction
+        action_details = (f"Vendor '{vendor[0]}' (ID: {vendor_id}) supplies '{part_name}' (ID: {part_id}), "
+                          f"Cost: {unit_cost}, Lead time: {lead_time_days} days")
+        add_audit_log("LINK_VENDOR_PART", action_details, conn=conn)
+
+    events.emit(events.VENDORS_CHANGED, {'action': 'link', 'vendor_ids': [vendor_id]})
+
+
+# Remove vendor part function
+def remove_vendor_part(vendor_id, part_id):
+    conn = get_connection()
+    with conn:
+        cur = conn.execute("DELETE FROM vendor_parts WHERE vendor_id = ? AND part_id = ?", (vendor_id, part_id))
+        if cur.rowcount == 0:
+            raise ValidationError(f"Vendor {vendor_id} is not linked to part {part_id}.")
+
+        # Add audit log entry in the same transaction
+        add_audit_log("UNLINK_VENDOR_PART", f"Vendor {vendor_id} no longer supplies part {part_id}", conn=conn)
+
+    events.emit(events.VENDORS_CHANGED, {'action': 'unlink', 'vendor_ids': [vendor_id]})
+
+
+# === SALES ===
+
+# List sales function
+# Includes the part's unit price for display.
+def list_sales():
+    return get_connection().execute("""
+        SELECT s.id, s.part_id, s.quantity, i.price as unit_price, s.amount, s.date, s.payment_method
+        FROM sales s
+        JOIN inventory i ON s.part_id = i.id
+    """).fetchall()
+
+
+# Audit message per sale action type
+_SALE_AUDIT_DETAILS = {
+    "RECORD_SALE": "Sale recorded (ID: {sale_id}) for '{part_name}' (ID: {part_id}), Quantity: {quantity}, Amount: ₹{amount:.2f}",
+    "CUSTOMER_SALE": "Customer sale recorded for '{part_name}' (ID: {part_id}), Quantity: {quantity}",
+}
+
+
+# Insert sales function
+# Validates stock for every line, then writes the stock updates, sales rows and
+# audit rows on conn without committing. Raises before writing anything if any
+# line cannot be fulfilled.
+def _insert_sales(conn, lines, method, action_type):
+    # The same part may appear on several lines of one invoice
+    requested = {}
+    for part_id, quantity in lines:
+        requested[part_id] = requested.get(part_id, 0) + quantity
+
+    parts = _get_parts(conn, requested)
+
+    for part_id, quantity in requested.items():
+        if part_id not in parts:
+            raise PartNotFoundError(part_id)
+        stock = parts[part_id][0]
+        if stock < quantity:
+            raise InsufficientStockError(part_id, quantity, stock)
+
+    # The stock condition makes each decrement atomic: with several terminals
+    # selling, a part can only go out if the stock is still there at write time
+    for part_id, quantity in requested.items():
+        cur = conn.execute("UPDATE inventory SET stock = stock - ? WHERE id = ? AND stock >= ?",
+                           (quantity, part_id, quantity))
+        if cur.rowcount == 0:
+            stock = conn.execute("SELECT stock FROM inventory WHERE id = ?", (part_id,)).fetchone()
+            if stock is None:
+                raise PartNotFoundError(part_id)
+            raise InsufficientStockError(part_id, quantity, stock[0])
+
+    date = datetime.now().isoformat()
+    sales = []
+    for part_id, quantity in lines:
+        _, price, part_name = parts[part_id]
+        sales.append({'sale_id': generate_sale_id(), 'part_id': part_id, 'part_name': part_name,
+                      'quantity': quantity, 'amount': quantity * price})
+
+    conn.executemany("INSERT INTO sales (id, part_id, quantity, amount, date, payment_method) VALUES (?, ?, ?, ?, ?, ?)",
+                     [(s['sale_id'], s['part_id'], s['quantity'], s['amount'], date, method) for s in sales])
+    rollups.add_sales(conn, [(s['part_id'], s['quantity'], s['amount'], date) for s in sales])
+
+    # Add audit log entries in the same transaction
+    template = _SALE_AUDIT_DETAILS[action_type]
+    insert_audit_logs(conn, [(action_type, template.format(**s)) for s in sales])
+
+    # Only the parts whose stock just changed can have crossed their reorder point
+    reorder.queue_low_stock(conn, list(requested))
+    return sales
+
+
+# Get parts function
+# Returns {part_id: (stock, price, part_name)} for the part_ids that exist,
+# from the inventory cache when conn is the cached connection.
+def _get_parts(conn, part_ids):
+    parts = inventory_cache.lookup(conn, part_ids)
+    if parts is not None:
+        return {part_id: (record.stock, record.price, record.part_name) for part_id, record in parts.items()}
+    part_ids = list(part_ids)
+    placeholders = ", ".join("?" * len(part_ids))
+    rows = conn.execute(f"SELECT id, stock, price, part_name FROM inventory WHERE id IN ({placeholders})",
+                        part_ids).fetchall()
+    return {row[0]: row[1:] for row in rows}
+
+
+# Sold stock function
+# {part_id: -units sold}, for the inventory cache's write-through.
+def _sold_stock(sales):
+    changes = {}
+    for s in sales:
+        changes[s['part_id']] = changes.get(s['part_id'], 0) - s['quantity']
+    return changes
+
+
+# Write sales function
+# Runs _insert_sales in one transaction and publishes the change events.
+def _write_sales(lines, method, action_type):
+    lines = [(part_id, _parse_quantity(quantity)) for part_id, quantity in lines]
+    if not lines:
+        raise ValidationError("No sale lines given.")
+
+    with write_transaction() as conn:
+        sales = _insert_sales(conn, lines, method, action_type)
+    inventory_cache.adjust_stock(conn, _sold_stock(sales))
+    return sales, _emit_sales(sales)
+
+
+# Emit sales function
+def _emit_sales(sales):
+    part_ids = list(dict.fromkeys(s['part_id'] for s in sales))
+    events.emit(events.SALES_CHANGED, {'action': 'add', 'sale_ids': [s['sale_id'] for s in sales],
+                                       'part_ids': part_ids})
+    events.emit(events.INVENTORY_CHANGED, {'action': 'sale', 'part_ids': part_ids})
+    return part_ids
+
+
+# Record sales batch function
+# Records a multi-line invoice all-or-nothing. lines is an iterable of
+# (part_id, quantity). Only the parts on the invoice are checked for reorder.
+def record_sales_batch(lines, method):
+    sales, _ = _write_sales(lines, method, "RECORD_SALE")
+    reorders = reorder.apply_reorders()
+    return {'sales': sales, 'total': sum(s['amount'] for s in sales), 'reorders': reorders}
+
+
+# Record sale function
+# Returns a receipt dict; 'reorders' lists any auto-reorders the sale triggered.
+def record_sale(part_id, quantity, method):
+    invoice = record_sales_batch([(part_id, quantity)], method)
+    receipt = dict(invoice['sales'][0])
+    receipt['reorders'] = invoice['reorders']
+    return receipt
+
+
+# Record customer sale function
+# Same as record_sale but logged as a customer order. Low stock is queued for
+# reorder but the queue is left for the next staff sale or reorder check.
+def record_customer_sale(part_id, quantity, method):
+    sales, _ = _write_sales([(part_id, quantity)], method, "CUSTOMER_SALE")
+    return sales[0]
+
+
+# Record sales group function
+# Writes several independent invoices with a single commit, for callers that
+# queue up sales (the API server batches concurrent requests this way).
+# invoices is a list of (lines, method, action_type). Each invoice runs under
+# its own savepoint, so one that fails, for whatever reason, is rolled back
+# alone. Returns one result per invoice: its list of sales, or the exception
+# that rejected it.
+def record_sales_group(invoices):
+    results = []
+    written = []
+    with write_transaction() as conn:
+        for lines, method, action_type in invoices:
+            try:
+                lines = [(part_id, _parse_quantity(quantity)) for part_id, quantity in lines]
+                if not lines:
+                    raise ValidationError("No sale lines given.")
+                conn.execute("SAVEPOINT invoice")
+                try:
+                    sales = _insert_sales(conn, lines, method, action_type)
+                except BaseException:
+                    conn.execute("ROLLBACK TO invoice")
+                    raise
+                finally:
+                    conn.execute("RELEASE invoice")
+            except Exception as e:
+                results.append(e)
+            else:
+                results.append(sales)
+                written.extend(sales)
+
+    if written:
+        inventory_cache.adjust_stock(conn, _sold_stock(written))
+        _emit_sales(written)
+    return results
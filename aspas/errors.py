@@ -0,0 +1,56 @@
+# Typed errors raised by the ASPAS engine
+# Front ends catch these and decide how to show them (dialog, HTTP status, log line).
+
+
+class ASPASError(Exception):
+    pass
+
+
+# Bad input from the caller (quantity, stock, price ...)
+class ValidationError(ASPASError):
+    pass
+
+
+# Invalid lines in a bulk import; errors is a list of (line number, message)
+class InventoryImportError(ValidationError):
+    def __init__(self, errors, total):
+        lines = "\n".join(f"Line {line}: {message}" for line, message in errors)
+        more = f"\n... and {total - len(errors)} more" if total > len(errors) else ""
+        super().__init__(f"{total} invalid line(s), nothing was imported:\n{lines}{more}")
+        self.errors = errors
+        self.total = total
+
+
+class PartNotFoundError(ASPASError):
+    def __init__(self, part_id):
+        super().__init__(f"Part not found: {part_id}")
+        self.part_id = part_id
+
+
+class VendorNotFoundError(ASPASError):
+    def __init__(self, vendor_id):
+        super().__init__(f"Vendor not found: {vendor_id}")
+        self.vendor_id = vendor_id
+
+
+class PurchaseOrderNotFoundError(ASPASError):
+    def __init__(self, po_id):
+        super().__init__(f"Purchase order not found: {po_id}")
+        self.po_id = po_id
+
+
+class InsufficientStockError(ASPASError):
+    def __init__(self, part_id, requested, available):
+        super().__init__(f"Insufficient stock for {part_id}: requested {requested}, available {available}")
+        self.part_id = part_id
+        self.requested = requested
+        self.available = available
+
+
+class AuthenticationError(ASPASError):
+    pass
+
+
+# A background job was cancelled before it finished
+class JobCancelled(ASPASError):
+    pass
@@ -0,0 +1,30 @@
+# Change events published by the engine
+# Front ends subscribe to these instead of the engine calling widget code directly.
+# Every callback receives a single payload dict.
+
+INVENTORY_CHANGED = 'inventory_changed'   # payload: action, part_ids
+SALES_CHANGED = 'sales_changed'           # payload: action, sale_ids, part_ids
+VENDORS_CHANGED = 'vendors_changed'       # payload: action, vendor_ids
+PURCHASE_ORDERS_CHANGED = 'purchase_orders_changed'   # payload: action, po_ids
+
+_subscribers = {}
+
+
+# Subscribe function
+def subscribe(event, callback):
+    _subscribers.setdefault(event, []).append(callback)
+    return callback
+
+
+# Unsubscribe function
+def unsubscribe(event, callback):
+    callbacks = _subscribers.get(event, [])
+    if callback in callbacks:
+        callbacks.remove(callback)
+
+
+# Emit function
+def emit(event, payload=None):
+    # Copy the list so a callback may unsubscribe itself while being notified
+    for callback in list(_subscribers.get(event, [])):
+        callback(payload or {})
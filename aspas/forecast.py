@@ -0,0 +1,164 @@
+# Demand forecasting for reorder points
+# Every part's daily demand over the last HISTORY_DAYS complete days gives
+# its demand rate (mean units per day) and variability (standard deviation).
+# From those, with the replenishment lead time and a service level:
+#
+#   safety stock  = SERVICE_Z * std * sqrt(lead time)
+#   reorder point = rate * lead time + safety stock
+#   order up to   = reorder point + rate * REVIEW_DAYS
+#
+# The figures are kept in part_demand, and each part's reorder point is
+# written to inventory.reorder_point, so the reorder check stays the indexed
+# stock - reorder_point <= 0 and reorders refill to the order-up-to level.
+# Parts with fewer than MIN_SALE_DAYS days of sales in the window keep their
+# ratio-based reorder point, as do parts given a threshold by hand
+# (inventory.demand_managed = 0). The lead time is that of the part's best
+# vendor (aspas.suppliers), or LEAD_TIME_DAYS if it has none or no lead time.
+#
+# refresh_demand is meant to run once a night (python -m aspas forecast).
+# part_demand keeps running sums of quantity and quantity squared over the
+# window, so a refresh only reads the days that entered and left the window
+# since the last one. All parts are then recomputed at once as NumPy arrays.
+
+from datetime import date, datetime, timedelta
+
+import numpy as np
+
+from . import db
+from .cache import inventory_cache
+from .errors import PartNotFoundError
+from .reorder import queue_low_stock, scan_low_stock
+from .suppliers import best_vendors
+
+
+HISTORY_DAYS = 90
+LEAD_TIME_DAYS = 7
+REVIEW_DAYS = 14
+SERVICE_Z = 1.65        # about 95% of lead times without a stock-out
+MIN_SALE_DAYS = 3
+
+
+# Window function
+# (first day, last day) of the window ending the day before today.
+def _window(today=None):
+    through = (today or date.today()) - timedelta(days=1)
+    return through - timedelta(days=HISTORY_DAYS - 1), through
+
+
+# Load state function
+# {part_id: [sale_days, quantity, quantity_sq]} and the last day they cover,
+# or None if there is nothing to build on.
+def _load_state(conn):
+    rows = conn.execute("SELECT part_id, sale_days, quantity, quantity_sq, through_day FROM part_demand").fetchall()
+    days = {row[4] for row in rows}
+    if len(days) != 1:
+        return {}, None
+    return {row[0]: [row[1], row[2], row[3]] for row in rows}, date.fromisoformat(days.pop())
+
+
+# Fold days function
+# Adds (sign=1) or removes (sign=-1) the rollup rows of days first..last.
+def _fold_days(conn, sums, first, last, sign):
+    for part_id, quantity in conn.execute("SELECT part_id, quantity FROM sales_daily WHERE day >= ? AND day <= ?",
+                                          (first.isoformat(), last.isoformat())):
+        state = sums.setdefault(part_id, [0, 0, 0])
+        state[0] += sign
+        state[1] += sign * quantity
+        state[2] += sign * quantity * quantity
+
+
+# Compute function
+# Vectorized over every part: returns the part_demand rows. lead_times maps
+# part IDs to their lead time in days.
+def _compute(part_ids, sums, days, through, updated_at, lead_times):
+    counts = np.array([sums.get(part_id, (0, 0, 0)) for part_id in part_ids], dtype=float).reshape(-1, 3)
+    sale_days, quantity, quantity_sq = counts[:, 0], counts[:, 1], counts[:, 2]
+    lead = np.array([lead_times.get(part_id, LEAD_TIME_DAYS) for part_id in part_ids], dtype=float)
+
+    rate = quantity / days
+    std = np.sqrt(np.maximum(quantity_sq / days - rate ** 2, 0))
+    safety = np.ceil(SERVICE_Z * std * np.sqrt(lead))
+    reorder_point = np.ceil(rate * lead) + safety
+    order_up_to = reorder_point + np.maximum(np.ceil(rate * REVIEW_DAYS), 1)
+    enough = sale_days >= MIN_SALE_DAYS
+
+    return [(part_id, int(sale_days[n]), int(quantity[n]), int(quantity_sq[n]), round(float(rate[n]), 4),
+             round(float(std[n]), 4), int(safety[n]), int(reorder_point[n]) if enough[n] else None,
+             int(order_up_to[n]) if enough[n] else None, through.isoformat(), updated_at)
+            for n, part_id in enumerate(part_ids)]
+
+
+# Refresh demand function
+# Brings part_demand and the demand-managed reorder points up to date and
+# queues any part now at or below its reorder point. Reads only the days that
+# changed since the last refresh unless full is set (or the last refresh is
+# too old to build on). Returns {'parts', 'reorder_points_changed', 'queued',
+# 'full'}, or None when it already ran today.
+def refresh_demand(full=False, today=None):
+    conn = db.get_connection()
+    first, through = _window(today)
+    with db.write_transaction(conn):
+        sums, previous = ({}, None) if full else _load_state(conn)
+        if previous == through:
+            return None
+        if previous is not None and previous < through and through - previous < timedelta(days=HISTORY_DAYS):
+            # Slide the window: add the new days, drop the ones that fell out
+            _fold_days(conn, sums, previous + timedelta(days=1), through, 1)
+            _fold_days(conn, sums, previous - timedelta(days=HISTORY_DAYS - 1), first - timedelta(days=1), -1)
+        else:
+            full = True
+            sums = {}
+            _fold_days(conn, sums, first, through, 1)
+
+        # A young shop's window starts at its first sale, not before
+        first_sale = conn.execute("SELECT MIN(day) FROM sales_daily").fetchone()[0]
+        start = max(first, date.fromisoformat(first_sale)) if first_sale else first
+        days = max((through - start).days + 1, 1)
+
+        part_ids = [row[0] for row in conn.execute("SELECT id FROM inventory ORDER BY id")]
+        lead_times = {part_id: vendor[3] for part_id, vendor in best_vendors(conn).items() if vendor[3] is not None}
+        rows = _compute(part_ids, sums, days, through, datetime.now().isoformat(), lead_times)
+        conn.execute("DELETE FROM part_demand")
+        conn.executemany("""
+            INSERT INTO part_demand (part_id, sale_days, quantity, quantity_sq, demand_rate, demand_std,
+                                     safety_stock, reorder_point, order_up_to, through_day, updated_at)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+        """, rows)
+
+        changed = conn.execute("""
+            UPDATE inventory SET reorder_point = d.reorder_point
+            FROM part_demand d
+            WHERE d.part_id = inventory.id AND inventory.demand_managed = 1
+              AND d.reorder_point IS NOT NULL AND d.reorder_point != inventory.reorder_point
+        """).rowcount
+        queued = scan_low_stock(conn)
+    if changed:
+        inventory_cache.invalidate()
+    return {'parts': len(rows), 'reorder_points_changed': changed, 'queued': queued, 'full': full}
+
+
+# Part demand function
+# The stored forecast for one part as a dict, or None.
+def part_demand(part_id):
+    cur = db.get_connection().execute("""
+        SELECT part_id, demand_rate, demand_std, safety_stock, reorder_point, order_up_to, sale_days, through_day
+        FROM part_demand WHERE part_id = ?
+    """, (part_id,))
+    row = cur.fetchone()
+    return None if row is None else dict(zip([column[0] for column in cur.description], row))
+
+
+# Use demand reorder point function
+# Hands a part's reorder point back to the forecast after set_reorder_threshold.
+def use_demand_reorder_point(part_id):
+    conn = db.get_connection()
+    with conn:
+        cur = conn.execute("""
+            UPDATE inventory SET demand_managed = 1,
+                reorder_point = COALESCE((SELECT reorder_point FROM part_demand WHERE part_id = ?), reorder_point)
+            WHERE id = ?
+        """, (part_id, part_id))
+        if cur.rowcount == 0:
+            raise PartNotFoundError(part_id)
+        queue_low_stock(conn, [part_id])
+    inventory_cache.refresh(conn, [part_id])
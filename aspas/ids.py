@@ -0,0 +1,171 @@
+# Row ID generators for ASPAS tables
+# IDs keep the shop's "<prefix>-ATIL" form followed by a fixed-width hex suffix:
+#
+#   11 hex digits  milliseconds since the epoch
+#    4 hex digits  node, random per process (never 0)
+#    4 hex digits  counter within the millisecond
+#
+# so IDs sort by creation time, never repeat within a process, and rows are
+# appended at the end of each primary key index. Rows migrated from the old
+# 3/6 digit IDs and bulk-generated rows use node 0, which no live process uses.
+
+import os
+import random
+import threading
+import time
+import uuid
+from datetime import datetime
+
+
+ID_LENGTH = len("S-ATIL") + 19
+
+_lock = threading.Lock()
+_last_ms = 0
+_seq = 0
+_node = 0
+
+
+# Reset node function
+def _reset_node():
+    global _node, _last_ms, _seq
+    _node = random.SystemRandom().randint(1, 0xFFFF)
+    _last_ms = 0
+    _seq = 0
+
+
+_reset_node()
+# A forked child (e.g. a process pool worker) must not share its parent's node
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=_reset_node)
+
+
+# Format id function
+def _format_id(prefix, millis, node, seq):
+    return f"{prefix}-ATIL{millis:011x}{node:04x}{seq:04x}"
+
+
+# Next id function
+def _next_id(prefix):
+    global _last_ms, _seq
+    with _lock:
+        now = int(time.time() * 1000)
+        if now > _last_ms:
+            _last_ms = now
+            _seq = 0
+        else:
+            # Same millisecond or the clock went backwards: keep counting
+            _seq += 1
+            if _seq > 0xFFFF:
+                _last_ms += 1
+                _seq = 0
+        return _format_id(prefix, _last_ms, _node, _seq)
+
+
+# Generate uuid function
+def generate_uuid():
+    return str(uuid.uuid4())[:8]
+
+
+# Generate inventory id function
+def generate_inventory_id():
+    return _next_id("I")
+
+
+# Generate vendor id function
+def generate_vendor_id():
+    return _next_id("V")
+
+
+# Generate sale id function
+def generate_sale_id():
+    return _next_id("S")
+
+
+# Generate purchase order id function
+def generate_purchase_order_id():
+    return _next_id("P")
+
+
+# Generate audit id function
+def generate_audit_id():
+    return _next_id("A")
+
+
+# Ids for times function
+# Time-ordered IDs with node 0 for rows created outside the live generator
+# (migrations, bulk generated data). millis_list holds each row's timestamp in
+# milliseconds; IDs come back in the same order as the input.
+def ids_for_times(prefix, millis_list):
+    ids = [None] * len(millis_list)
+    last_ms, seq = -1, 0
+    for index in sorted(range(len(millis_list)), key=millis_list.__getitem__):
+        millis = millis_list[index]
+        if millis > last_ms:
+            last_ms, seq = millis, 0
+        else:
+            seq += 1
+            if seq > 0xFFFF:
+                last_ms, seq = last_ms + 1, 0
+        ids[index] = _format_id(prefix, last_ms, 0, seq)
+    return ids
+
+
+# === MIGRATION OF LEGACY IDS ===
+
+# Parse millis function
+def _parse_millis(value, default):
+    try:
+        return int(datetime.fromisoformat(value).timestamp() * 1000)
+    except (TypeError, ValueError):
+        return default
+
+
+# Assign ids function
+# rows is a list of (old_id, millis). Returns {old_id: new_id}.
+def _assign_ids(prefix, rows):
+    new_ids = ids_for_times(prefix, [millis for _, millis in rows])
+    return {old_id: new_id for (old_id, _), new_id in zip(rows, new_ids)}
+
+
+# Migrate legacy ids function
+# Re-keys rows whose IDs predate the time-ordered scheme and rewrites the
+# references to them. Sales and audit rows get IDs from their own timestamps;
+# inventory and vendors keep their insertion order. Every old -> new pair is
+# kept in id_migration so IDs quoted in old audit details can still be traced.
+# Runs on the caller's connection without committing. Returns rows migrated.
+def migrate_legacy_ids(conn):
+    conn.execute('''CREATE TABLE IF NOT EXISTS id_migration (
+        old_id TEXT PRIMARY KEY,
+        new_id TEXT,
+        migrated_at TEXT
+    )''')
+    now_ms = int(time.time() * 1000)
+    legacy = "length(id) != ?"
+
+    rows = conn.execute(f"SELECT id FROM inventory WHERE {legacy} ORDER BY rowid", (ID_LENGTH,)).fetchall()
+    inventory = _assign_ids("I", [(old_id, now_ms) for old_id, in rows])
+
+    rows = conn.execute(f"SELECT id FROM vendors WHERE {legacy} ORDER BY rowid", (ID_LENGTH,)).fetchall()
+    vendors = _assign_ids("V", [(old_id, now_ms) for old_id, in rows])
+
+    rows = conn.execute(f"SELECT id, date FROM sales WHERE {legacy}", (ID_LENGTH,)).fetchall()
+    sales = _assign_ids("S", [(old_id, _parse_millis(date, now_ms)) for old_id, date in rows])
+
+    rows = conn.execute(f"SELECT id, timestamp FROM audit_log WHERE {legacy}", (ID_LENGTH,)).fetchall()
+    audit = _assign_ids("A", [(old_id, _parse_millis(ts, now_ms)) for old_id, ts in rows])
+
+    for table, mapping in (("inventory", inventory), ("vendors", vendors), ("sales", sales), ("audit_log", audit)):
+        conn.executemany(f"UPDATE {table} SET id = ? WHERE id = ?",
+                         [(new_id, old_id) for old_id, new_id in mapping.items()])
+
+    # Rewrite references to the re-keyed parts
+    for table in ("sales", "reorder_queue"):
+        conn.executemany(f"UPDATE {table} SET part_id = ? WHERE part_id = ?",
+                         [(new_id, old_id) for old_id, new_id in inventory.items()])
+
+    migrated_at = datetime.now().isoformat()
+    conn.executemany("INSERT OR REPLACE INTO id_migration (old_id, new_id, migrated_at) VALUES (?, ?, ?)",
+                     [(old_id, new_id, migrated_at)
+                      for mapping in (inventory, vendors, sales, audit)
+                      for old_id, new_id in mapping.items()])
+    return len(inventory) + len(vendors) + len(sales) + len(audit)
@@ -0,0 +1,196 @@
+# Bulk inventory import from CSV
+# Supplier price lists are read chunk_size lines at a time. Each chunk is
+# validated as a whole, then written with one executemany for the new parts
+# and one for the parts already stocked, all inside a single transaction:
+# either the whole file is imported or none of it is.
+#
+# A part is identified by part name + manufacturer. For a known part the
+# price is replaced and the stock is added to what is on hand (or replaces
+# it, with replace_stock=True). New parts are created with the stock as their
+# initial stock. A part listed twice in one file has its stock summed (also
+# with replace_stock) and keeps the last price.
+#
+# The CSV needs a header row; columns are matched by name, ignoring case,
+# spaces and underscores: part name, manufacturer, vehicle type (optional),
+# stock, price. The same import runs from the command line as
+# python -m aspas import-inventory.
+
+import csv
+import math
+
+from . import events, reorder
+from .audit import add_audit_log
+from .cache import inventory_cache
+from .db import get_connection, write_transaction
+from .errors import InventoryImportError, ValidationError
+from .ids import generate_inventory_id
+
+
+IMPORT_COLUMNS = ("part_name", "manufacturer", "vehicle_type", "stock", "price")
+REQUIRED_COLUMNS = ("part_name", "manufacturer", "stock", "price")
+CHUNK_SIZE = 1000
+MAX_ERRORS = 50
+
+
+# Column positions function
+# {column: index in the CSV row} from the header row.
+def _column_positions(header):
+    names = [name.strip().lower().replace(" ", "_") for name in header]
+    positions = {column: names.index(column) for column in IMPORT_COLUMNS if column in names}
+    missing = [column.replace("_", " ") for column in REQUIRED_COLUMNS if column not in positions]
+    if missing:
+        raise ValidationError(f"The CSV has no {', '.join(missing)} column.")
+    return positions
+
+
+# Validate chunk function
+# Returns ([(part_name, manufacturer, vehicle_type, stock, price)], [(line, error)])
+# for one chunk of (line number, CSV row).
+def _validate_chunk(chunk, positions):
+    width = max(positions.values()) + 1
+    vehicle = positions.get("vehicle_type")
+    valid = []
+    errors = []
+    for line, row in chunk:
+        if len(row) < width:
+            if not any(cell.strip() for cell in row):
+                continue    # blank line
+            errors.append((line, "Missing columns."))
+            continue
+        name = row[positions["part_name"]].strip()
+        manufacturer = row[positions["manufacturer"]].strip()
+        try:
+            stock = int(row[positions["stock"]])
+            price = float(row[positions["price"]])
+        except ValueError:
+            errors.append((line, "Stock and price must be numbers."))
+            continue
+        if not name:
+            errors.append((line, "Part name is empty."))
+        elif stock < 0:
+            errors.append((line, "Stock must be a positive number."))
+        elif price < 0 or not math.isfinite(price):
+            errors.append((line, "Price must be a valid number."))
+        else:
+            valid.append((name, manufacturer, row[vehicle].strip() if vehicle is not None else "", stock, price))
+    return valid, errors
+
+
+# Write chunk function
+# Upserts one validated chunk on the caller's transaction. seen maps each
+# (part name, manufacturer) already imported from this file to
+# [part ID, stock in the file so far, created by this import]. Returns the
+# number of parts added.
+def _write_chunk(conn, rows, seen, replace_stock, reorder_ratio):
+    merged = {}
+    for name, manufacturer, vehicle_type, stock, price in rows:
+        key = (name, manufacturer)
+        if key in merged:
+            previous = merged[key]
+            merged[key] = (vehicle_type or previous[0], previous[1] + stock, price)
+        else:
+            merged[key] = (vehicle_type, stock, price)
+
+    for key in merged:
+        if key not in seen:
+            # The lowest ID wins if a part is already listed twice
+            part_id = conn.execute("SELECT MIN(id) FROM inventory WHERE part_name = ? AND manufacturer = ?",
+                                   key).fetchone()[0]
+            if part_id is not None:
+                seen[key] = [part_id, 0, False]
+
+    inserts = []
+    updates = []
+    created = []
+    for key, (vehicle_type, stock, price) in merged.items():
+        state = seen.get(key)
+        if state is None:
+            part_id = generate_inventory_id()
+            seen[key] = [part_id, stock, True]
+            inserts.append((part_id, key[0], key[1], vehicle_type, stock, price, stock,
+                            reorder.reorder_point_for(stock, reorder_ratio)))
+            continue
+        # Lines of one part are summed across the whole file, whatever chunk
+        # they fall in
+        part_id, total, new = state
+        state[1] = total + stock
+        if new:
+            created.append((state[1], price, state[1], reorder.reorder_point_for(state[1], reorder_ratio), part_id))
+        elif replace_stock:
+            updates.append((state[1], price, part_id))
+        else:
+            updates.append((stock, price, part_id))
+
+    conn.executemany("""
+        INSERT INTO inventory (id, part_name, manufacturer, vehicle_type, stock, price, initial_stock, reorder_point)
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+    """, inserts)
+    stock_value = "?" if replace_stock else "stock + ?"
+    conn.executemany(f"UPDATE inventory SET stock = {stock_value}, price = ? WHERE id = ?", updates)
+    conn.executemany("UPDATE inventory SET stock = ?, price = ?, initial_stock = ?, reorder_point = ? WHERE id = ?",
+                     created)
+    return len(inserts)
+
+
+# Import inventory csv function
+# Returns {'rows', 'added', 'updated', 'skipped', 'errors', 'part_ids'}.
+# Invalid lines abort the import with InventoryImportError (listing up to
+# MAX_ERRORS of them) unless skip_invalid is set, in which case they are
+# left out and reported in 'errors'. progress(lines read) is called after
+# every chunk.
+def import_inventory_csv(path, replace_stock=False, skip_invalid=False, reorder_ratio=reorder.DEFAULT_REORDER_RATIO,
+                         progress=None, chunk_size=CHUNK_SIZE):
+    conn = get_connection()
+    seen = {}
+    errors = []
+    counts = {'rows': 0, 'added': 0, 'updated': 0, 'skipped': 0}
+    with open(path, newline='', encoding='utf-8-sig') as f:
+        reader = csv.reader(f)
+        header = next(reader, None)
+        if header is None:
+            raise ValidationError("The CSV file is empty.")
+        positions = _column_positions(header)
+
+        with write_transaction(conn):
+            line = 1
+            while True:
+                chunk = []
+                for row in reader:
+                    line += 1
+                    chunk.append((line, row))
+                    if len(chunk) == chunk_size:
+                        break
+                if not chunk:
+                    break
+
+                rows, chunk_errors = _validate_chunk(chunk, positions)
+                errors.extend(chunk_errors)
+                # After a bad line nothing more is written (it would be rolled
+                # back), but the rest is still read to report every bad line
+                if skip_invalid or not errors:
+                    counts['added'] += _write_chunk(conn, rows, seen, replace_stock, reorder_ratio)
+                counts['rows'] += len(rows)
+                counts['skipped'] += len(chunk_errors)
+                if progress:
+                    progress(line - 1)
+
+            if errors and not skip_invalid:
+                raise InventoryImportError(errors[:MAX_ERRORS], len(errors))
+            counts['updated'] = len(seen) - counts['added']
+
+            # Stock may have gone down (replace_stock): queue parts now at or
+            # below their reorder point, as a sale would
+            updated = [part_id for part_id, _, new in seen.values() if not new]
+            for start in range(0, len(updated), chunk_size):
+                reorder.queue_low_stock(conn, updated[start:start + chunk_size])
+
+            # One summary entry for the whole file
+            add_audit_log("IMPORT_INVENTORY", f"Imported {counts['rows']} inventory lines from {path}: "
+                                              f"{counts['added']} parts added, {counts['updated']} updated, "
+                                              f"{counts['skipped']} invalid lines skipped", conn=conn)
+
+    # Too many rows to write through one by one
+    inventory_cache.invalidate()
+    part_ids = [part_id for part_id, _, _ in seen.values()]
+    events.emit(events.INVENTORY_CHANGED, {'action': 'import', 'part_ids': part_ids})
+    return {**counts, 'errors': errors, 'part_ids': part_ids}
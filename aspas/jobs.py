@@ -0,0 +1,185 @@
+# Background jobs for slow report queries
+# A JobExecutor runs job functions on worker threads. Each job runs on a
+# connection borrowed from the read pool (or, with readonly=False, the worker
+# thread's own connection), bound so db.get_connection() returns it on that
+# thread, and the engine's query functions can be called from a job unchanged.
+#
+# A job function receives its Job and may call job.partial(items) to stream
+# results and job.progress(done, total) to report progress. The callbacks
+# (on_partial, on_progress, on_done, on_error, on_cancel) are not run on the
+# worker: they go through the executor's dispatch function, which for a Tk
+# front end is a UIDispatcher that runs them from the Tk event loop.
+#
+# Job.cancel() stops a running query immediately (connection.interrupt plus a
+# progress handler) and makes job.check() raise JobCancelled between steps.
+
+import queue
+import sqlite3
+import threading
+import traceback
+from concurrent.futures import ThreadPoolExecutor
+
+from . import db
+from .errors import JobCancelled
+
+
+# Opcodes between checks of the cancel flag while a query is running
+_PROGRESS_OPCODES = 10000
+
+
+class Job:
+    def __init__(self, fn, dispatch, callbacks):
+        self.fn = fn
+        self._dispatch = dispatch
+        self._callbacks = callbacks
+        self._cancel = threading.Event()
+        self.conn = None
+
+    @property
+    def cancelled(self):
+        return self._cancel.is_set()
+
+    # Cancel function (any thread)
+    def cancel(self):
+        self._cancel.set()
+        conn = self.conn
+        if conn is not None:
+            conn.interrupt()
+
+    # Check function (worker)
+    def check(self):
+        if self.cancelled:
+            raise JobCancelled("Job cancelled.")
+
+    # Partial results function (worker)
+    def partial(self, items):
+        self.check()
+        self._post('on_partial', items)
+
+    # Progress function (worker)
+    def progress(self, done, total=None):
+        self._post('on_progress', done, total)
+
+    # Post function
+    def _post(self, name, *args):
+        callback = self._callbacks.get(name)
+        if callback is not None:
+            self._dispatch(callback, *args)
+
+
+class JobExecutor:
+    def __init__(self, workers=2, dispatch=None, readonly=True):
+        # Without a dispatcher callbacks run on the worker thread
+        self.dispatch = dispatch or (lambda callback, *args: callback(*args))
+        self.readonly = readonly
+        self._jobs = set()
+        self._lock = threading.Lock()
+        self._pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="aspas-job")
+
+    # Submit function
+    # Returns the Job, which can be cancelled at any time.
+    def submit(self, fn, on_done=None, on_partial=None, on_progress=None, on_error=None, on_cancel=None):
+        job = Job(fn, self.dispatch, {'on_done': on_done, 'on_partial': on_partial, 'on_progress': on_progress,
+                                      'on_error': on_error, 'on_cancel': on_cancel})
+        with self._lock:
+            self._jobs.add(job)
+        self._pool.submit(self._run, job)
+        return job
+
+    # Run function (worker)
+    def _run(self, job):
+        try:
+            if job.cancelled:
+                job._post('on_cancel')
+                return
+            if self.readonly:
+                with db.read_connection() as conn:
+                    db.bind_thread_connection(conn)
+                    try:
+                        self._run_on(job, conn)
+                    finally:
+                        db.bind_thread_connection(None)
+            else:
+                self._run_on(job, db.get_connection())
+        except Exception as e:
+            # No connection could be had for the job
+            job._post('on_error', e)
+        finally:
+            with self._lock:
+                self._jobs.discard(job)
+
+    # Run on function (worker)
+    def _run_on(self, job, conn):
+        job.conn = conn
+        conn.set_progress_handler(lambda: 1 if job.cancelled else 0, _PROGRESS_OPCODES)
+        try:
+            result = job.fn(job)
+            job.check()
+        except JobCancelled:
+            job._post('on_cancel')
+        except sqlite3.OperationalError as e:
+            # An interrupted query surfaces as OperationalError
+            if job.cancelled:
+                job._post('on_cancel')
+            else:
+                job._post('on_error', e)
+        except Exception as e:
+            job._post('on_error', e)
+        else:
+            job._post('on_done', result)
+        finally:
+            job.conn = None
+            conn.set_progress_handler(None, 0)
+            if conn.in_transaction:
+                conn.rollback()
+
+    # Cancel all function
+    def cancel_all(self):
+        with self._lock:
+            jobs = list(self._jobs)
+        for job in jobs:
+            job.cancel()
+
+    # Shutdown function
+    def shutdown(self, cancel=True):
+        if cancel:
+            self.cancel_all()
+        self._pool.shutdown(wait=False)
+
+
+class UIDispatcher:
+    # Queues callbacks from worker threads and runs them from a UI event loop.
+    # widget only needs Tk's after(ms, func) method.
+
+    def __init__(self, widget, interval_ms=30):
+        self.widget = widget
+        self.interval_ms = interval_ms
+        self._queue = queue.SimpleQueue()
+        self._running = False
+
+    def __call__(self, callback, *args):
+        self._queue.put((callback, args))
+
+    # Start function (UI thread)
+    def start(self):
+        self._running = True
+        self._pump()
+
+    # Stop function (UI thread)
+    def stop(self):
+        self._running = False
+
+    # Pump function (UI thread)
+    def _pump(self):
+        while True:
+            try:
+                callback, args = self._queue.get_nowait()
+            except queue.Empty:
+                break
+            try:
+                callback(*args)
+            except Exception:
+                # One failing callback must not stop the pump
+                traceback.print_exc()
+        if self._running:
+            self.widget.after(self.interval_ms, self._pump)
@@ -0,0 +1,356 @@
+# Versioned schema migrations for aspas.db
+# Each migration runs once, in its own transaction, and is recorded in the
+# schema_version table. Migrations are written to be safe on databases created
+# before schema_version existed (CREATE ... IF NOT EXISTS, column checks), so
+# an old aspas.db simply starts from version 0.
+#
+# To change the schema, append a new (version, description, function) entry to
+# MIGRATIONS. Never edit a migration that has already shipped. A migration
+# spells out its own DDL and backfill rather than calling the module that now
+# owns the table, so later changes to that module cannot change what an old
+# migration does on a new database.
+
+import sqlite3
+from datetime import datetime
+
+from .ids import migrate_legacy_ids
+
+
+# Add column function
+# Adds the column if the table does not have it yet. Returns True if added.
+def _add_column(conn, table, column, declaration):
+    columns = [row[1] for row in conn.execute(f"PRAGMA table_info({table})")]
+    if column in columns:
+        return False
+    conn.execute(f"ALTER TABLE {table} ADD COLUMN {column} {declaration}")
+    return True
+
+
+# Migration 1: base tables
+def _migration_001_base(conn):
+    conn.execute('''CREATE TABLE IF NOT EXISTS inventory (
+        id TEXT PRIMARY KEY,
+        part_name TEXT,
+        manufacturer TEXT,
+        vehicle_type TEXT,
+        stock INTEGER,
+        price REAL,
+        initial_stock INTEGER DEFAULT 0 
+    )''')
+    conn.execute('''CREATE TABLE IF NOT EXISTS vendors (
+        id TEXT PRIMARY KEY,
+        name TEXT,
+        contact TEXT,
+        parts TEXT
+    )''')
+    conn.execute('''CREATE TABLE IF NOT EXISTS sales (
+        id TEXT PRIMARY KEY,
+        part_id TEXT,
+        quantity INTEGER,
+        amount REAL,
+        date TEXT,
+        payment_method TEXT
+    )''')
+    conn.execute('''CREATE TABLE IF NOT EXISTS users (
+        username TEXT PRIMARY KEY,
+        password TEXT,
+        role TEXT
+    )''')
+
+    # Create audit log table
+    conn.execute('''CREATE TABLE IF NOT EXISTS audit_log (
+        id TEXT PRIMARY KEY,
+        action_type TEXT,
+        action_details TEXT,
+        timestamp TEXT,
+        username TEXT,
+        user_role TEXT
+    )''')
+
+
+# Migration 2: per-part reorder points and the reorder queue
+def _migration_002_reorder(conn):
+    # Indexed so low-stock parts can be found without scanning the whole inventory
+    if _add_column(conn, "inventory", "reorder_point", "INTEGER"):
+        conn.execute("UPDATE inventory SET reorder_point = CAST(initial_stock * 0.3 AS INTEGER)")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_inventory_reorder ON inventory(stock - reorder_point)")
+
+    # Reorder suggestions waiting to be applied
+    conn.execute('''CREATE TABLE IF NOT EXISTS reorder_queue (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        part_id TEXT,
+        stock INTEGER,
+        reorder_point INTEGER,
+        order_quantity INTEGER,
+        status TEXT DEFAULT 'pending',
+        created_at TEXT,
+        applied_at TEXT
+    )''')
+    # At most one pending suggestion per part
+    conn.execute("""CREATE UNIQUE INDEX IF NOT EXISTS idx_reorder_queue_pending
+        ON reorder_queue(part_id) WHERE status = 'pending'""")
+
+
+# Migration 3: re-key rows created with the old short random IDs
+def _migration_003_ids(conn):
+    migrate_legacy_ids(conn)
+
+
+# Migration 4: indexes for the report, demand and audit filters
+def _migration_004_indexes(conn):
+    # Sales by date range (reports, charts) and by part over a date range (weekly
+    # demand, joins from inventory); both cover the columns those queries read
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_sales_date ON sales(date, part_id, quantity, amount)")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_sales_part_date ON sales(part_id, date, quantity, amount)")
+
+    # Audit viewer filters, newest first
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_audit_timestamp ON audit_log(timestamp)")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_audit_action_timestamp ON audit_log(action_type, timestamp)")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_audit_user_timestamp ON audit_log(username, timestamp)")
+
+
+# Migration 5: daily, weekly and monthly sales rollups, backfilled from sales
+def _migration_005_rollups(conn):
+    conn.execute('''CREATE TABLE IF NOT EXISTS sales_daily (
+        day TEXT,
+        part_id TEXT,
+        sale_count INTEGER,
+        quantity INTEGER,
+        revenue REAL,
+        PRIMARY KEY (day, part_id)
+    )''')
+    conn.execute('''CREATE TABLE IF NOT EXISTS sales_weekly (
+        week TEXT,
+        part_id TEXT,
+        sale_count INTEGER,
+        quantity INTEGER,
+        revenue REAL,
+        PRIMARY KEY (week, part_id)
+    )''')
+    conn.execute('''CREATE TABLE IF NOT EXISTS sales_monthly (
+        month TEXT PRIMARY KEY,
+        sale_count INTEGER,
+        quantity INTEGER,
+        revenue REAL
+    )''')
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_sales_daily_part ON sales_daily(part_id, day)")
+
+    for table in ("sales_daily", "sales_weekly", "sales_monthly"):
+        conn.execute(f"DELETE FROM {table}")
+    conn.execute('''INSERT INTO sales_daily (day, part_id, sale_count, quantity, revenue)
+        SELECT strftime('%Y-%m-%d', date), part_id, COUNT(*), SUM(quantity), COALESCE(SUM(amount), 0)
+        FROM sales WHERE date IS NOT NULL
+        GROUP BY strftime('%Y-%m-%d', date), part_id''')
+    conn.execute('''INSERT INTO sales_weekly (week, part_id, sale_count, quantity, revenue)
+        SELECT strftime('%Y-%W', date), part_id, COUNT(*), SUM(quantity), COALESCE(SUM(amount), 0)
+        FROM sales WHERE date IS NOT NULL
+        GROUP BY strftime('%Y-%W', date), part_id''')
+    conn.execute('''INSERT INTO sales_monthly (month, sale_count, quantity, revenue)
+        SELECT strftime('%Y-%m', date), COUNT(*), SUM(quantity), COALESCE(SUM(amount), 0)
+        FROM sales WHERE date IS NOT NULL
+        GROUP BY strftime('%Y-%m', date)''')
+
+
+# Create fts5 function
+# Runs a CREATE VIRTUAL TABLE ... USING fts5. Returns False (and creates
+# nothing) when this SQLite has no FTS5; search then falls back to LIKE.
+def _create_fts5(conn, ddl):
+    try:
+        conn.execute(ddl)
+    except sqlite3.OperationalError as e:
+        if "fts5" not in str(e):
+            raise
+        return False
+    return True
+
+
+# Migration 6: type-ahead part search index
+def _migration_006_search(conn):
+    if not _create_fts5(conn, '''CREATE VIRTUAL TABLE IF NOT EXISTS inventory_search USING fts5(
+        id, part_name, manufacturer, vehicle_type,
+        content='inventory', content_rowid='rowid', prefix='1 2 3'
+    )'''):
+        return
+    conn.execute('''CREATE TRIGGER IF NOT EXISTS inventory_search_insert AFTER INSERT ON inventory BEGIN
+        INSERT INTO inventory_search (rowid, id, part_name, manufacturer, vehicle_type)
+        VALUES (new.rowid, new.id, new.part_name, new.manufacturer, new.vehicle_type);
+    END''')
+    conn.execute('''CREATE TRIGGER IF NOT EXISTS inventory_search_delete AFTER DELETE ON inventory BEGIN
+        INSERT INTO inventory_search (inventory_search, rowid, id, part_name, manufacturer, vehicle_type)
+        VALUES ('delete', old.rowid, old.id, old.part_name, old.manufacturer, old.vehicle_type);
+    END''')
+    conn.execute('''CREATE TRIGGER IF NOT EXISTS inventory_search_update
+        AFTER UPDATE OF id, part_name, manufacturer, vehicle_type ON inventory BEGIN
+        INSERT INTO inventory_search (inventory_search, rowid, id, part_name, manufacturer, vehicle_type)
+        VALUES ('delete', old.rowid, old.id, old.part_name, old.manufacturer, old.vehicle_type);
+        INSERT INTO inventory_search (rowid, id, part_name, manufacturer, vehicle_type)
+        VALUES (new.rowid, new.id, new.part_name, new.manufacturer, new.vehicle_type);
+    END''')
+    conn.execute("INSERT INTO inventory_search (inventory_search) VALUES ('rebuild')")
+
+
+# Migration 7: distinct action types and usernames for the audit filters,
+# kept up to date by a trigger and backfilled from the log
+def _migration_007_audit_filter_values(conn):
+    conn.execute('''CREATE TABLE IF NOT EXISTS audit_filter_values (
+        field TEXT,
+        value TEXT,
+        PRIMARY KEY (field, value)
+    ) WITHOUT ROWID''')
+    conn.execute('''CREATE TRIGGER IF NOT EXISTS audit_filter_values_insert AFTER INSERT ON audit_log BEGIN
+        INSERT OR IGNORE INTO audit_filter_values (field, value)
+            SELECT 'action_type', new.action_type WHERE new.action_type IS NOT NULL;
+        INSERT OR IGNORE INTO audit_filter_values (field, value)
+            SELECT 'username', new.username WHERE new.username IS NOT NULL;
+    END''')
+    conn.execute('''INSERT OR IGNORE INTO audit_filter_values (field, value)
+        SELECT DISTINCT 'action_type', action_type FROM audit_log WHERE action_type IS NOT NULL''')
+    conn.execute('''INSERT OR IGNORE INTO audit_filter_values (field, value)
+        SELECT DISTINCT 'username', username FROM audit_log WHERE username IS NOT NULL''')
+
+
+# Migration 8: audit viewer keyset pages on (timestamp, id) and details search
+def _migration_008_audit_paging(conn):
+    # The id tie-breaker in each index lets a page resume exactly where the last one ended
+    for old in ("idx_audit_timestamp", "idx_audit_action_timestamp", "idx_audit_user_timestamp"):
+        conn.execute(f"DROP INDEX IF EXISTS {old}")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_audit_timestamp_id ON audit_log(timestamp, id)")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_audit_action_timestamp_id ON audit_log(action_type, timestamp, id)")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_audit_user_timestamp_id ON audit_log(username, timestamp, id)")
+
+    if not _create_fts5(conn, '''CREATE VIRTUAL TABLE IF NOT EXISTS audit_log_search USING fts5(
+        action_details,
+        content='audit_log', content_rowid='rowid'
+    )'''):
+        return
+    conn.execute('''CREATE TRIGGER IF NOT EXISTS audit_log_search_insert AFTER INSERT ON audit_log BEGIN
+        INSERT INTO audit_log_search (rowid, action_details) VALUES (new.rowid, new.action_details);
+    END''')
+    conn.execute('''CREATE TRIGGER IF NOT EXISTS audit_log_search_delete AFTER DELETE ON audit_log BEGIN
+        INSERT INTO audit_log_search (audit_log_search, rowid, action_details)
+        VALUES ('delete', old.rowid, old.action_details);
+    END''')
+    conn.execute("INSERT INTO audit_log_search (audit_log_search) VALUES ('rebuild')")
+
+
+# Migration 9: parts by name and manufacturer, for bulk imports
+def _migration_009_part_name_index(conn):
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_inventory_name_manufacturer ON inventory(part_name, manufacturer)")
+
+
+# Migration 10: demand forecasts and demand-driven reorder points
+def _migration_010_demand(conn):
+    conn.execute('''CREATE TABLE IF NOT EXISTS part_demand (
+        part_id TEXT PRIMARY KEY,
+        sale_days INTEGER,
+        quantity INTEGER,
+        quantity_sq INTEGER,
+        demand_rate REAL,
+        demand_std REAL,
+        safety_stock INTEGER,
+        reorder_point INTEGER,
+        order_up_to INTEGER,
+        through_day TEXT,
+        updated_at TEXT
+    )''')
+    # 0 once a threshold is set by hand; forecasts then leave the part alone
+    _add_column(conn, "inventory", "demand_managed", "INTEGER NOT NULL DEFAULT 1")
+
+
+# Migration 11: vendor-part catalog, filled from the vendors.parts text
+def _migration_011_vendor_parts(conn):
+    conn.execute('''CREATE TABLE IF NOT EXISTS vendor_parts (
+        vendor_id TEXT NOT NULL,
+        part_id TEXT NOT NULL,
+        unit_cost REAL,
+        lead_time_days INTEGER,
+        PRIMARY KEY (vendor_id, part_id)
+    ) WITHOUT ROWID''')
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_vendor_parts_part ON vendor_parts(part_id, unit_cost)")
+
+    # Link each vendor to every part named in its comma-separated parts text,
+    # ignoring case and surrounding spaces
+    part_ids = {}
+    for part_id, part_name in conn.execute("SELECT id, part_name FROM inventory"):
+        part_ids.setdefault((part_name or "").strip().lower(), []).append(part_id)
+    links = []
+    for vendor_id, parts in conn.execute("SELECT id, parts FROM vendors").fetchall():
+        names = {name.strip().lower() for name in (parts or "").split(",") if name.strip()}
+        links.extend((vendor_id, part_id) for name in names for part_id in part_ids.get(name, ()))
+    conn.executemany("INSERT OR IGNORE INTO vendor_parts (vendor_id, part_id) VALUES (?, ?)", links)
+
+
+# Migration 12: purchase orders, one draft at a time per vendor
+def _migration_012_purchase_orders(conn):
+    conn.execute('''CREATE TABLE IF NOT EXISTS purchase_orders (
+        id TEXT PRIMARY KEY,
+        vendor_id TEXT,
+        status TEXT NOT NULL DEFAULT 'draft',
+        created_at TEXT,
+        sent_at TEXT,
+        received_at TEXT,
+        cancelled_at TEXT
+    )''')
+    conn.execute("""CREATE UNIQUE INDEX IF NOT EXISTS idx_purchase_orders_draft
+        ON purchase_orders(COALESCE(vendor_id, '')) WHERE status = 'draft'""")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_purchase_orders_status ON purchase_orders(status)")
+    conn.execute('''CREATE TABLE IF NOT EXISTS purchase_order_lines (
+        po_id TEXT NOT NULL,
+        part_id TEXT NOT NULL,
+        quantity INTEGER NOT NULL,
+        unit_cost REAL,
+        received_quantity INTEGER,
+        PRIMARY KEY (po_id, part_id)
+    ) WITHOUT ROWID''')
+    # Finds a part's open orders when deciding whether to reorder it
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_purchase_order_lines_part ON purchase_order_lines(part_id)")
+
+
+MIGRATIONS = [
+    (1, "base tables", _migration_001_base),
+    (2, "reorder points and reorder queue", _migration_002_reorder),
+    (3, "time-ordered row ids", _migration_003_ids),
+    (4, "indexes for sales and audit filters", _migration_004_indexes),
+    (5, "sales rollup tables", _migration_005_rollups),
+    (6, "part search index", _migration_006_search),
+    (7, "audit filter values", _migration_007_audit_filter_values),
+    (8, "audit log paging indexes and search", _migration_008_audit_paging),
+    (9, "part name and manufacturer index", _migration_009_part_name_index),
+    (10, "demand forecasts", _migration_010_demand),
+    (11, "vendor-part catalog", _migration_011_vendor_parts),
+    (12, "purchase orders", _migration_012_purchase_orders),
+]
+
+
+# Current version function
+def current_version(conn):
+    conn.execute('''CREATE TABLE IF NOT EXISTS schema_version (
+        version INTEGER PRIMARY KEY,
+        description TEXT,
+        applied_at TEXT
+    )''')
+    return conn.execute("SELECT COALESCE(MAX(version), 0) FROM schema_version").fetchone()[0]
+
+
+# Migrate function
+# Applies every migration newer than the database. Returns the versions applied.
+def migrate(conn):
+    version = current_version(conn)
+    conn.commit()
+
+    applied = []
+    for number, description, migration in MIGRATIONS:
+        if number <= version:
+            continue
+        # Explicit BEGIN so the DDL and data changes commit or roll back together
+        conn.execute("BEGIN")
+        try:
+            migration(conn)
+            conn.execute("INSERT INTO schema_version (version, description, applied_at) VALUES (?, ?, ?)",
+                         (number, description, datetime.now().isoformat()))
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+        applied.append(number)
+    return applied
@@ -0,0 +1,111 @@
+# Keyset pagination over the inventory, sales and audit log tables
+# Pages are fetched with "key > last key seen ORDER BY key LIMIT n" so reading
+# any page costs the same no matter how far into the table it is, and single
+# rows can be re-read by key when one part or sale changes.
+
+from .db import get_connection
+from .exports import audit_log_query
+
+
+class KeysetTable:
+    def __init__(self, select, key_column):
+        # select must not have WHERE / ORDER BY / LIMIT clauses of its own
+        self.select = select
+        self.key_column = key_column
+
+    # First page function
+    def first_page(self, limit):
+        return get_connection().execute(
+            f"{self.select} ORDER BY {self.key_column} LIMIT ?", (limit,)).fetchall()
+
+    # Page after function
+    def page_after(self, key, limit):
+        return get_connection().execute(
+            f"{self.select} WHERE {self.key_column} > ? ORDER BY {self.key_column} LIMIT ?",
+            (key, limit)).fetchall()
+
+    # Page before function
+    # Rows come back in ascending key order, ending just before key.
+    def page_before(self, key, limit):
+        rows = get_connection().execute(
+            f"{self.select} WHERE {self.key_column} < ? ORDER BY {self.key_column} DESC LIMIT ?",
+            (key, limit)).fetchall()
+        rows.reverse()
+        return rows
+
+    # Get rows function
+    # Returns {key: row} for the keys that still exist.
+    def get_rows(self, keys):
+        keys = list(keys)
+        if not keys:
+            return {}
+        placeholders = ", ".join("?" * len(keys))
+        rows = get_connection().execute(
+            f"{self.select} WHERE {self.key_column} IN ({placeholders})", keys).fetchall()
+        return {row[0]: row for row in rows}
+
+
+INVENTORY_TABLE = KeysetTable(
+    "SELECT id, part_name, manufacturer, vehicle_type, stock, price FROM inventory",
+    "id")
+
+SALES_TABLE = KeysetTable("""
+    SELECT s.id, s.part_id, s.quantity, i.price as unit_price, s.amount, s.date, s.payment_method
+    FROM sales s
+    JOIN inventory i ON s.part_id = i.id
+""", "s.id")
+
+
+class AuditLogTable:
+    # The audit log newest first, with the audit viewer's filters applied.
+    # Keys are entry IDs; pages continue from the (timestamp, id) of that entry.
+
+    def __init__(self, action_type=None, username=None, start=None, end=None, text=None):
+        self.filters = (action_type, username, None)
+        self.range = dict(start=start, end=end, text=text)
+
+    # Query function
+    def _query(self, columns="*"):
+        return audit_log_query(*self.filters, columns, **self.range)
+
+    # Page function
+    # Rows past (timestamp, id) in the given direction, newest first.
+    def _page(self, key, limit, newer):
+        query, params = self._query()
+        if key is not None:
+            query += f" AND (timestamp, id) {'>' if newer else '<'} (SELECT timestamp, id FROM audit_log WHERE id = ?)"
+            params.append(key)
+        order = "ASC" if newer else "DESC"
+        rows = get_connection().execute(f"{query} ORDER BY timestamp {order}, id {order} LIMIT ?",
+                                        params + [limit]).fetchall()
+        if newer:
+            rows.reverse()
+        return rows
+
+    # First page function
+    def first_page(self, limit):
+        return self._page(None, limit, False)
+
+    # Page after function
+    # The next older entries.
+    def page_after(self, key, limit):
+        return self._page(key, limit, False)
+
+    # Page before function
+    # The next newer entries, still newest first.
+    def page_before(self, key, limit):
+        return self._page(key, limit, True)
+
+    # Get rows function
+    def get_rows(self, keys):
+        keys = list(keys)
+        if not keys:
+            return {}
+        query, params = self._query()
+        query += f" AND id IN ({', '.join('?' * len(keys))})"
+        return {row[0]: row for row in get_connection().execute(query, params + keys)}
+
+    # Count function
+    # Matching entries, counted on the indexes without reading the rows.
+    def count(self):
+        return get_connection().execute(*self._query("COUNT(*)")).fetchone()[0]
@@ -0,0 +1,164 @@
+# Purchase orders
+# Reorders no longer top stock up on the spot. Each low-stock part becomes a
+# line on its best vendor's open (draft) purchase order, so one check that
+# finds 200 low parts writes a handful of orders in a single transaction.
+# Parts without a vendor go on an order with no vendor. An order then moves
+#
+#   draft -> sent -> received
+#
+# (or to cancelled before it is received). Lines can only be added while an
+# order is a draft, and there is at most one draft per vendor. Stock goes up
+# when an order is received, for every line in one transaction. A part on a
+# draft or sent order is not reordered again until that order is received or
+# cancelled.
+
+from datetime import datetime
+
+from . import events
+from .audit import add_audit_log, insert_audit_logs
+from .cache import inventory_cache
+from .db import get_connection, write_transaction
+from .errors import PurchaseOrderNotFoundError, ValidationError
+from .ids import generate_purchase_order_id
+from .suppliers import best_vendors
+
+
+PO_STATUSES = ("draft", "sent", "received", "cancelled")
+
+# Allowed moves: new status -> the statuses an order may be in before it
+_TRANSITIONS = {
+    'sent': ('draft',),
+    'received': ('sent',),
+    'cancelled': ('draft', 'sent'),
+}
+
+# True when the inventory row aliased i is on an open purchase order
+ON_ORDER = """EXISTS (SELECT 1 FROM purchase_order_lines l JOIN purchase_orders p ON p.id = l.po_id
+                      WHERE l.part_id = i.id AND p.status IN ('draft', 'sent'))"""
+
+
+# Add order lines function
+# Puts each (part_id, part_name, quantity) on its best vendor's draft order,
+# opening drafts as needed. Runs on the caller's transaction. Returns one dict
+# per line with the order and vendor it went to.
+def add_order_lines(conn, lines):
+    if not lines:
+        return []
+    vendors = best_vendors(conn, [part_id for part_id, _, _ in lines])
+    drafts = {vendor_id: po_id for po_id, vendor_id in conn.execute(
+        "SELECT id, vendor_id FROM purchase_orders WHERE status = 'draft'")}
+
+    now = datetime.now().isoformat()
+    new_orders = []
+    rows = []
+    added = []
+    for part_id, part_name, quantity in lines:
+        vendor_id, vendor_name, unit_cost, _ = vendors.get(part_id, (None, None, None, None))
+        if vendor_id not in drafts:
+            drafts[vendor_id] = generate_purchase_order_id()
+            new_orders.append((drafts[vendor_id], vendor_id, now))
+        rows.append((drafts[vendor_id], part_id, quantity, unit_cost))
+        added.append({'po_id': drafts[vendor_id], 'part_id': part_id, 'part_name': part_name,
+                      'quantity': quantity, 'vendor_id': vendor_id, 'vendor_name': vendor_name,
+                      'unit_cost': unit_cost})
+
+    conn.executemany("INSERT INTO purchase_orders (id, vendor_id, status, created_at) VALUES (?, ?, 'draft', ?)",
+                     new_orders)
+    # A part already on the draft keeps the larger quantity
+    conn.executemany("""
+        INSERT INTO purchase_order_lines (po_id, part_id, quantity, unit_cost) VALUES (?, ?, ?, ?)
+        ON CONFLICT (po_id, part_id) DO UPDATE SET quantity = MAX(quantity, excluded.quantity)
+    """, rows)
+    return added
+
+
+# List purchase orders function
+# [(po_id, vendor_id, vendor_name, status, lines, units, total cost,
+#   created_at, sent_at, received_at)], newest first. status may be one status
+# or a list of them.
+def list_purchase_orders(status=None):
+    query = """
+        SELECT p.id, p.vendor_id, v.name, p.status, COUNT(l.part_id), COALESCE(SUM(l.quantity), 0),
+               ROUND(COALESCE(SUM(l.quantity * l.unit_cost), 0), 2), p.created_at, p.sent_at, p.received_at
+        FROM purchase_orders p
+        LEFT JOIN vendors v ON v.id = p.vendor_id
+        LEFT JOIN purchase_order_lines l ON l.po_id = p.id
+    """
+    params = []
+    if status:
+        statuses = [status] if isinstance(status, str) else list(status)
+        query += f" WHERE p.status IN ({', '.join('?' * len(statuses))})"
+        params.extend(statuses)
+    query += " GROUP BY p.id ORDER BY p.id DESC"
+    return get_connection().execute(query, params).fetchall()
+
+
+# Purchase order lines function
+# [(part_id, part_name, quantity, unit_cost, received_quantity)] by part name.
+def purchase_order_lines(po_id):
+    return get_connection().execute("""
+        SELECT l.part_id, i.part_name, l.quantity, l.unit_cost, l.received_quantity
+        FROM purchase_order_lines l
+        LEFT JOIN inventory i ON i.id = l.part_id
+        WHERE l.po_id = ?
+        ORDER BY i.part_name, l.part_id
+    """, (po_id,)).fetchall()
+
+
+# Move function
+# Moves an order to status on the caller's transaction; returns its vendor ID.
+def _move(conn, po_id, status, column):
+    row = conn.execute("SELECT status, vendor_id FROM purchase_orders WHERE id = ?", (po_id,)).fetchone()
+    if row is None:
+        raise PurchaseOrderNotFoundError(po_id)
+    if row[0] not in _TRANSITIONS[status]:
+        raise ValidationError(f"Purchase order {po_id} is {row[0]}; it cannot be {status}.")
+    conn.execute(f"UPDATE purchase_orders SET status = ?, {column} = ? WHERE id = ?",
+                 (status, datetime.now().isoformat(), po_id))
+    return row[1]
+
+
+# Send purchase order function
+def send_purchase_order(po_id):
+    with write_transaction() as conn:
+        vendor_id = _move(conn, po_id, 'sent', 'sent_at')
+        add_audit_log("SEND_PURCHASE_ORDER", f"Sent purchase order {po_id} to vendor {vendor_id or '(none)'}",
+                      conn=conn)
+    events.emit(events.PURCHASE_ORDERS_CHANGED, {'action': 'send', 'po_ids': [po_id]})
+
+
+# Cancel purchase order function
+# Its parts can be reordered again.
+def cancel_purchase_order(po_id):
+    with write_transaction() as conn:
+        _move(conn, po_id, 'cancelled', 'cancelled_at')
+        add_audit_log("CANCEL_PURCHASE_ORDER", f"Cancelled purchase order {po_id}", conn=conn)
+    events.emit(events.PURCHASE_ORDERS_CHANGED, {'action': 'cancel', 'po_ids': [po_id]})
+
+
+# Receive purchase order function
+# Adds every line to stock in one transaction. Returns {part_id: units added}.
+def receive_purchase_order(po_id):
+    with write_transaction() as conn:
+        _move(conn, po_id, 'received', 'received_at')
+        lines = conn.execute("""
+            SELECT l.part_id, l.quantity, i.part_name
+            FROM purchase_order_lines l
+            JOIN inventory i ON i.id = l.part_id
+            WHERE l.po_id = ?
+        """, (po_id,)).fetchall()
+        conn.executemany("UPDATE inventory SET stock = stock + ? WHERE id = ?",
+                         [(quantity, part_id) for part_id, quantity, _ in lines])
+        conn.execute("UPDATE purchase_order_lines SET received_quantity = quantity WHERE po_id = ?", (po_id,))
+
+        # Add audit log entries
+        insert_audit_logs(conn, [
+            ("RECEIVE_PURCHASE_ORDER", f"Received {quantity} of '{part_name}' (ID: {part_id}) "
+                                       f"on purchase order {po_id}")
+            for part_id, quantity, part_name in lines])
+    received = {part_id: quantity for part_id, quantity, _ in lines}
+    inventory_cache.adjust_stock(conn, received)
+
+    events.emit(events.PURCHASE_ORDERS_CHANGED, {'action': 'receive', 'po_ids': [po_id]})
+    events.emit(events.INVENTORY_CHANGED, {'action': 'receive', 'part_ids': list(received)})
+    return received
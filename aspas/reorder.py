@@ -0,0 +1,144 @@
+# Reorder engine
+# Low-stock parts are queued in reorder_queue as suggestions and applied in one
+# batch. Each part has its own reorder_point; a part needs reordering when
+# stock <= reorder_point and it is not already on an open purchase order. Sales
+# only evaluate the parts they touched, and the full check uses the indexed
+# expression (stock - reorder_point).
+#
+# Applying the queue orders enough to refill each part to its target stock:
+# the order-up-to level from its demand forecast (aspas.forecast) when it has
+# one, otherwise its initial stock. The lines go on draft purchase orders,
+# one per vendor (aspas.purchasing); stock goes up when an order is received.
+
+from datetime import datetime
+
+from . import events
+from .audit import insert_audit_logs
+from .cache import inventory_cache
+from .db import get_connection, write_transaction
+from .errors import PartNotFoundError, ValidationError
+from .purchasing import ON_ORDER, add_order_lines
+
+
+DEFAULT_REORDER_RATIO = 0.3  # 30% of initial stock
+
+# Target stock of the inventory row aliased i
+_TARGET_STOCK = """COALESCE((SELECT d.order_up_to FROM part_demand d WHERE d.part_id = i.id AND i.demand_managed = 1),
+                         i.initial_stock)"""
+
+
+# Reorder point for function
+def reorder_point_for(initial_stock, ratio=DEFAULT_REORDER_RATIO):
+    return int(initial_stock * ratio)
+
+
+# Set reorder threshold function
+# Give either a ratio of the part's initial stock or an absolute reorder point.
+# The part then keeps this threshold instead of its demand forecast.
+def set_reorder_threshold(part_id, ratio=None, reorder_point=None):
+    if (ratio is None) == (reorder_point is None):
+        raise ValidationError("Give either a ratio or a reorder point.")
+    conn = get_connection()
+    with conn:
+        if ratio is not None:
+            if not 0 <= ratio <= 1:
+                raise ValidationError("Reorder ratio must be between 0 and 1.")
+            cur = conn.execute("UPDATE inventory SET reorder_point = CAST(initial_stock * ? AS INTEGER), "
+                               "demand_managed = 0 WHERE id = ?", (ratio, part_id))
+        else:
+            if reorder_point < 0:
+                raise ValidationError("Reorder point must not be negative.")
+            cur = conn.execute("UPDATE inventory SET reorder_point = ?, demand_managed = 0 WHERE id = ?",
+                               (reorder_point, part_id))
+        if cur.rowcount == 0:
+            raise PartNotFoundError(part_id)
+        queue_low_stock(conn, [part_id])
+    inventory_cache.refresh(conn, [part_id])
+
+
+# Queue low stock function
+# Queues a suggestion for each of part_ids at or below its reorder point.
+# Runs on the caller's connection without committing so it can share the
+# transaction that changed the stock. Returns the number of rows queued.
+def queue_low_stock(conn, part_ids):
+    if not part_ids:
+        return 0
+    placeholders = ", ".join("?" * len(part_ids))
+    cur = conn.execute(f"""
+        INSERT OR IGNORE INTO reorder_queue (part_id, stock, reorder_point, order_quantity, created_at)
+        SELECT i.id, i.stock, i.reorder_point, {_TARGET_STOCK} - i.stock, ?
+        FROM inventory i
+        WHERE i.id IN ({placeholders}) AND i.stock <= i.reorder_point AND NOT {ON_ORDER}
+    """, [datetime.now().isoformat()] + list(part_ids))
+    return cur.rowcount
+
+
+# Scan low stock function
+# Queues every low-stock part using the reorder index instead of a table scan.
+def scan_low_stock(conn):
+    cur = conn.execute(f"""
+        INSERT OR IGNORE INTO reorder_queue (part_id, stock, reorder_point, order_quantity, created_at)
+        SELECT i.id, i.stock, i.reorder_point, {_TARGET_STOCK} - i.stock, ?
+        FROM inventory i
+        WHERE i.stock - i.reorder_point <= 0 AND NOT {ON_ORDER}
+    """, (datetime.now().isoformat(),))
+    return cur.rowcount
+
+
+# Pending reorders function
+def pending_reorders():
+    return get_connection().execute("""
+        SELECT q.id, q.part_id, i.part_name, q.stock, q.reorder_point, q.order_quantity, q.created_at
+        FROM reorder_queue q
+        JOIN inventory i ON q.part_id = i.id
+        WHERE q.status = 'pending'
+        ORDER BY q.id
+    """).fetchall()
+
+
+# Apply reorders function
+# Moves every pending suggestion onto draft purchase orders in one
+# transaction. Returns one dict per part ordered: the part, its stock and
+# threshold, the quantity ordered and the order and vendor it went to.
+def apply_reorders():
+    conn = get_connection()
+    if conn.execute("SELECT 1 FROM reorder_queue WHERE status = 'pending' LIMIT 1").fetchone() is None:
+        return []
+
+    # Holding the write lock from the first read means each suggestion is
+    # ordered once, however many terminals check at the same time. A part
+    # deleted since it was queued has no quantity and is skipped, so its
+    # suggestion cannot stay pending
+    with write_transaction(conn):
+        pending = conn.execute(f"""
+            SELECT q.id, q.part_id, i.part_name, i.stock, {_TARGET_STOCK} - i.stock, i.reorder_point
+            FROM reorder_queue q
+            LEFT JOIN inventory i ON q.part_id = i.id
+            WHERE q.status = 'pending'
+            ORDER BY q.id
+        """).fetchall()
+        if not pending:
+            return []
+
+        # A part restocked (or deleted) since it was queued needs nothing
+        wanted = [row for row in pending if (row[4] or 0) > 0]
+        ordered = add_order_lines(conn, [(part_id, name, quantity) for _, part_id, name, _, quantity, _ in wanted])
+        for order, (_, _, _, stock, _, reorder_point) in zip(ordered, wanted):
+            order.update(stock=stock, threshold=reorder_point)
+
+        applied_at = datetime.now().isoformat()
+        conn.executemany("UPDATE reorder_queue SET status = ?, applied_at = ? WHERE id = ?",
+                         [('ordered' if (quantity or 0) > 0 else 'skipped', applied_at, queue_id)
+                          for queue_id, _, _, _, quantity, _ in pending])
+
+        # Add audit log entries
+        insert_audit_logs(conn, [
+            ("AUTO_REORDER", f"Auto-reorder triggered for '{r['part_name']}' (ID: {r['part_id']}). "
+                             f"{r['quantity']} added to purchase order {r['po_id']}"
+                             + (f" for {r['vendor_name']} (ID: {r['vendor_id']})" if r['vendor_id'] else ""))
+            for r in ordered])
+
+    if ordered:
+        events.emit(events.PURCHASE_ORDERS_CHANGED, {'action': 'reorder',
+                                                     'po_ids': list(dict.fromkeys(r['po_id'] for r in ordered))})
+    return ordered
@@ -0,0 +1,352 @@
+# PDF sales reports
+# Every report is a table on letter pages (landscape when its columns are too
+# wide for portrait, as the sale reports' are). Rows are fetched from the
+# database FETCH_SIZE at a time and drawn as they arrive, so a report running to
+# thousands of pages never holds its query result in memory. The header row is
+# repeated on every page and each page is numbered. Reports that group rows
+# (the vendor report, one group per part) print a heading and a subtotal for
+# each group, and every report ends with a grand total.
+#
+#   monthly  one line per month (from the monthly rollup)
+#   part     every sale of one part
+#   vendor   every sale of the parts one vendor supplies
+#   daily    every sale on one day (YYYY-MM-DD)
+#
+# Reports are written under REPORT_DIR with a timestamp in the name, so two
+# exports never overwrite each other. write_reports_parallel spreads many
+# reports over a process pool; the same runs from the command line as
+# python -m aspas report.
+
+import multiprocessing
+import os
+import re
+import time
+from collections import namedtuple
+from concurrent.futures import ProcessPoolExecutor
+
+from reportlab.lib.pagesizes import landscape, letter
+from reportlab.pdfgen import canvas
+
+from . import db
+
+
+REPORT_DIR = "reports"
+REPORT_KINDS = ("monthly", "part", "vendor", "daily")
+FETCH_SIZE = 1000
+
+FONT = "Helvetica"
+BOLD_FONT = "Helvetica-Bold"
+FONT_SIZE = 9
+ROW_HEIGHT = 14
+MARGIN = 50
+_UNSAFE = re.compile(r"[^\w-]")     # characters kept out of file names
+
+# fmt turns a value into its cell text; numeric columns are right-aligned
+Column = namedtuple("Column", "heading width fmt numeric")
+
+
+# Cell formats
+def _text(value):
+    return "" if value is None else str(value)
+
+
+def _money(value):
+    return f"{value or 0:.2f}"
+
+
+def _timestamp(value):
+    return _text(value).replace("T", " ")[:19]
+
+
+# Report definitions
+# Each kind has its columns, which of them are totalled, and a function giving
+# (title, query, params) for a key. group is the index of the column that
+# starts a new section when it changes (rows must be ordered by it).
+# ID columns are wide enough for a whole ID (ids.ID_LENGTH characters, about
+# 125pt at FONT_SIZE), so IDs are never cut short.
+_SALE_COLUMNS = [
+    Column("Date", 110, _timestamp, False),
+    Column("Sale ID", 130, _text, False),
+    Column("Part ID", 130, _text, False),
+    Column("Part Name", 200, _text, False),
+    Column("Qty", 40, _text, True),
+    Column("Amount", 82, _money, True),
+]
+
+ReportKind = namedtuple("ReportKind", "columns totals group query")
+
+
+def _monthly_query(conn, key):
+    return ("Monthly Sales Report",
+            "SELECT month, sale_count, quantity, revenue FROM sales_monthly ORDER BY month", [])
+
+
+def _part_query(conn, key):
+    row = conn.execute("SELECT part_name FROM inventory WHERE id = ?", (key,)).fetchone()
+    title = f"Sales of {key}" + (f" ({row[0]})" if row else "")
+    # idx_sales_part_date gives the rows in date order without sorting
+    return title, """
+        SELECT s.date, s.id, s.part_id, i.part_name, s.quantity, s.amount
+        FROM sales s
+        LEFT JOIN inventory i ON i.id = s.part_id
+        WHERE s.part_id = ?
+        ORDER BY s.date
+    """, [key]
+
+
+def _vendor_query(conn, key):
+    row = conn.execute("SELECT name FROM vendors WHERE id = ?", (key,)).fetchone()
+    title = f"Sales of parts supplied by {key}" + (f" ({row[0]})" if row else "")
+    # The vendor's parts from the vendor_parts key, then each part's sales in
+    # date order from idx_sales_part_date
+    return title, """
+        SELECT s.date, s.id, s.part_id, i.part_name, s.quantity, s.amount
+        FROM vendor_parts vp
+        JOIN sales s ON s.part_id = vp.part_id
+        LEFT JOIN inventory i ON i.id = s.part_id
+        WHERE vp.vendor_id = ?
+        ORDER BY s.part_id, s.date
+    """, [key]
+
+
+def _daily_query(conn, key):
+    # Range on date so idx_sales_date is used
+    return f"Sales on {key}", """
+        SELECT s.date, s.id, s.part_id, i.part_name, s.quantity, s.amount
+        FROM sales s
+        LEFT JOIN inventory i ON i.id = s.part_id
+        WHERE s.date >= ? AND s.date < ?
+        ORDER BY s.date
+    """, list(db.prefix_range(key))
+
+
+REPORTS = {
+    "monthly": ReportKind([
+        Column("Month", 100, _text, False),
+        Column("Total Sales", 120, _text, True),
+        Column("Total Qty", 120, _text, True),
+        Column("Revenue (₹)", 140, _money, True),
+    ], (1, 2, 3), None, _monthly_query),
+    "part": ReportKind(_SALE_COLUMNS, (4, 5), None, _part_query),
+    "vendor": ReportKind(_SALE_COLUMNS, (4, 5), 2, _vendor_query),
+    "daily": ReportKind(_SALE_COLUMNS, (4, 5), None, _daily_query),
+}
+
+
+class PagedTable:
+    # Draws rows onto as many pages as they need
+
+    def __init__(self, filename, title, columns):
+        pagesize = letter
+        if sum(column.width for column in columns) > letter[0] - 2 * MARGIN:
+            pagesize = landscape(letter)
+        self.canvas = canvas.Canvas(filename, pagesize=pagesize)
+        self.title = title
+        self.columns = columns
+        self.width, self.height = pagesize
+        self.pages = 0
+        self.rows = 0
+        self._x = []
+        x = MARGIN
+        for column in columns:
+            self._x.append(x)
+            x += column.width
+        self._y = 0
+        self._new_page()
+
+    # New page function
+    def _new_page(self):
+        c = self.canvas
+        if self.pages:
+            c.showPage()
+        self.pages += 1
+        c.setFont(BOLD_FONT, 12)
+        c.drawString(MARGIN, self.height - MARGIN, self.title)
+        c.setFont(FONT, 8)
+        c.drawRightString(self.width - MARGIN, MARGIN - 20, f"Page {self.pages}")
+        self._y = self.height - MARGIN - 30
+        self._line([column.heading for column in self.columns], BOLD_FONT)
+        c.line(MARGIN, self._y + ROW_HEIGHT - 3, self._x[-1] + self.columns[-1].width, self._y + ROW_HEIGHT - 3)
+
+    # Line function
+    # Draws one row of cell texts and moves down, starting a page when full.
+    def _line(self, cells, font=FONT):
+        if self._y < MARGIN:
+            self._new_page()
+        c = self.canvas
+        c.setFont(font, FONT_SIZE)
+        for x, column, text in zip(self._x, self.columns, cells):
+            if column.numeric:
+                c.drawRightString(x + column.width - 4, self._y, text)
+            else:
+                c.drawString(x, self._y, self._fit(text, column.width - 4, font))
+        self._y -= ROW_HEIGHT
+
+    # Fit function
+    # Cuts text that would run into the next column. Starts from the length
+    # the average character width allows, so long IDs take a few measurements.
+    def _fit(self, text, width, font):
+        full = self.canvas.stringWidth(text, font, FONT_SIZE)
+        if full <= width:
+            return text
+        text = text[:int(len(text) * width / full)]
+        while text and self.canvas.stringWidth(text + "…", font, FONT_SIZE) > width:
+            text = text[:-1]
+        return text + "…"
+
+    # Add row function
+    def add_row(self, row):
+        self._line([column.fmt(value) for column, value in zip(self.columns, row)])
+        self.rows += 1
+
+    # Heading function
+    # A section heading; kept on the same page as the row after it.
+    def heading(self, text):
+        if self._y < MARGIN + ROW_HEIGHT * 2:
+            self._new_page()
+        self._y -= 4
+        self.canvas.setFont(BOLD_FONT, FONT_SIZE)
+        self.canvas.drawString(MARGIN, self._y, text)
+        self._y -= ROW_HEIGHT
+
+    # Total function
+    # A bold line with label in the first column and values in the others.
+    def total(self, label, values):
+        cells = [label] + [self.columns[index].fmt(values[index]) if index in values else ""
+                           for index in range(1, len(self.columns))]
+        self._line(cells, BOLD_FONT)
+
+    # Save function
+    # Returns the number of pages.
+    def save(self):
+        self.canvas.save()
+        return self.pages
+
+
+# Write table function
+# Streams cursor into a PagedTable for the given report kind. Returns the
+# number of rows written.
+def _write_table(table, kind, cursor):
+    grand = dict.fromkeys(kind.totals, 0)
+    group_totals = None
+    group = None
+    while True:
+        rows = cursor.fetchmany(FETCH_SIZE)
+        if not rows:
+            break
+        for row in rows:
+            if kind.group is not None and row[kind.group] != group:
+                if group_totals is not None:
+                    table.total("Subtotal", group_totals)
+                group = row[kind.group]
+                group_totals = dict.fromkeys(kind.totals, 0)
+                table.heading(f"{row[kind.group]} {_text(row[kind.group + 1])}")
+            table.add_row(row)
+            for index in kind.totals:
+                grand[index] += row[index] or 0
+                if group_totals is not None:
+                    group_totals[index] += row[index] or 0
+    if group_totals is not None:
+        table.total("Subtotal", group_totals)
+    if table.rows:
+        table.total("Total", grand)
+    return table.rows
+
+
+# Report path function
+# A new file under directory named after the report and the current time,
+# e.g. reports/part_I-ATIL821_20250425-013353.pdf. The file is created here so
+# reports started in the same second (or in other processes) get their own.
+def report_path(kind, key=None, directory=REPORT_DIR):
+    os.makedirs(directory, exist_ok=True)
+    name = kind if key is None else f"{kind}_{_UNSAFE.sub('_', str(key))}"
+    stamp = time.strftime("%Y%m%d-%H%M%S")
+    n = 0
+    while True:
+        path = os.path.join(directory, f"{name}_{stamp}{f'-{n}' if n else ''}.pdf")
+        try:
+            with open(path, "x"):
+                return path
+        except FileExistsError:
+            n += 1
+
+
+# Write report function
+# Writes the report to filename (default: a new report_path). Returns the
+# filename, or None (leaving no file) when there is nothing to report.
+def write_report(kind_name, key=None, filename=None, directory=REPORT_DIR):
+    if kind_name not in REPORTS:
+        raise ValueError(f"Unknown report: {kind_name}")
+    if kind_name != "monthly" and not key:
+        raise ValueError(f"The {kind_name} report needs a key")
+    kind = REPORTS[kind_name]
+    conn = db.get_connection()
+    title, query, params = kind.query(conn, key)
+
+    filename = filename or report_path(kind_name, key, directory)
+    cursor = conn.execute(query, params)
+    try:
+        table = PagedTable(filename, title, kind.columns)
+        count = _write_table(table, kind, cursor)
+        if count:
+            table.save()
+    except BaseException:
+        if os.path.exists(filename):
+            os.remove(filename)
+        raise
+    finally:
+        cursor.close()
+    if not count:
+        if os.path.exists(filename):
+            os.remove(filename)
+        return None
+    return filename
+
+
+# Write monthly sales pdf function
+# Returns the filename, or None when there are no sales to report.
+def write_monthly_sales_pdf(filename=None):
+    return write_report("monthly", filename=filename)
+
+
+# Report keys function
+# Every key a report kind can be run for, e.g. to write one report per part.
+def report_keys(kind_name):
+    queries = {
+        "monthly": None,
+        "part": "SELECT DISTINCT part_id FROM sales_daily ORDER BY part_id",
+        "vendor": "SELECT id FROM vendors ORDER BY id",
+        "daily": "SELECT DISTINCT day FROM sales_daily ORDER BY day",
+    }
+    if kind_name not in queries:
+        raise ValueError(f"Unknown report: {kind_name}")
+    if queries[kind_name] is None:
+        return [None]
+    return [row[0] for row in db.get_connection().execute(queries[kind_name])]
+
+
+# Report worker function (worker process)
+def _report_worker(args):
+    kind_name, key, directory = args
+    return write_report(kind_name, key, directory=directory)
+
+
+# Write reports parallel function
+# Writes one report per (kind, key) in requests over a pool of worker
+# processes, each with its own connection to the current database. Returns
+# [(kind, key, filename or None)] in the order of requests. An in-memory
+# database cannot be shared between processes, so its reports are written
+# here one after another.
+def write_reports_parallel(requests, workers=None, directory=REPORT_DIR):
+    requests = list(requests)
+    jobs = [(kind_name, key, directory) for kind_name, key in requests]
+    path = db.get_db_name()
+    if path == ":memory:" or workers == 1 or len(jobs) < 2:
+        filenames = [_report_worker(job) for job in jobs]
+    else:
+        # spawn so no worker inherits an open connection
+        context = multiprocessing.get_context("spawn")
+        with ProcessPoolExecutor(workers, mp_context=context, initializer=db.connect,
+                                 initargs=(path,)) as pool:
+            filenames = list(pool.map(_report_worker, jobs))
+    return [(kind_name, key, filename) for (kind_name, key), filename in zip(requests, filenames)]
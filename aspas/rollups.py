@@ -0,0 +1,158 @@
+# Pre-aggregated sales rollups
+# sales_daily   one row per (day, part)
+# sales_weekly  one row per (week, part), week as strftime('%Y-%W') like the reports
+# sales_monthly one row per month over all parts
+# They are updated in the same transaction as every sale, so reports read a few
+# hundred aggregated rows instead of grouping the whole sales history.
+# rebuild_rollups recomputes them from the sales table.
+
+from . import db
+
+
+_ROLLUPS = [
+    ("sales_daily", "day, part_id", "strftime('%Y-%m-%d', {date})", True),
+    ("sales_weekly", "week, part_id", "strftime('%Y-%W', {date})", True),
+    ("sales_monthly", "month", "strftime('%Y-%m', {date})", False),
+]
+
+
+# Create rollup tables function
+def create_rollup_tables(conn):
+    conn.execute('''CREATE TABLE IF NOT EXISTS sales_daily (
+        day TEXT,
+        part_id TEXT,
+        sale_count INTEGER,
+        quantity INTEGER,
+        revenue REAL,
+        PRIMARY KEY (day, part_id)
+    )''')
+    conn.execute('''CREATE TABLE IF NOT EXISTS sales_weekly (
+        week TEXT,
+        part_id TEXT,
+        sale_count INTEGER,
+        quantity INTEGER,
+        revenue REAL,
+        PRIMARY KEY (week, part_id)
+    )''')
+    conn.execute('''CREATE TABLE IF NOT EXISTS sales_monthly (
+        month TEXT PRIMARY KEY,
+        sale_count INTEGER,
+        quantity INTEGER,
+        revenue REAL
+    )''')
+    # Per-part lookups over a date range (weekly demand with a part filter)
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_sales_daily_part ON sales_daily(part_id, day)")
+
+
+# Add sales function
+# Folds new sales into every rollup. sales is a list of
+# (part_id, quantity, amount, date). Runs on the caller's connection without
+# committing so the rollups change in the same transaction as the sales rows.
+def add_sales(conn, sales):
+    for table, key_columns, period, per_part in _ROLLUPS:
+        period_value = period.format(date="?")
+        if per_part:
+            values = f"{period_value}, ?, 1, ?, COALESCE(?, 0)"
+            rows = [(date, part_id, quantity, amount) for part_id, quantity, amount, date in sales]
+        else:
+            values = f"{period_value}, 1, ?, COALESCE(?, 0)"
+            rows = [(date, quantity, amount) for part_id, quantity, amount, date in sales]
+        conn.executemany(f"""
+            INSERT INTO {table} ({key_columns}, sale_count, quantity, revenue)
+            VALUES ({values})
+            ON CONFLICT ({key_columns}) DO UPDATE SET
+                sale_count = sale_count + excluded.sale_count,
+                quantity = quantity + excluded.quantity,
+                revenue = revenue + excluded.revenue
+        """, rows)
+
+
+# Fill rollups function
+# Recomputes every rollup from the sales table on the caller's connection
+# without committing.
+def fill_rollups(conn):
+    create_rollup_tables(conn)
+    for table, key_columns, period, per_part in _ROLLUPS:
+        period_value = period.format(date="date")
+        group = f"{period_value}, part_id" if per_part else period_value
+        conn.execute(f"DELETE FROM {table}")
+        conn.execute(f"""
+            INSERT INTO {table} ({key_columns}, sale_count, quantity, revenue)
+            SELECT {group}, COUNT(*), SUM(quantity), COALESCE(SUM(amount), 0)
+            FROM sales
+            WHERE date IS NOT NULL
+            GROUP BY {group}
+        """)
+
+
+# Rebuild rollups function
+# fill_rollups in its own transaction. Returns the row count of each rollup.
+def rebuild_rollups(conn=None):
+    conn = conn or db.get_connection()
+    with conn:
+        fill_rollups(conn)
+    return {table: conn.execute(f"SELECT COUNT(*) FROM {table}").fetchone()[0] for table, _, _, _ in _ROLLUPS}
+
+
+# === REPORT QUERIES ===
+
+# Monthly totals function
+# Rows of (month, total_sales, total_quantity, total_revenue) in month order.
+def monthly_totals():
+    return db.get_connection().execute(
+        "SELECT month, sale_count, quantity, revenue FROM sales_monthly ORDER BY month").fetchall()
+
+
+# Rollup version function
+# Changes whenever the rollups do: every sale adds to sales_monthly in the same
+# transaction as the other rollups, and a rebuild replaces them all. Reading
+# it costs one pass over a row per month, so callers can check it before
+# deciding whether a chart or report built from the rollups is out of date.
+def rollup_version(conn=None):
+    conn = conn or db.get_connection()
+    return conn.execute("SELECT COUNT(*), TOTAL(sale_count), ROUND(TOTAL(revenue), 2) FROM sales_monthly").fetchone()
+
+
+# Weekly demand function
+# Rows of (part_id, part_name, week, total_quantity, avg_daily) ordered by part
+# and week. avg_daily is the average quantity per sale, as in the original
+# report. Dates are YYYY-MM-DD and inclusive. Without a date range the weekly
+# rollup is read directly; with one, daily rows are grouped so partial weeks at
+# either end are counted correctly.
+def weekly_demand(start_date=None, end_date=None, part_id=None):
+    return db.get_connection().execute(*weekly_demand_query(start_date, end_date, part_id)).fetchall()
+
+
+# Weekly demand query function
+# The (query, params) behind weekly_demand, for callers that stream the rows.
+def weekly_demand_query(start_date=None, end_date=None, part_id=None):
+    params = []
+    if start_date or end_date:
+        query = """
+            SELECT r.part_id, i.part_name, strftime('%Y-%W', r.day) AS week,
+                   SUM(r.quantity) AS total_quantity,
+                   ROUND(SUM(r.quantity) * 1.0 / SUM(r.sale_count), 2) AS avg_daily
+            FROM sales_daily r
+            JOIN inventory i ON r.part_id = i.id
+            WHERE 1=1
+        """
+        if start_date:
+            query += " AND r.day >= ?"
+            params.append(start_date)
+        if end_date:
+            query += " AND r.day <= ?"
+            params.append(end_date)
+    else:
+        query = """
+            SELECT r.part_id, i.part_name, r.week,
+                   SUM(r.quantity) AS total_quantity,
+                   ROUND(SUM(r.quantity) * 1.0 / SUM(r.sale_count), 2) AS avg_daily
+            FROM sales_weekly r
+            JOIN inventory i ON r.part_id = i.id
+            WHERE 1=1
+        """
+    if part_id:
+        query += " AND r.part_id = ?"
+        params.append(part_id)
+    query += " GROUP BY r.part_id, week ORDER BY r.part_id, week"
+    return query, params
@@ -0,0 +1,112 @@
+# Part search index for type-ahead
+# inventory_search is an FTS5 index over each part's ID, name, manufacturer and
+# vehicle type. It stores no copy of the text (external content on inventory)
+# and triggers keep it in step one row at a time: inserting or deleting a part,
+# or changing one of the indexed columns, touches only that part's entry.
+# Stock changes do not touch it at all.
+#
+# Every word typed is matched as a prefix, so "bos sed" finds Bosch parts for
+# sedans. A SQLite built without FTS5 gets no index, and search_parts falls
+# back to a LIKE scan of part names.
+#
+# audit_log_search does the same for the details text of audit log entries,
+# for the audit viewer's search box. Entries are never edited, so only
+# inserts and deletes (archiving) touch it. Both indexes and their triggers
+# are created by migrations (aspas.migrations, 6 and 8).
+#
+# Both indexes point at rows by rowid, and inventory and audit_log have TEXT
+# primary keys, so their rowids are not stable: VACUUM may renumber them and
+# leave the indexes pointing at the wrong rows. Compact the database with
+# python -m aspas vacuum (vacuum_database), which rebuilds both indexes
+# straight after; after a VACUUM run any other way, run
+# python -m aspas rebuild-search.
+
+import re
+
+from . import db
+
+
+_WORD = re.compile(r"\w+")
+AUDIT_SORT_MATCHES = 1000
+
+
+# Has search index function
+def has_search_index(conn, name="inventory_search"):
+    return conn.execute(
+        "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?", (name,)).fetchone() is not None
+
+
+# Rebuild search index function
+# Re-indexes every part (or, with name="audit_log_search", every audit entry)
+# in its own transaction, e.g. after rows were changed with the triggers
+# disabled or after a VACUUM. Returns False when there is no index.
+def rebuild_search_index(conn=None, name="inventory_search"):
+    conn = conn or db.get_connection()
+    if not has_search_index(conn, name):
+        return False
+    with conn:
+        conn.execute(f"INSERT INTO {name} ({name}) VALUES ('rebuild')")
+    return True
+
+
+# Vacuum database function
+# VACUUM, then rebuild the search indexes the new rowids invalidated. Needs
+# no other transaction open on conn.
+def vacuum_database(conn=None):
+    conn = conn or db.get_connection()
+    conn.execute("VACUUM")
+    rebuild_search_index(conn)
+    rebuild_search_index(conn, "audit_log_search")
+
+
+# Match query function
+# "bos sed-2" -> '"bos"* "sed"* "2"*': every word must match as a prefix.
+def _match_query(text):
+    return " ".join(f'"{word}"*' for word in _WORD.findall(text))
+
+
+# Search parts function
+# Top limit (id, part_name) rows matching text, best matches first. An empty
+# text lists the first parts by ID.
+def search_parts(text, limit=20, in_stock=True):
+    conn = db.get_connection()
+    stock_filter = " AND i.stock > 0" if in_stock else ""
+    match = _match_query(text or "")
+    if not match:
+        return conn.execute(f"SELECT i.id, i.part_name FROM inventory i WHERE 1=1 {stock_filter} "
+                            f"ORDER BY i.id LIMIT ?", (limit,)).fetchall()
+
+    if not has_search_index(conn):
+        pattern = f"%{text.strip()}%"
+        return conn.execute(f"""
+            SELECT i.id, i.part_name FROM inventory i
+            WHERE (i.part_name LIKE ? OR i.id LIKE ?) {stock_filter}
+            ORDER BY i.id LIMIT ?
+        """, (pattern, pattern, limit)).fetchall()
+
+    return conn.execute(f"""
+        SELECT i.id, i.part_name
+        FROM inventory_search s
+        JOIN inventory i ON i.rowid = s.rowid
+        WHERE inventory_search MATCH ? {stock_filter}
+        ORDER BY s.rank, i.id
+        LIMIT ?
+    """, (match, limit)).fetchall()
+
+
+# Audit text filter function
+# (clause, params) restricting audit_log to entries whose details contain
+# every word of text (as prefixes), for appending to a WHERE. Few matches are
+# read by rowid and sorted; for many, "+rowid" keeps SQLite walking the
+# timestamp index in page order and checking each entry against the matches,
+# instead of sorting every match to return the first page.
+def audit_text_filter(conn, text):
+    match = _match_query(text or "")
+    if not match:
+        return "", []
+    if not has_search_index(conn, "audit_log_search"):
+        return " AND action_details LIKE ?", [f"%{text.strip()}%"]
+    matches = conn.execute("SELECT COUNT(*) FROM audit_log_search WHERE audit_log_search MATCH ?",
+                           (match,)).fetchone()[0]
+    rowid = "+rowid" if matches > AUDIT_SORT_MATCHES else "rowid"
+    return f" AND {rowid} IN (SELECT rowid FROM audit_log_search WHERE audit_log_search MATCH ?)", [match]
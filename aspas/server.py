@@ -0,0 +1,354 @@
+# ASPAS HTTP/JSON API
+# python -m aspas.server [--db PATH] [--host HOST] [--port PORT] [--user NAME]
+# A small asyncio HTTP/1.1 server for the web storefront and handheld
+# scanners; it needs no GUI and nothing outside the standard library.
+#
+#   GET  /inventory?q=TEXT&after=ID&limit=N         search parts (keyset paged)
+#   GET  /parts/ID                                  part lookup
+#   POST /sales   {"part_id", "quantity", "method"}
+#             or  {"lines": [{"part_id", "quantity"}, ...], "method"}
+#   POST /orders  {"part_id", "quantity", "method"} customer order
+#   GET  /reports/monthly                           monthly sales totals
+#   GET  /reports/weekly-demand?start=&end=&part_id=
+#   GET  /stats                                     request counts, latency percentiles, batching
+#
+# Reads run on a thread pool, each on a connection borrowed from the read
+# pool. Writes go to a single writer thread. Sales that arrive while the
+# writer is busy are queued and committed together (engine.record_sales_group),
+# so a burst of requests costs one commit instead of one each.
+# Engine errors map to HTTP statuses: ValidationError 400,
+# PartNotFoundError 404, InsufficientStockError 409.
+
+import argparse
+import asyncio
+import json
+import sys
+import time
+import traceback
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import parse_qs, urlsplit
+
+from . import db, engine, reorder
+from .demand import analyze_weekly_demand
+from .errors import ValidationError, PartNotFoundError, InsufficientStockError
+from .rollups import monthly_totals
+from .session import set_current_user
+
+
+MAX_BODY = 1024 * 1024
+PART_FIELDS = ("id", "part_name", "manufacturer", "vehicle_type", "stock", "price", "initial_stock")
+MONTHLY_FIELDS = ("month", "sale_count", "quantity", "revenue")
+WEEKLY_DEMAND_FIELDS = ("part_id", "part_name", "week", "total_quantity", "avg_daily", "max_day", "min_day",
+                        "trend")
+_REASONS = {200: "OK", 201: "Created", 400: "Bad Request", 404: "Not Found", 405: "Method Not Allowed",
+            409: "Conflict", 413: "Payload Too Large", 500: "Internal Server Error"}
+_ERROR_STATUS = ((ValidationError, 400), (PartNotFoundError, 404), (InsufficientStockError, 409))
+
+
+class HTTPError(Exception):
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+
+
+class LatencyStats:
+    # Request count and a window of recent latencies per route
+
+    def __init__(self, window=2048):
+        self.window = window
+        self._samples = {}
+        self._counts = {}
+
+    # Record function
+    def record(self, route, seconds):
+        self._samples.setdefault(route, deque(maxlen=self.window)).append(seconds)
+        self._counts[route] = self._counts.get(route, 0) + 1
+
+    # Snapshot function
+    def snapshot(self):
+        stats = {}
+        for route, samples in self._samples.items():
+            ordered = sorted(samples)
+            pick = lambda pct: round(ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))] * 1000, 3)
+            stats[route] = {'count': self._counts[route], 'p50_ms': pick(50), 'p95_ms': pick(95),
+                            'p99_ms': pick(99), 'max_ms': round(ordered[-1] * 1000, 3)}
+        return stats
+
+
+class SaleBatcher:
+    # Queues sale requests and writes everything waiting in one transaction.
+    # Nothing waits for a batch to fill: a batch is whatever queued up while the
+    # previous one was being written, so an idle server adds no latency.
+
+    def __init__(self, writer, max_batch=64):
+        self.writer = writer
+        self.max_batch = max_batch
+        self.batches = 0
+        self.invoices = 0
+        self._queue = asyncio.Queue()
+
+    # Submit function
+    # Returns (sales, reorders) or raises the error that rejected the invoice.
+    async def submit(self, lines, method, action_type):
+        future = asyncio.get_running_loop().create_future()
+        self._queue.put_nowait(((lines, method, action_type), future))
+        return await future
+
+    # Run function
+    async def run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = [await self._queue.get()]
+            while len(batch) < self.max_batch and not self._queue.empty():
+                batch.append(self._queue.get_nowait())
+
+            try:
+                results, reorders = await loop.run_in_executor(self.writer, _write_batch,
+                                                               [invoice for invoice, _ in batch])
+            except Exception as e:
+                results, reorders = [e] * len(batch), []
+            self.batches += 1
+            self.invoices += len(batch)
+
+            for (_, future), result in zip(batch, results):
+                if future.done():
+                    continue
+                if isinstance(result, Exception):
+                    future.set_exception(result)
+                else:
+                    future.set_result((result, reorders))
+
+
+# Write batch function (writer thread)
+# Staff sales trigger auto-reorder as record_sale does; customer orders only
+# queue low stock, as record_customer_sale does.
+def _write_batch(invoices):
+    results = engine.record_sales_group(invoices)
+    staff_sales = any(action_type == "RECORD_SALE" and not isinstance(result, Exception)
+                      for (_, _, action_type), result in zip(invoices, results))
+    return results, reorder.apply_reorders() if staff_sales else []
+
+
+# Read function (reader thread)
+def _read(fn, *args):
+    with db.read_connection() as conn:
+        db.bind_thread_connection(conn)
+        try:
+            return fn(*args)
+        finally:
+            db.bind_thread_connection(None)
+
+
+# Sale lines function
+def _sale_lines(body):
+    if not isinstance(body, dict):
+        raise ValidationError("Request body must be a JSON object.")
+    lines = body.get('lines')
+    if lines is None:
+        lines = [body]
+    if not isinstance(lines, list) or not all(isinstance(line, dict) for line in lines):
+        raise ValidationError("lines must be a list of objects.")
+    try:
+        lines = [(line['part_id'], line['quantity']) for line in lines]
+    except KeyError as e:
+        raise ValidationError(f"Missing field: {e.args[0]}")
+    if not all(isinstance(part_id, str) for part_id, _ in lines):
+        raise ValidationError("part_id must be a string.")
+    return lines
+
+
+class APIServer:
+    def __init__(self, host="127.0.0.1", port=8080, read_workers=4, max_batch=64):
+        self.host = host
+        self.port = port
+        self.stats = LatencyStats()
+        self._readers = ThreadPoolExecutor(max_workers=read_workers, thread_name_prefix="aspas-api-read")
+        self._writer = ThreadPoolExecutor(max_workers=1, thread_name_prefix="aspas-api-write")
+        self.batcher = SaleBatcher(self._writer, max_batch)
+        self._routes = {
+            "/inventory": ("GET", self._search_inventory),
+            "/sales": ("POST", self._record_sale),
+            "/orders": ("POST", self._customer_order),
+            "/reports/monthly": ("GET", self._monthly_report),
+            "/reports/weekly-demand": ("GET", self._weekly_demand_report),
+            "/stats": ("GET", self._stats),
+        }
+
+    # Serve function
+    async def serve(self):
+        server = await asyncio.start_server(self._handle_connection, self.host, self.port)
+        self.port = server.sockets[0].getsockname()[1]
+        batcher = asyncio.create_task(self.batcher.run())
+        print(f"ASPAS API listening on http://{self.host}:{self.port}", file=sys.stderr)
+        try:
+            async with server:
+                await server.serve_forever()
+        finally:
+            batcher.cancel()
+            self._readers.shutdown()
+            self._writer.shutdown()
+
+    # === ROUTES ===
+
+    # Read function
+    async def _read(self, fn, *args):
+        return await asyncio.get_running_loop().run_in_executor(self._readers, _read, fn, *args)
+
+    # Search inventory route
+    async def _search_inventory(self, query, body):
+        try:
+            limit = min(int(query.get('limit', 50)), 500)
+        except ValueError:
+            raise ValidationError("limit must be a number.")
+        rows = await self._read(engine.search_inventory, query.get('q'), query.get('after'), limit)
+        parts = [dict(zip(PART_FIELDS, row)) for row in rows]
+        return 200, {'parts': parts, 'next': parts[-1]['id'] if len(parts) == limit else None}
+
+    # Get part route
+    async def _get_part(self, part_id):
+        return 200, dict(zip(PART_FIELDS, await self._read(engine.get_part, part_id)))
+
+    # Record sale route
+    async def _record_sale(self, query, body):
+        sales, reorders = await self.batcher.submit(_sale_lines(body), body.get('method', "Cash"), "RECORD_SALE")
+        return 201, {'sales': sales, 'total': sum(s['amount'] for s in sales), 'reorders': reorders}
+
+    # Customer order route
+    async def _customer_order(self, query, body):
+        lines = _sale_lines(body)
+        if len(lines) != 1:
+            raise ValidationError("A customer order is for one part.")
+        sales, _ = await self.batcher.submit(lines, body.get('method', "Cash"), "CUSTOMER_SALE")
+        return 201, sales[0]
+
+    # Monthly report route
+    async def _monthly_report(self, query, body):
+        rows = await self._read(monthly_totals)
+        return 200, {'months': [dict(zip(MONTHLY_FIELDS, row)) for row in rows]}
+
+    # Weekly demand report route
+    async def _weekly_demand_report(self, query, body):
+        rows = await self._read(analyze_weekly_demand, query.get('start'), query.get('end'), query.get('part_id'))
+        return 200, {'weeks': [dict(zip(WEEKLY_DEMAND_FIELDS, row)) for row in rows]}
+
+    # Stats route
+    async def _stats(self, query, body):
+        return 200, {'latency': self.stats.snapshot(),
+                     'batching': {'batches': self.batcher.batches, 'invoices': self.batcher.invoices}}
+
+    # === HTTP ===
+
+    # Dispatch function
+    # Returns (route label for stats, status, JSON payload).
+    async def _dispatch(self, method, target, body):
+        url = urlsplit(target)
+        path = url.path.rstrip("/") or "/"
+        query = {key: values[-1] for key, values in parse_qs(url.query).items()}
+        route = path
+        try:
+            if path.startswith("/parts/"):
+                route = "/parts/{id}"
+                if method != "GET":
+                    raise HTTPError(405, "Method not allowed.")
+                status, payload = await self._get_part(path[len("/parts/"):])
+            elif path in self._routes:
+                allowed, handler = self._routes[path]
+                if method != allowed:
+                    raise HTTPError(405, "Method not allowed.")
+                if body:
+                    try:
+                        body = json.loads(body)
+                    except ValueError:
+                        raise HTTPError(400, "Request body is not valid JSON.")
+                status, payload = await handler(query, body or {})
+            else:
+                route = "unknown"
+                raise HTTPError(404, "No such endpoint.")
+        except HTTPError as e:
+            status, payload = e.status, {'error': str(e)}
+        except Exception as e:
+            for error_type, error_status in _ERROR_STATUS:
+                if isinstance(e, error_type):
+                    status, payload = error_status, {'error': str(e)}
+                    break
+            else:
+                traceback.print_exc()
+                status, payload = 500, {'error': "Internal error."}
+        return f"{method} {route}", status, payload
+
+    # Handle connection function
+    # HTTP/1.1 with keep-alive; one request at a time per connection.
+    async def _handle_connection(self, reader, writer):
+        try:
+            while True:
+                request_line = await reader.readline()
+                if not request_line:
+                    break
+                try:
+                    method, target, version = request_line.decode("latin-1").split()
+                except ValueError:
+                    await self._respond(writer, 400, {'error': "Malformed request line."}, False)
+                    break
+
+                headers = {}
+                while True:
+                    line = await reader.readline()
+                    if line in (b"\r\n", b"\n", b""):
+                        break
+                    name, _, value = line.decode("latin-1").partition(":")
+                    headers[name.strip().lower()] = value.strip()
+
+                connection = headers.get('connection', "").lower()
+                keep_alive = connection != "close" if version == "HTTP/1.1" else connection == "keep-alive"
+                length = int(headers.get('content-length') or 0)
+                if length > MAX_BODY:
+                    await self._respond(writer, 413, {'error': "Request body too large."}, False)
+                    break
+                body = await reader.readexactly(length) if length else b""
+
+                start = time.perf_counter()
+                route, status, payload = await self._dispatch(method, target, body)
+                self.stats.record(route, time.perf_counter() - start)
+                await self._respond(writer, status, payload, keep_alive)
+                if not keep_alive:
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError, ValueError):
+            pass
+        finally:
+            writer.close()
+
+    # Respond function
+    @staticmethod
+    async def _respond(writer, status, payload, keep_alive):
+        body = json.dumps(payload).encode()
+        writer.write((f"HTTP/1.1 {status} {_REASONS[status]}\r\n"
+                      f"Content-Type: application/json\r\n"
+                      f"Content-Length: {len(body)}\r\n"
+                      f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n\r\n").encode() + body)
+        await writer.drain()
+
+
+# Main function
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m aspas.server", description="ASPAS HTTP/JSON API")
+    parser.add_argument("--db", default=db.DB_NAME, help="database file (default: %(default)s)")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8080)
+    parser.add_argument("--user", default="api", help="name recorded in the audit log for API sales")
+    parser.add_argument("--read-workers", type=int, default=4)
+    parser.add_argument("--max-batch", type=int, default=64, help="most sales committed in one transaction")
+    args = parser.parse_args(argv)
+
+    db.connect(args.db)
+    db.setup_database()
+    set_current_user(args.user, "api")
+    server = APIServer(args.host, args.port, args.read_workers, args.max_batch)
+    try:
+        asyncio.run(server.serve())
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == '__main__':
+    main()
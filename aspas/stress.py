@@ -0,0 +1,215 @@
+# Multi-terminal stress test
+# python -m aspas.stress [--terminals N] [--sales N] [--parts N] [--stock N] [--db PATH]
+# Starts N processes, one per billing counter, each with its own connection to
+# one shop database, and has them all sell the same few parts as fast as they
+# can. Afterwards it checks that no part was oversold and no update was lost:
+#
+#   stock never goes below zero
+#   initial stock - final stock == units the terminals were told they sold
+#                               == units in the sales table
+#                               == units in the daily rollup
+#   one RECORD_SALE audit row per sale
+#
+# The stress parts get a reorder point of -1 so auto-reorder never refills them
+# mid-run and the stock arithmetic stays exact.
+#
+# Then one batch of API sales (aspas.server) mixing good and bad requests
+# checks that the bad ones are refused with 400 and the good ones in the same
+# batch are still recorded. Exits non-zero on any failure.
+
+import argparse
+import asyncio
+import json
+import multiprocessing
+import os
+import random
+import sqlite3
+import sys
+import tempfile
+import time
+
+from . import db, engine
+from .errors import InsufficientStockError
+from .ids import generate_inventory_id
+from .server import APIServer
+from .session import set_current_user
+
+
+# Setup parts function
+def _setup_parts(path, parts, stock):
+    conn = db.connect(path)
+    db.setup_database()
+    part_ids = [generate_inventory_id() for _ in range(parts)]
+    with conn:
+        conn.executemany("""
+            INSERT INTO inventory (id, part_name, manufacturer, vehicle_type, stock, price, initial_stock, reorder_point)
+            VALUES (?, ?, 'Stress', 'Any', ?, 10.0, ?, -1)
+        """, [(part_id, f"Stress Part {n}", stock, stock) for n, part_id in enumerate(part_ids)])
+    conn.close()
+    return part_ids
+
+
+# Terminal function (worker process)
+# Returns the units this terminal sold per part, as reported back by record_sale.
+def _terminal(args):
+    path, terminal, part_ids, sales, seed = args
+    db.connect(path)
+    set_current_user(f"counter{terminal}", "employee")
+    rng = random.Random(seed)
+    sold = dict.fromkeys(part_ids, 0)
+    counts = {'sales': 0, 'refused': 0, 'errors': 0}
+    latencies = []
+    for _ in range(sales):
+        part_id = rng.choice(part_ids)
+        quantity = rng.randint(1, 3)
+        start = time.perf_counter()
+        try:
+            receipt = engine.record_sale(part_id, quantity, "Cash")
+        except InsufficientStockError:
+            counts['refused'] += 1
+            continue
+        except sqlite3.OperationalError:
+            # e.g. the busy timeout ran out; nothing was written
+            counts['errors'] += 1
+            continue
+        latencies.append(time.perf_counter() - start)
+        sold[receipt['part_id']] += receipt['quantity']
+        counts['sales'] += 1
+    return sold, counts, latencies
+
+
+# Verify function
+# Returns a list of problems; empty when the database agrees with the terminals.
+def _verify(path, part_ids, stock, sold, sale_count):
+    conn = db.connect(path)
+    problems = []
+    final = dict(conn.execute("SELECT id, stock FROM inventory WHERE manufacturer = 'Stress'").fetchall())
+    in_sales = dict(conn.execute("SELECT part_id, SUM(quantity) FROM sales GROUP BY part_id").fetchall())
+    in_rollup = dict(conn.execute("SELECT part_id, SUM(quantity) FROM sales_daily GROUP BY part_id").fetchall())
+    for part_id in part_ids:
+        if final[part_id] < 0:
+            problems.append(f"{part_id}: oversold, stock is {final[part_id]}")
+        for label, units in (("terminals", sold[part_id]), ("sales table", in_sales.get(part_id, 0)),
+                             ("daily rollup", in_rollup.get(part_id, 0))):
+            if stock - final[part_id] != units:
+                problems.append(f"{part_id}: stock went down by {stock - final[part_id]} "
+                                f"but the {label} show {units} sold")
+    sales_rows = conn.execute("SELECT COUNT(*) FROM sales").fetchone()[0]
+    audit_rows = conn.execute("SELECT COUNT(*) FROM audit_log WHERE action_type = 'RECORD_SALE'").fetchone()[0]
+    if not sales_rows == audit_rows == sale_count:
+        problems.append(f"{sale_count} sales reported, {sales_rows} sales rows, {audit_rows} audit rows")
+    conn.close()
+    return problems
+
+
+# Check mixed batch function
+# Sends good and bad sales to the API together so they share one write batch.
+# A request with a non-string part_id must get 400, an invoice the engine
+# rejects (here an unhashable part ID, which the HTTP layer would have
+# refused) must fail alone, and every good sale must be recorded. Returns a
+# list of problems.
+async def _check_mixed_batch(path, part_id):
+    db.connect(path)
+    set_current_user("stress-api", "employee")
+    server = APIServer(read_workers=1)
+    batcher = asyncio.create_task(server.batcher.run())
+    good = json.dumps({'part_id': part_id, 'quantity': 1})
+    bad = json.dumps({'part_id': [part_id], 'quantity': 1})
+    problems = []
+    try:
+        before = server.batcher.batches
+        outcomes = await asyncio.gather(
+            server._dispatch("POST", "/sales", good),
+            server._dispatch("POST", "/sales", bad),
+            server.batcher.submit([([part_id], 1)], "Cash", "RECORD_SALE"),
+            server._dispatch("POST", "/sales", good),
+            return_exceptions=True)
+        batches = server.batcher.batches - before
+    finally:
+        batcher.cancel()
+        server._readers.shutdown()
+        server._writer.shutdown()
+
+    statuses = [outcome[1] for outcome in (outcomes[0], outcomes[1], outcomes[3])]
+    if statuses != [201, 400, 201]:
+        problems.append(f"mixed API batch: statuses {statuses}, expected [201, 400, 201]")
+    if not isinstance(outcomes[2], Exception):
+        problems.append("mixed API batch: an invoice with an unhashable part ID was accepted")
+    if batches != 1:
+        problems.append(f"mixed API batch: written in {batches} batches, expected 1")
+    recorded = db.get_connection().execute(
+        "SELECT COUNT(*) FROM audit_log WHERE action_type = 'RECORD_SALE' AND username = 'stress-api'").fetchone()[0]
+    if recorded != 2:
+        problems.append(f"mixed API batch: {recorded} good sales recorded, expected 2")
+    db.get_connection().close()
+    return problems
+
+
+# Percentile function
+def _percentile(samples, pct):
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))] if ordered else 0.0
+
+
+# Run stress function
+# Works in path (which must not exist yet), or in a temporary database.
+def run_stress(terminals=4, sales=500, parts=5, stock=1000, path=None, seed=1):
+    with tempfile.TemporaryDirectory() as tmp:
+        path = path or os.path.join(tmp, "stress.db")
+        if os.path.exists(path):
+            raise FileExistsError(path)
+        part_ids = _setup_parts(path, parts, stock)
+
+        # Separate processes, like separate counters; spawn so none inherits a connection
+        context = multiprocessing.get_context("spawn")
+        start = time.perf_counter()
+        with context.Pool(terminals) as pool:
+            results = pool.map(_terminal, [(path, n + 1, part_ids, sales, seed + n) for n in range(terminals)])
+        elapsed = time.perf_counter() - start
+
+        sold = dict.fromkeys(part_ids, 0)
+        totals = {'sales': 0, 'refused': 0, 'errors': 0}
+        latencies = []
+        for terminal_sold, counts, terminal_latencies in results:
+            for part_id, units in terminal_sold.items():
+                sold[part_id] += units
+            for key, value in counts.items():
+                totals[key] += value
+            latencies.extend(terminal_latencies)
+
+        problems = _verify(path, part_ids, stock, sold, totals['sales'])
+        problems += asyncio.run(_check_mixed_batch(path, part_ids[0]))
+
+    return {
+        'terminals': terminals,
+        'attempts': terminals * sales,
+        **totals,
+        'units_sold': sum(sold.values()),
+        'units_in_stock': parts * stock,
+        'seconds': round(elapsed, 3),
+        'sales_per_second': round(totals['sales'] / elapsed, 1),
+        'p50_seconds': round(_percentile(latencies, 50), 6),
+        'p95_seconds': round(_percentile(latencies, 95), 6),
+        'problems': problems,
+    }
+
+
+# Main function
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m aspas.stress", description="Concurrent sellers stress test")
+    parser.add_argument("--terminals", type=int, default=4)
+    parser.add_argument("--sales", type=int, default=500, help="sale attempts per terminal")
+    parser.add_argument("--parts", type=int, default=5, help="parts every terminal sells from")
+    parser.add_argument("--stock", type=int, default=1000, help="starting stock of each part")
+    parser.add_argument("--db", help="database file to create and keep (default: a temporary one)")
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args(argv)
+
+    report = run_stress(args.terminals, args.sales, args.parts, args.stock, args.db, args.seed)
+    print(json.dumps(report, indent=2))
+    if report['problems'] or report['errors']:
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,113 @@
+# Vendor-part catalog
+# vendor_parts links each vendor to the parts it supplies, with the vendor's
+# unit cost and lead time for the part. It is indexed both ways: by vendor
+# (the primary key) for "all parts from vendor Y" and by part for "who
+# supplies part X". The best vendor for a part is the cheapest one; lead time
+# breaks ties, and vendors without a cost come last.
+#
+# vendors.parts stays as the free text typed in when a vendor is added. The
+# part names in it (comma-separated) are linked to every part with that name,
+# ignoring case, when the vendor is added; the migration did the same for
+# vendors added before vendor_parts existed. Links are changed with
+# set_vendor_part / remove_vendor_part (aspas.engine).
+
+from . import db
+
+
+# Best first, for ORDER BY and window functions over vendor_parts vp
+_BEST_FIRST = "vp.unit_cost IS NULL, vp.unit_cost, vp.lead_time_days IS NULL, vp.lead_time_days, vp.vendor_id"
+
+
+# Part names function
+# The part names in a vendors.parts text, lower-cased.
+def parse_part_names(text):
+    return {name.strip().lower() for name in (text or "").split(",") if name.strip()}
+
+
+# Link vendor parts function
+# Links vendor_ids (default: every vendor) to the parts named in their
+# vendors.parts text. Existing links are kept as they are. Runs on the
+# caller's transaction. Returns the number of links added.
+def link_vendor_parts(conn, vendor_ids=None):
+    if vendor_ids is None:
+        vendors = conn.execute("SELECT id, parts FROM vendors").fetchall()
+    else:
+        placeholders = ", ".join("?" * len(vendor_ids))
+        vendors = conn.execute(f"SELECT id, parts FROM vendors WHERE id IN ({placeholders})",
+                               list(vendor_ids)).fetchall()
+    wanted = {vendor_id: parse_part_names(parts) for vendor_id, parts in vendors}
+    names = set().union(*wanted.values())
+    if not names:
+        return 0
+
+    # One pass over inventory instead of one LIKE per name
+    part_ids = {}
+    for part_id, part_name in conn.execute("SELECT id, part_name FROM inventory"):
+        key = (part_name or "").strip().lower()
+        if key in names:
+            part_ids.setdefault(key, []).append(part_id)
+
+    links = [(vendor_id, part_id) for vendor_id, vendor_names in wanted.items()
+             for name in vendor_names for part_id in part_ids.get(name, ())]
+    return conn.executemany("INSERT OR IGNORE INTO vendor_parts (vendor_id, part_id) VALUES (?, ?)",
+                            links).rowcount
+
+
+# Part vendors function
+# Every vendor of a part, best first:
+# [(vendor_id, vendor_name, contact, unit_cost, lead_time_days)].
+def part_vendors(part_id, conn=None):
+    conn = conn or db.get_connection()
+    return conn.execute(f"""
+        SELECT vp.vendor_id, v.name, v.contact, vp.unit_cost, vp.lead_time_days
+        FROM vendor_parts vp
+        JOIN vendors v ON v.id = vp.vendor_id
+        WHERE vp.part_id = ?
+        ORDER BY {_BEST_FIRST}
+    """, (part_id,)).fetchall()
+
+
+# Best vendor function
+# The best vendor of a part as (vendor_id, vendor_name, contact, unit_cost,
+# lead_time_days), or None if nobody supplies it.
+def best_vendor(part_id, conn=None):
+    vendors = part_vendors(part_id, conn)
+    return vendors[0] if vendors else None
+
+
+# Best vendors function
+# {part_id: (vendor_id, vendor_name, unit_cost, lead_time_days)} for each of
+# part_ids that has a vendor (default: every part), in one query.
+def best_vendors(conn, part_ids=None):
+    query = f"""
+        SELECT part_id, vendor_id, name, unit_cost, lead_time_days FROM (
+            SELECT vp.part_id, vp.vendor_id, v.name, vp.unit_cost, vp.lead_time_days,
+                   ROW_NUMBER() OVER (PARTITION BY vp.part_id ORDER BY {_BEST_FIRST}) AS rank
+            FROM vendor_parts vp
+            JOIN vendors v ON v.id = vp.vendor_id
+            {{where}}
+        ) WHERE rank = 1
+    """
+    if part_ids is None:
+        rows = conn.execute(query.format(where=""))
+    else:
+        part_ids = list(part_ids)
+        if not part_ids:
+            return {}
+        placeholders = ", ".join("?" * len(part_ids))
+        rows = conn.execute(query.format(where=f"WHERE vp.part_id IN ({placeholders})"), part_ids)
+    return {row[0]: row[1:] for row in rows}
+
+
+# Vendor parts function
+# Every part a vendor supplies, by part name:
+# [(part_id, part_name, manufacturer, stock, unit_cost, lead_time_days)].
+def vendor_parts(vendor_id, conn=None):
+    conn = conn or db.get_connection()
+    return conn.execute("""
+        SELECT vp.part_id, i.part_name, i.manufacturer, i.stock, vp.unit_cost, vp.lead_time_days
+        FROM vendor_parts vp
+        JOIN inventory i ON i.id = vp.part_id
+        WHERE vp.vendor_id = ?
+        ORDER BY i.part_name, vp.part_id
+    """, (vendor_id,)).fetchall()
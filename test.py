@@ -1,230 +1,445 @@
 # Automobile Spare Parts Shop Automation System (ASPAS)
 # Full-featured GUI: Inventory, Vendor Management, Sales Recording, Reports
 
-import sqlite3
 import json
-import csv
 from datetime import datetime, timedelta
 import tkinter as tk
-from tkinter import ttk, messagebox
-import uuid
-from reportlab.lib.pagesizes import letter
-from reportlab.pdfgen import canvas
-import matplotlib.pyplot as plt
+from tkinter import ttk, messagebox, filedialog
 from matplotlib.backends.backend_tkagg import FigureCanvasTkAgg
 import os
+import bisect
+
+import aspas
+from aspas import events
+from aspas.audit import FLUSH_TIMEOUT, add_audit_log, audit_filter_values
+from aspas.db import get_connection, setup_database, prefix_range
+from aspas.jobs import JobExecutor, UIDispatcher
+from aspas.cache import CACHED_INVENTORY_TABLE
+from aspas.charts import ChartPanel, chart_key, plot_monthly_revenue, plot_weekly_demand
+from aspas.paging import SALES_TABLE, AuditLogTable
+from aspas.rollups import monthly_totals
+from aspas.demand import analyze_weekly_demand as analyze_demand
+from aspas.exports import export_audit_log, export_weekly_demand as write_weekly_demand_csv
+from aspas.reports import write_monthly_sales_pdf
+from aspas.search import search_parts
+from aspas.session import current_user
 
 
 STORAGE_MODE = 'sqlite'
+PART_MATCHES = 50   # parts listed in the sale dropdown for what has been typed
 DB_NAME = ':memory:' if STORAGE_MODE == 'memory' else 'aspas.db'
 
-conn = sqlite3.connect(DB_NAME)
-cursor = conn.cursor()
-
-current_user = {'username': 'admin', 'role': 'admin'}
-
-
-# Setup database function
-def setup_database():
-    cursor.execute('''CREATE TABLE IF NOT EXISTS inventory (
-        id TEXT PRIMARY KEY,
-        part_name TEXT,
-        manufacturer TEXT,
-        vehicle_type TEXT,
-        stock INTEGER,
-        price REAL,
-        initial_stock INTEGER DEFAULT 0 
-    )''')
-    cursor.execute('''CREATE TABLE IF NOT EXISTS vendors (
-        id TEXT PRIMARY KEY,
-        name TEXT,
-        contact TEXT,
-        parts TEXT
-    )''')
-    cursor.execute('''CREATE TABLE IF NOT EXISTS sales (
-        id TEXT PRIMARY KEY,
-        part_id TEXT,
-        quantity INTEGER,
-        amount REAL,
-        date TEXT,
-        payment_method TEXT
-    )''')
-    cursor.execute('''CREATE TABLE IF NOT EXISTS users (
-        username TEXT PRIMARY KEY,
-        password TEXT,
-        role TEXT
-    )''')
-    
-    # Create audit log table
-    cursor.execute('''CREATE TABLE IF NOT EXISTS audit_log (
-        id TEXT PRIMARY KEY,
-        action_type TEXT,
-        action_details TEXT,
-        timestamp TEXT,
-        username TEXT,
-        user_role TEXT
-    )''')
-    
-    cursor.execute("SELECT COUNT(*) FROM users")
-    if cursor.fetchone()[0] == 0:
-        cursor.executemany("INSERT INTO users (username, password, role) VALUES (?, ?, ?)", [
-            ("admin", "admin123", "admin"),
-            ("employee1", "emp123", "employee")
-        ])
-    conn.commit()
-
-
-# Generate uuid function
-def generate_uuid():
-    return str(uuid.uuid4())[:8]
-
-
-# Generate inventory id function
-def generate_inventory_id():
-    suffix = str(uuid.uuid4().int)[:3]
-    return f"I-ATIL{suffix}"
-
-
-# Generate vendor id function
-def generate_vendor_id():
-    suffix = str(uuid.uuid4().int)[:3]
-    return f"V-ATIL{suffix}"
-
-
-# Generate sale id function
-def generate_sale_id():
-    suffix = str(uuid.uuid4().int)[:3]
-    return f"S-ATIL{suffix}"
-
-
-# Generate audit id function
-def generate_audit_id():
-    suffix = str(uuid.uuid4().int)[:6]
-    return f"A-ATIL{suffix}"
-
+# Main connection for the UI thread; report jobs read through the read pool
+aspas.connect(DB_NAME)
+
+
+# Paged table class
+# A Treeview holding only a window of rows from a KeysetTable. The next or
+# previous page is fetched when the view scrolls near either end, rows far from
+# the view are dropped, and changed rows are updated in place by key, so the
+# scroll position survives every change.
+class PagedTable:
+    def __init__(self, parent, columns, model, page_size=200, max_rows=1000):
+        self.model = model
+        self.page_size = page_size
+        self.max_rows = max_rows
+        self.has_before = False
+        self.has_after = False
+        self._busy = False
+        self._check_pending = False
+
+        self.frame = ttk.Frame(parent)
+        scrollbar = ttk.Scrollbar(self.frame)
+        scrollbar.pack(side="right", fill="y")
+        self.scrollbar = scrollbar
+        self.tree = ttk.Treeview(self.frame, columns=columns, show='headings', yscrollcommand=self._on_scroll)
+        self.tree.pack(side="left", fill="both", expand=True)
+        scrollbar.config(command=self.tree.yview)
+
+    # Reload function
+    def reload(self):
+        self._busy = True
+        try:
+            self.tree.delete(*self.tree.get_children())
+            rows = self.model.first_page(self.page_size)
+            self.has_before = False
+            self.has_after = len(rows) == self.page_size
+            self._insert(rows, 0)
+            self.tree.yview_moveto(0)
+        finally:
+            self._busy = False
+
+    # Apply changes function
+    # Re-reads the given keys and updates, inserts or removes just those rows.
+    def apply_changes(self, keys):
+        rows = self.model.get_rows(keys)
+        self._busy = True
+        try:
+            for key in keys:
+                row = rows.get(key)
+                if self.tree.exists(key):
+                    if row:
+                        self.tree.item(key, values=row)
+                    else:
+                        self.tree.delete(key)
+                elif row:
+                    children = self.tree.get_children()
+                    # Rows outside the loaded window show up when paged in
+                    if children and ((self.has_before and key < children[0]) or
+                                     (self.has_after and key > children[-1])):
+                        continue
+                    self.tree.insert('', bisect.bisect(children, key), iid=key, values=row)
+        finally:
+            self._busy = False
+
+    # Insert function
+    def _insert(self, rows, index):
+        for offset, row in enumerate(rows):
+            self.tree.insert('', index + offset, iid=row[0], values=row)
+
+    # Scroll callback function
+    def _on_scroll(self, first, last):
+        self.scrollbar.set(first, last)
+        if not self._busy and not self._check_pending:
+            self._check_pending = True
+            self.tree.after_idle(self._check_edges)
+
+    # Check edges function
+    def _check_edges(self):
+        self._check_pending = False
+        first, last = self.tree.yview()
+        if self.has_after and last > 0.9:
+            self._load(after=True)
+        elif self.has_before and first < 0.1:
+            self._load(after=False)
+
+    # Load function
+    # Fetches one page past the end (after=True) or before the start of the
+    # window, trims the opposite end and keeps the same rows in view.
+    def _load(self, after):
+        children = self.tree.get_children()
+        if not children:
+            self.reload()
+            return
 
-# Add audit log function
-def add_audit_log(action_type, action_details):
-    audit_id = generate_audit_id()
-    timestamp = datetime.now().isoformat()
-    username = current_user['username']
-    user_role = current_user['role']
-    
-    cursor.execute("""
-        INSERT INTO audit_log (id, action_type, action_details, timestamp, username, user_role)
-        VALUES (?, ?, ?, ?, ?, ?)
-    """, (audit_id, action_type, action_details, timestamp, username, user_role))
-    conn.commit()
+        self._busy = True
+        try:
+            top = self.tree.yview()[0] * len(children)
+            if after:
+                rows = self.model.page_after(children[-1], self.page_size)
+                self.has_after = len(rows) == self.page_size
+                self._insert(rows, len(children))
+            else:
+                rows = self.model.page_before(children[0], self.page_size)
+                self.has_before = len(rows) == self.page_size
+                self._insert(rows, 0)
+                top += len(rows)
+
+            total = len(children) + len(rows)
+            excess = total - self.max_rows
+            if excess > 0:
+                if after:
+                    self.tree.delete(*children[:excess])
+                    self.has_before = True
+                    top -= excess
+                else:
+                    self.tree.delete(*children[len(children) - excess:])
+                    self.has_after = True
+                total -= excess
+            self.tree.yview_moveto(max(top, 0) / total)
+        finally:
+            self._busy = False
+
+
+# Chart canvas class
+# Shows a ChartPanel's figure in a frame. The Tk canvas is made once and packed
+# with the first chart; later charts redraw the same figure on it.
+class ChartCanvas:
+    def __init__(self, panel, parent):
+        self.panel = panel
+        self.canvas = FigureCanvasTkAgg(panel.figure, master=parent)
+        self._packed = False
+
+    # Show function
+    def show(self, key, data):
+        redrawn = self.panel.show(key, data)
+        if not self._packed:
+            self.canvas.get_tk_widget().pack(fill='both', expand=True)
+            self._packed = True
+            self.canvas.draw()
+        elif redrawn:
+            self.canvas.draw_idle()
+
+    # Hide function
+    def hide(self):
+        if self._packed:
+            self.canvas.get_tk_widget().pack_forget()
+            self._packed = False
+
+
+# Job status class
+# A status label and Cancel button for report queries run on report_jobs.
+# Starting a new job cancels the previous one, and destroying the parent
+# window cancels whatever is still running, so a closed window never waits on
+# (or receives) results from a query it no longer shows.
+class JobStatus:
+    def __init__(self, parent):
+        self.frame = ttk.Frame(parent)
+        self.label = ttk.Label(self.frame, text="")
+        self.label.pack(side="left")
+        self.cancel_button = ttk.Button(self.frame, text="Cancel", command=self.cancel, state="disabled")
+        self.cancel_button.pack(side="left", padx=5)
+        self.job = None
+        self.frame.bind("<Destroy>", lambda e: self.cancel(), add="+")
+
+    # Cancel function
+    def cancel(self):
+        if self.job is not None:
+            self.job.cancel()
+
+    # Run function
+    # fn(job) runs on a worker thread; the callbacks run on the Tk thread and
+    # are dropped once a newer job has started or the window is gone.
+    def run(self, fn, message, on_done=None, on_partial=None, done_message=None):
+        self.cancel()
+        self.label.config(text=message)
+        self.cancel_button.config(state="normal")
+
+        def current(callback):
+            def wrapper(*args):
+                if self.job is job and self.frame.winfo_exists():
+                    callback(*args)
+            return wrapper
+
+        def progress(done, total):
+            self.label.config(text=f"{message} {done}" + (f" of {total}" if total else ""))
+
+        def finish(text):
+            self.job = None
+            self.label.config(text=text)
+            self.cancel_button.config(state="disabled")
+
+        def done(result):
+            finish(done_message(result) if done_message else "")
+            if on_done:
+                on_done(result)
+
+        def error(e):
+            finish("Failed.")
+            messagebox.showerror("Error", str(e))
+
+        job = report_jobs.submit(fn, on_done=current(done), on_partial=on_partial and current(on_partial),
+                                 on_progress=current(progress), on_error=current(error),
+                                 on_cancel=current(lambda: finish("Cancelled.")))
+        self.job = job
+        return job
+
+
+# Export progress function (worker)
+# progress callback for aspas.exports that reports to the job and stops the
+# export when the job is cancelled.
+def export_progress(job):
+    def progress(done, total):
+        job.check()
+        job.progress(done, total)
+    return progress
+
+
+# Export filename function
+def export_filename(prefix, compress):
+    return f"{prefix}_{datetime.now().strftime('%Y%m%d_%H%M%S')}.csv" + (".gz" if compress else "")
+
+
+# Stream query function (worker)
+# Sends the rows of a query to the UI in chunks as they are read.
+def stream_query(job, query, params=(), chunk_size=500):
+    cur = get_connection().execute(query, params)
+    count = 0
+    while True:
+        rows = cur.fetchmany(chunk_size)
+        if not rows:
+            return count
+        count += len(rows)
+        job.partial(rows)
+        job.progress(count)
 
 
 # Add inventory function
 def add_inventory(part_name, manufacturer, vehicle_type, stock, price):
-    inv_id = generate_inventory_id()
-    cursor.execute("INSERT INTO inventory (id, part_name, manufacturer, vehicle_type, stock, price, initial_stock) VALUES (?, ?, ?, ?, ?, ?, ?)",
-                   (inv_id, part_name, manufacturer, vehicle_type, stock, price, stock))
-    conn.commit()
-    
-    # Add audit log entry
-    action_details = f"Added part '{part_name}' (ID: {inv_id}), Stock: {stock}, Price: {price}"
-    add_audit_log("ADD_INVENTORY", action_details)
-    
-    refresh_inventory_table()
-    # Refresh the part dropdown if it exists
-    if 'sale_pid' in globals():
-        populate_part_dropdown()
+    try:
+        aspas.add_inventory(part_name, manufacturer, vehicle_type, stock, price)
+    except aspas.ASPASError as e:
+        messagebox.showerror("Error", str(e))
+
+
+# Import inventory function
+# Adds or updates every part in a supplier CSV in one transaction.
+def import_inventory():
+    path = filedialog.askopenfilename(title="Import Inventory", filetypes=[("CSV files", "*.csv"), ("All files", "*.*")])
+    if not path:
+        return
+    replace = messagebox.askyesno("Import Inventory", "Replace the stock of parts already in the inventory?\n\n"
+                                  "Yes: set it to the file's figures. No: add the file's figures to it.")
+    try:
+        result = aspas.import_inventory_csv(path, replace_stock=replace)
+    except (aspas.ASPASError, OSError) as e:
+        messagebox.showerror("Import Failed", str(e))
+        return
+    messagebox.showinfo("Import Complete", f"{result['rows']} lines imported: {result['added']} parts added, "
+                                           f"{result['updated']} updated.")
 
 
 # Delete inventory function
 def delete_inventory(item_id):
-    # Get part details before deleting for the audit log
-    cursor.execute("SELECT part_name FROM inventory WHERE id = ?", (item_id,))
-    result = cursor.fetchone()
-    part_name = result[0] if result else "Unknown Part"
-    
-    cursor.execute("DELETE FROM inventory WHERE id = ?", (item_id,))
-    conn.commit()
-    
-    # Add audit log entry
-    action_details = f"Deleted part '{part_name}' (ID: {item_id})"
-    add_audit_log("DELETE_INVENTORY", action_details)
-    
-    refresh_inventory_table()
-    # Refresh the part dropdown if it exists
-    if 'sale_pid' in globals():
-        populate_part_dropdown()
+    try:
+        aspas.delete_inventory(item_id)
+    except aspas.PartNotFoundError:
+        messagebox.showerror("Error", "Please select a part to delete.")
 
 
 # Refresh inventory table function
 def refresh_inventory_table():
-    # Clear current table content
-    for row in inventory_table.get_children():
-        inventory_table.delete(row)
-    
-    # Fetch the latest data from the inventory table
-    cursor.execute("SELECT * FROM inventory")
-    rows = cursor.fetchall()
-    for row in rows:
-        inventory_table.insert('', 'end', values=row)  # Insert each row into the table
+    inventory_view.reload()
 
 
-# Check and auto order function
-def check_and_auto_order():
-    cursor.execute("SELECT id, part_name, stock, initial_stock FROM inventory")
-    parts = cursor.fetchall()
-
-    for part in parts:
-        part_id, name, stock, initial_stock = part
-        threshold = initial_stock * 0.3  # 30% of initial stock
-        if stock <= threshold:
-            # Trigger auto-order logic
-            print(f"Auto-order triggered for {name} (Stock: {stock}, Threshold: {threshold})")
-            # Simulating an order by increasing stock to the initial value
-            new_stock = initial_stock
-            cursor.execute("UPDATE inventory SET stock = ? WHERE id = ?", (new_stock, part_id))
-            conn.commit()
-            
-            # Add audit log entry
-            action_details = f"Auto-reorder triggered for '{name}' (ID: {part_id}). Stock updated from {stock} to {new_stock}"
-            add_audit_log("AUTO_REORDER", action_details)
-            
-            # Refresh the inventory table to show updated stock
-            refresh_inventory_table()
-            
-            # Also refresh the part dropdown if it exists
-            if 'sale_pid' in globals():
-                populate_part_dropdown()
+# Show auto order function
+# One summary of the parts put on purchase orders, by vendor.
+def show_auto_orders(reorders):
+    if not reorders:
+        return
+    vendors = {}
+    for r in reorders:
+        vendors.setdefault(r['vendor_name'] or "No vendor", []).append(r)
+    lines = [f"{name}: {len(parts)} part(s), {sum(r['quantity'] for r in parts)} units"
+             for name, parts in sorted(vendors.items())]
+    messagebox.showinfo("Auto-Order", f"{len(reorders)} low-stock part(s) added to draft purchase orders:\n\n"
+                                      + "\n".join(lines))
 
-            messagebox.showinfo("Auto-Order", f"Part '{name}' is low on stock. New stock ordered.")
 
+# Check and auto order function
+def check_and_auto_order():
+    reorders = aspas.check_and_auto_order()
+    if reorders:
+        show_auto_orders(reorders)
+    else:
+        messagebox.showinfo("Auto-Order", "No parts need reordering.")
+
+
+# Refresh purchase order table function
+# Keeps the selected order selected.
+def refresh_purchase_order_table():
+    selected = purchase_order_table.selection()
+    for row in purchase_order_table.get_children():
+        purchase_order_table.delete(row)
+    status = po_status_filter.get()
+    for po_id, _, vendor_name, status, lines, units, cost, created_at, _, _ in aspas.list_purchase_orders(
+            None if status == "All" else status):
+        purchase_order_table.insert('', 'end', iid=po_id, values=(
+            po_id, vendor_name or "(no vendor)", status, lines, units, f"{cost:.2f}",
+            created_at[:16].replace("T", " ")))
+    selected = [po_id for po_id in selected if purchase_order_table.exists(po_id)]
+    if selected:
+        purchase_order_table.selection_set(selected)
+    refresh_po_lines_table()
+
+
+# Refresh po lines table function
+def refresh_po_lines_table():
+    for row in po_lines_table.get_children():
+        po_lines_table.delete(row)
+    selected = purchase_order_table.selection()
+    if not selected:
+        return
+    for part_id, name, quantity, unit_cost, received in aspas.purchase_order_lines(selected[0]):
+        po_lines_table.insert('', 'end', values=(
+            part_id, name, quantity, "" if unit_cost is None else f"{unit_cost:.2f}",
+            "" if received is None else received))
+
+
+# Change purchase order function
+# Sends, receives or cancels the selected order.
+def change_purchase_order(action):
+    selected = purchase_order_table.selection()
+    if not selected:
+        messagebox.showerror("Error", "Please select a purchase order.")
+        return
+    try:
+        action(selected[0])
+    except aspas.ASPASError as e:
+        messagebox.showerror("Error", str(e))
 
 
 # Add vendor function
 def add_vendor(name, contact, parts):
-    ven_id = generate_vendor_id()
-    cursor.execute("INSERT INTO vendors (id, name, contact, parts) VALUES (?, ?, ?, ?)", (ven_id, name, contact, parts))
-    conn.commit()
-    
-    # Add audit log entry
-    action_details = f"Added vendor '{name}' (ID: {ven_id}), Contact: {contact}, Parts: {parts}"
-    add_audit_log("ADD_VENDOR", action_details)
-    
-    refresh_vendor_table()
+    aspas.add_vendor(name, contact, parts)
 
 
 # Refresh vendor table function
+# Keeps the selected vendor selected.
 def refresh_vendor_table():
+    selected = vendor_table.selection()
     for row in vendor_table.get_children():
         vendor_table.delete(row)
-    cursor.execute("SELECT * FROM vendors")
-    for row in cursor.fetchall():
-        vendor_table.insert('', 'end', values=row)
+    for row in aspas.list_vendors():
+        vendor_table.insert('', 'end', iid=row[0], values=row)
+    selected = [vendor_id for vendor_id in selected if vendor_table.exists(vendor_id)]
+    if selected:
+        vendor_table.selection_set(selected)
+    refresh_vendor_parts_table()
+
+
+# Selected vendor function
+def selected_vendor():
+    selected = vendor_table.selection()
+    return selected[0] if selected else None
+
+
+# Refresh vendor parts table function
+# The parts the selected vendor supplies, from the vendor-part catalog.
+def refresh_vendor_parts_table():
+    for row in vendor_parts_table.get_children():
+        vendor_parts_table.delete(row)
+    vendor_id = selected_vendor()
+    if vendor_id is None:
+        return
+    for part_id, name, manufacturer, stock, unit_cost, lead_time in aspas.vendor_parts(vendor_id):
+        vendor_parts_table.insert('', 'end', iid=part_id, values=(
+            part_id, name, manufacturer, stock, "" if unit_cost is None else f"{unit_cost:.2f}",
+            "" if lead_time is None else lead_time))
+
+
+# Link vendor part function
+# Adds a part to the selected vendor, or updates its cost and lead time.
+def link_vendor_part(part_id, unit_cost, lead_time):
+    vendor_id = selected_vendor()
+    if vendor_id is None:
+        messagebox.showerror("Error", "Please select a vendor.")
+        return
+    try:
+        aspas.set_vendor_part(vendor_id, part_id.strip(), unit_cost, lead_time)
+    except aspas.ASPASError as e:
+        messagebox.showerror("Error", str(e))
+
+
+# Unlink vendor part function
+def unlink_vendor_part():
+    vendor_id = selected_vendor()
+    selected = vendor_parts_table.selection()
+    if vendor_id is None or not selected:
+        messagebox.showerror("Error", "Please select a vendor part to remove.")
+        return
+    try:
+        aspas.remove_vendor_part(vendor_id, selected[0])
+    except aspas.ASPASError as e:
+        messagebox.showerror("Error", str(e))
 
 # Function to populate the part ID dropdown in sales tab
 
 # Populate part dropdown function
+# Only the best in-stock matches for the text typed so far are listed, from the
+# part search index, so this stays fast however many parts there are.
 def populate_part_dropdown():
-    cursor.execute("SELECT id, part_name FROM inventory WHERE stock > 0")
-    parts = cursor.fetchall()
+    parts = search_parts(sale_pid.get(), PART_MATCHES)
     # Format as "ID - Part Name" for better readability
     part_options = [f"{part[0]} - {part[1]}" for part in parts]
     sale_pid['values'] = part_options
@@ -232,59 +447,25 @@ def populate_part_dropdown():
 
 # Refresh sales table function
 def refresh_sales_table():
-    # Clear current sales table content
-    for row in sales_table.get_children():
-        sales_table.delete(row)
-    
-    # Fetch the latest sales data from the database and include unit price
-    cursor.execute("""
-        SELECT s.id, s.part_id, s.quantity, i.price as unit_price, s.amount, s.date, s.payment_method 
-        FROM sales s
-        JOIN inventory i ON s.part_id = i.id
-    """)
-    for sale in cursor.fetchall():
-        sales_table.insert("", "end", values=sale)
-
+    sales_view.reload()
 
 
 # Record sale function
 def record_sale(part_id, quantity, method):
     try:
-        quantity = int(quantity)
-    except ValueError:
-        messagebox.showerror("Invalid", "Quantity must be a number.")
+        receipt = aspas.record_sale(part_id, quantity, method)
+    except aspas.ValidationError as e:
+        messagebox.showerror("Invalid", str(e))
         return
-        
-    cursor.execute("SELECT stock, price, initial_stock, part_name FROM inventory WHERE id = ?", (part_id,))
-    result = cursor.fetchone()
-    if not result:
+    except aspas.PartNotFoundError:
         messagebox.showerror("Error", "Part not found.")
         return
-        
-    stock, price, initial_stock, part_name = result
-    if stock < quantity:
+    except aspas.InsufficientStockError:
         messagebox.showerror("Error", "Insufficient stock.")
         return
-        
-    new_stock = stock - quantity
-    amount = quantity * price
-    cursor.execute("UPDATE inventory SET stock = ? WHERE id = ?", (new_stock, part_id))
-    sale_id = generate_sale_id()
-    cursor.execute("INSERT INTO sales (id, part_id, quantity, amount, date, payment_method) VALUES (?, ?, ?, ?, ?, ?)",
-                   (sale_id, part_id, quantity, amount, datetime.now().isoformat(), method))
-    conn.commit()
-    
-    # Add audit log entry
-    action_details = f"Sale recorded (ID: {sale_id}) for '{part_name}' (ID: {part_id}), Quantity: {quantity}, Amount: ₹{amount:.2f}"
-    add_audit_log("RECORD_SALE", action_details)
-    
-    refresh_inventory_table()
-    refresh_sales_table()
-    # Refresh the part dropdown
-    if 'sale_pid' in globals():
-        populate_part_dropdown()
-    check_and_auto_order()
-    messagebox.showinfo("Success", f"Sale recorded. Amount: ₹{amount:.2f}")
+
+    show_auto_orders(receipt['reorders'])
+    messagebox.showinfo("Success", f"Sale recorded. Amount: ₹{receipt['amount']:.2f}")
 
 
 # Generate reports function
@@ -302,19 +483,28 @@ def generate_reports():
     text = tk.Text(win, width=80, height=20)
     text.pack(padx=10, pady=10)
 
+    status = JobStatus(win)
+    status.frame.pack(padx=10, pady=(0, 10), anchor="w")
+
 
 # Apply filter function
     def apply_filter():
         query = "SELECT * FROM sales"
         args = []
         if date_entry.get():
-            query += " WHERE date LIKE ?"
-            args.append(date_entry.get() + "%")
-        cursor.execute(query, args)
-        rows = cursor.fetchall()
+            # Range on date instead of LIKE so the date index is used
+            query += " WHERE date >= ? AND date < ?"
+            args.extend(prefix_range(date_entry.get()))
         text.delete("1.0", tk.END)
-        for r in rows:
-            text.insert(tk.END, f"Sale ID: {r[0]}, Part ID: {r[1]}, Qty: {r[2]}, Amount: {r[3]}, Date: {r[4]}, Payment: {r[5]}\n")
+
+        def show_rows(rows):
+            text.insert(tk.END, "".join(
+                f"Sale ID: {r[0]}, Part ID: {r[1]}, Qty: {r[2]}, Amount: {r[3]}, Date: {r[4]}, Payment: {r[5]}\n"
+                for r in rows))
+
+        # Rows are read on a worker thread and shown as they arrive
+        status.run(lambda job: stream_query(job, query, args), "Loading sales...",
+                   on_partial=show_rows, done_message=lambda count: f"{count} sales.")
 
     ttk.Button(filter_frame, text="Apply Filter", command=apply_filter).pack(side="left", padx=5)
     apply_filter()
@@ -325,46 +515,18 @@ def generate_reports():
 
 # Export monthly sales pdf function
 def export_monthly_sales_pdf():
-    cursor.execute("""
-        SELECT strftime('%Y-%m', date) AS month, COUNT(*) as total_sales, SUM(quantity) as total_quantity, SUM(amount) as total_revenue
-        FROM sales
-        GROUP BY month
-        ORDER BY month
-    """)
-    rows = cursor.fetchall()
-
-    if not rows:
-        messagebox.showinfo("No Data", "No sales data available.")
-        return
+    def exported(filename):
+        if not filename:
+            messagebox.showinfo("No Data", "No sales data available.")
+            return
 
-    filename = "Monthly_Sales_Report.pdf"
-    c = canvas.Canvas(filename, pagesize=letter)
-    c.setFont("Helvetica", 12)
-    c.drawString(180, 750, "Monthly Sales Report")
-
-    y = 700
-    c.drawString(50, y, "Month")
-    c.drawString(150, y, "Total Sales")
-    c.drawString(270, y, "Total Qty")
-    c.drawString(390, y, "Revenue (₹)")
-    y -= 20
-
-    for month, total_sales, total_quantity, total_revenue in rows:
-        c.drawString(50, y, month)
-        c.drawString(150, y, str(total_sales))
-        c.drawString(270, y, str(total_quantity))
-        c.drawString(390, y, f"{total_revenue:.2f}")
-        y -= 20
-        if y < 50:
-            c.showPage()
-            y = 750
-
-    c.save()
-    
-    # Add audit log entry
-    add_audit_log("EXPORT_PDF", f"Exported monthly sales report as PDF: {filename}")
-    
-    messagebox.showinfo("Report Generated", f"PDF saved as {os.path.abspath(filename)}")
+        # Add audit log entry
+        add_audit_log("EXPORT_PDF", f"Exported monthly sales report as PDF: {filename}")
+
+        messagebox.showinfo("Report Generated", f"PDF saved as {os.path.abspath(filename)}")
+
+    reports_status.run(lambda job: write_monthly_sales_pdf(), "Exporting PDF...",
+                       on_done=exported)
 
 
 # Function to view audit logs with filtering
@@ -386,8 +548,7 @@ def view_audit_logs():
     ttk.Label(filter_frame, text="Action:").grid(row=0, column=1, padx=5)
     action_var = tk.StringVar()
     action_combo = ttk.Combobox(filter_frame, textvariable=action_var, width=15)
-    cursor.execute("SELECT DISTINCT action_type FROM audit_log")
-    action_types = [r[0] for r in cursor.fetchall()]
+    action_types, users = audit_filter_values()
     action_combo['values'] = ["All"] + action_types
     action_combo.current(0)
     action_combo.grid(row=0, column=2, padx=5)
@@ -396,27 +557,28 @@ def view_audit_logs():
     ttk.Label(filter_frame, text="User:").grid(row=0, column=3, padx=5)
     user_var = tk.StringVar()
     user_combo = ttk.Combobox(filter_frame, textvariable=user_var, width=15)
-    cursor.execute("SELECT DISTINCT username FROM audit_log")
-    users = [r[0] for r in cursor.fetchall()]
     user_combo['values'] = ["All"] + users
     user_combo.current(0)
     user_combo.grid(row=0, column=4, padx=5)
     
-    # Date filter
-    ttk.Label(filter_frame, text="Date (YYYY-MM-DD):").grid(row=0, column=5, padx=5)
-    date_entry = ttk.Entry(filter_frame, width=15)
-    date_entry.grid(row=0, column=6, padx=5)
-    
-    # Create treeview to display audit logs
-    log_frame = ttk.Frame(audit_win)
-    log_frame.pack(fill="both", expand=True, padx=10, pady=5)
+    # Time range filter
+    ttk.Label(filter_frame, text="From (YYYY-MM-DD):").grid(row=0, column=5, padx=5)
+    start_entry = ttk.Entry(filter_frame, width=12)
+    start_entry.grid(row=0, column=6, padx=5)
+    ttk.Label(filter_frame, text="To:").grid(row=0, column=7, padx=5)
+    end_entry = ttk.Entry(filter_frame, width=12)
+    end_entry.grid(row=0, column=8, padx=5)
+
+    # Details search
+    ttk.Label(filter_frame, text="Search details:").grid(row=1, column=0, columnspan=2, padx=5, pady=5)
+    search_entry = ttk.Entry(filter_frame, width=40)
+    search_entry.grid(row=1, column=2, columnspan=3, padx=5, pady=5, sticky="w")
     
-    # Scrollbar
-    scrollbar = ttk.Scrollbar(log_frame)
-    scrollbar.pack(side="right", fill="y")
-    
-    # Treeview
-    log_tree = ttk.Treeview(log_frame, yscrollcommand=scrollbar.set, columns=("ID", "Action", "Details", "Timestamp", "User", "Role"), show="headings")
+    # Treeview showing a window of pages, newest first; more load as it scrolls
+    columns = ("ID", "Action", "Details", "Timestamp", "User", "Role")
+    log_view = PagedTable(audit_win, columns, AuditLogTable())
+    log_view.frame.pack(fill="both", expand=True, padx=10, pady=5)
+    log_tree = log_view.tree
     
     # Column definitions
     log_tree.column("ID", width=80)
@@ -433,93 +595,71 @@ def view_audit_logs():
     log_tree.heading("Timestamp", text="Timestamp")
     log_tree.heading("User", text="Username")
     log_tree.heading("Role", text="User Role")
-    
-    log_tree.pack(fill="both", expand=True)
-    
-    # Configure scrollbar
-    scrollbar.config(command=log_tree.yview)
+
+    status = JobStatus(audit_win)
+    status.frame.pack(padx=10, anchor="w")
     
     # Function to refresh log data based on filters
 
+# Current filters function
+    def current_filters():
+        return dict(action_type=None if action_var.get() == "All" else action_var.get(),
+                    username=None if user_var.get() == "All" else user_var.get(),
+                    start=start_entry.get().strip() or None,
+                    end=end_entry.get().strip() or None,
+                    text=search_entry.get().strip() or None)
+
 # Refresh logs function
     def refresh_logs():
-        # Clear current data
-        for item in log_tree.get_children():
-            log_tree.delete(item)
-        
-        # Build query based on filters
-        query = "SELECT * FROM audit_log WHERE 1=1"
-        params = []
-        
-        if action_var.get() != "All":
-            query += " AND action_type = ?"
-            params.append(action_var.get())
-            
-        if user_var.get() != "All":
-            query += " AND username = ?"
-            params.append(user_var.get())
-            
-        if date_entry.get():
-            query += " AND timestamp LIKE ?"
-            params.append(f"{date_entry.get()}%")
-            
-        query += " ORDER BY timestamp DESC"
-        
-        # Execute query and populate treeview
-        cursor.execute(query, params)
-        for row in cursor.fetchall():
-            log_tree.insert("", "end", values=row)
-        
-        # Add audit log entry for viewing audit logs
-        add_audit_log("VIEW_AUDIT_LOG", "Viewed system audit logs")
+        # Show entries still waiting in the audit buffer too (as many as are
+        # written in time; the rest show up on the next refresh)
+        aspas.flush_audit_log(FLUSH_TIMEOUT)
+
+        log_view.model = AuditLogTable(**current_filters())
+        log_view.reload()
+
+        # The total is counted on a worker thread while the first page is shown
+        model = log_view.model
+        status.run(lambda job: model.count(), "Counting entries...",
+                   done_message=lambda count: f"{count} entries.")
+
+    search_entry.bind("<Return>", lambda e: refresh_logs())
     
     # Export audit logs to CSV
 
 # Export audit logs function
+    # Streams the filtered log to the file on a worker thread
     def export_audit_logs():
-        filename = f"audit_logs_{datetime.now().strftime('%Y%m%d_%H%M%S')}.csv"
-        
-        with open(filename, 'w', newline='') as csvfile:
-            csvwriter = csv.writer(csvfile)
-            # Write header
-            csvwriter.writerow(["Log ID", "Action Type", "Details", "Timestamp", "Username", "User Role"])
-            
-            # Write data - use the same query as the current view
-            query = "SELECT * FROM audit_log WHERE 1=1"
-            params = []
-            
-            if action_var.get() != "All":
-                query += " AND action_type = ?"
-                params.append(action_var.get())
-                
-            if user_var.get() != "All":
-                query += " AND username = ?"
-                params.append(user_var.get())
-                
-            if date_entry.get():
-                query += " AND timestamp LIKE ?"
-                params.append(f"{date_entry.get()}%")
-                
-            query += " ORDER BY timestamp DESC"
-            
-            cursor.execute(query, params)
-            csvwriter.writerows(cursor.fetchall())
-        
-        # Add audit log entry
-        add_audit_log("EXPORT_AUDIT_LOG", f"Exported audit logs to CSV: {filename}")
-        
-        messagebox.showinfo("Export Complete", f"Audit logs exported to {filename}")
-    
+        filename = export_filename("audit_logs", compress_var.get())
+        if not aspas.flush_audit_log(FLUSH_TIMEOUT):
+            messagebox.showwarning("Export Audit Logs",
+                                   "Some recent audit entries could not be written yet and will be missing from the export.")
+        filters = current_filters()
+
+        def exported(count):
+            # Add audit log entry
+            add_audit_log("EXPORT_AUDIT_LOG", f"Exported audit logs to CSV: {filename}")
+
+            messagebox.showinfo("Export Complete", f"{count} audit log entries exported to {filename}")
+
+        status.run(lambda job: export_audit_log(filename, progress=export_progress(job), **filters),
+                   "Exporting...", on_done=exported, done_message=lambda count: f"{count} entries exported.")
+
     # Button frame
     button_frame = ttk.Frame(audit_win)
     button_frame.pack(fill="x", padx=10, pady=5)
     
     ttk.Button(button_frame, text="Apply Filters", command=refresh_logs).pack(side="left", padx=5)
     ttk.Button(button_frame, text="Export to CSV", command=export_audit_logs).pack(side="left", padx=5)
+    compress_var = tk.BooleanVar()
+    ttk.Checkbutton(button_frame, text="Compress (gzip)", variable=compress_var).pack(side="left", padx=5)
     
     # Load initial data
     refresh_logs()
 
+    # Logged once per window, not on every refresh, so browsing does not grow the log
+    add_audit_log("VIEW_AUDIT_LOG", "Viewed system audit logs")
+
 
 # Function to calculate average weekly demand for each part
 def calculate_weekly_demand():
@@ -596,208 +736,61 @@ def calculate_weekly_demand():
     # Chart frame for visualization
     chart_frame = ttk.LabelFrame(weekly_demand_win, text="Weekly Demand Chart")
     chart_frame.pack(fill="both", expand=True, padx=10, pady=10)
-    
+
+    # One figure for every analysis in this window
+    chart_canvas = ChartCanvas(ChartPanel(plot_weekly_demand, figsize=(8, 4)), chart_frame)
+
     # Function to calculate and display weekly demand
     def analyze_weekly_demand():
         # Clear current data
         for item in weekly_tree.get_children():
             weekly_tree.delete(item)
-        
-        # Clear previous chart if exists
-        for widget in chart_frame.winfo_children():
-            widget.destroy()
-        
-        # Build base query to get sales data grouped by part and week
-        query_parts = [
-            "SELECT s.part_id, i.part_name,",
-            "strftime('%Y-%W', s.date) AS week,",
-            "SUM(s.quantity) AS total_quantity,",
-            "ROUND(AVG(s.quantity), 2) AS avg_daily",
-            "FROM sales s",
-            "JOIN inventory i ON s.part_id = i.id",
-            "WHERE 1=1"
-        ]
-        
-        params = []
-        
-        # Add date filters if provided
-        if start_date_entry.get():
-            query_parts.append("AND s.date >= ?")
-            params.append(start_date_entry.get())
-        
-        if end_date_entry.get():
-            query_parts.append("AND s.date <= ?")
-            params.append(end_date_entry.get() + " 23:59:59")  # Include entire day
-        
-        # Add part filter if provided
-        if part_entry.get():
-            query_parts.append("AND s.part_id = ?")
-            params.append(part_entry.get())
-        
-        # Group by part and week
-        query_parts.append("GROUP BY s.part_id, week")
-        query_parts.append("ORDER BY s.part_id, week")
-        
-        query = " ".join(query_parts)
-        
-        # Execute query
-        cursor.execute(query, params)
-        weekly_data = cursor.fetchall()
-        
-        if not weekly_data:
-            messagebox.showinfo("No Data", "No sales data available for the selected filters.")
-            return
-        
-        # Additional data for min/max and trends
-        part_week_data = {}
-        
-        # Process each result
-        for part_id, part_name, week, total_qty, avg_daily in weekly_data:
-            # Get daily sales for this part and week to calculate min/max
-            week_start = datetime.strptime(f"{week}-1", "%Y-%W-%w").strftime("%Y-%m-%d")
-            week_end = (datetime.strptime(f"{week}-1", "%Y-%W-%w") + timedelta(days=6)).strftime("%Y-%m-%d")
-            
-            cursor.execute("""
-                SELECT strftime('%Y-%m-%d', date) AS sale_date, SUM(quantity) AS day_qty
-                FROM sales
-                WHERE part_id = ? AND date >= ? AND date <= ?
-                GROUP BY sale_date
-                ORDER BY sale_date
-            """, (part_id, week_start, week_end))
-            
-            daily_sales = cursor.fetchall()
-            
-            # Calculate min/max
-            if daily_sales:
-                daily_qtys = [qty for _, qty in daily_sales]
-                max_day = max(daily_qtys) if daily_qtys else 0
-                min_day = min(daily_qtys) if daily_qtys else 0
-            else:
-                max_day = min_day = 0
-            
-            # Calculate trend (compare with previous week if available)
-            if part_id not in part_week_data:
-                part_week_data[part_id] = []
-            
-            trend = "—"  # Default: no change
-            if part_week_data[part_id]:
-                prev_qty = part_week_data[part_id][-1][3]  # total_qty from previous week
-                if total_qty > prev_qty:
-                    trend = "↑"  # Increasing
-                elif total_qty < prev_qty:
-                    trend = "↓"  # Decreasing
-            
-            # Store data for trend calculation of future weeks
-            part_week_data[part_id].append((part_id, part_name, week, total_qty))
-            
-            # Insert into tree
-            weekly_tree.insert("", "end", values=(
-                part_id, part_name, week, total_qty, avg_daily, max_day, min_day, trend
-            ))
-        
-        # Create visualization
-        create_demand_chart(weekly_data)
-        
-        # Add audit log entry
-        add_audit_log("VIEW_WEEKLY_DEMAND", "Analyzed weekly demand for parts")
-    
-    # Function to create demand chart
-    def create_demand_chart(weekly_data):
-        # Group data by part
-        part_data = {}
-        for part_id, part_name, week, total_qty, _ in weekly_data:
-            if part_id not in part_data:
-                part_data[part_id] = {"name": part_name, "weeks": [], "quantities": []}
-            
-            part_data[part_id]["weeks"].append(week)
-            part_data[part_id]["quantities"].append(total_qty)
-        
-        # Create figure
-        fig, ax = plt.subplots(figsize=(8, 4))
-        
-        # Plot line for each part (limit to top 5 parts for clarity)
-        colors = ['b', 'g', 'r', 'c', 'm', 'y']
-        
-        # Sort parts by total quantity sold
-        sorted_parts = sorted(
-            part_data.items(), 
-            key=lambda x: sum(x[1]["quantities"]), 
-            reverse=True
-        )
-        
-        # Take top 5 parts only
-        top_parts = sorted_parts[:5]
-        
-        for i, (part_id, data) in enumerate(top_parts):
-            color = colors[i % len(colors)]
-            ax.plot(data["weeks"], data["quantities"], marker='o', linestyle='-', 
-                    color=color, label=f"{data['name']} ({part_id})")
-        
-        ax.set_title("Weekly Demand by Part")
-        ax.set_xlabel("Week")
-        ax.set_ylabel("Quantity Sold")
-        ax.legend(loc='upper left', bbox_to_anchor=(1, 1))
-        ax.tick_params(axis='x', rotation=45)
-        fig.tight_layout()
-        
-        # Embed in tkinter window
-        canvas = FigureCanvasTkAgg(fig, master=chart_frame)
-        canvas.draw()
-        canvas.get_tk_widget().pack(fill='both', expand=True)
-
-        plt.close(fig)  # Frees memory by closing the figure
-    
+
+        # Totals, daily max/min and trend per part and week in a single query,
+        # unless these filters were analyzed since the last sale
+        start_date, end_date, part_id = start_date_entry.get(), end_date_entry.get(), part_entry.get()
+        key = chart_key(start_date, end_date, part_id)
+
+        def show(weekly_data):
+            if not weekly_data:
+                chart_canvas.hide()
+                messagebox.showinfo("No Data", "No sales data available for the selected filters.")
+                return
+
+            for row in weekly_data:
+                weekly_tree.insert("", "end", values=row)
+
+            # Create visualization
+            chart_canvas.show(key, weekly_data)
+
+            # Add audit log entry
+            add_audit_log("VIEW_WEEKLY_DEMAND", "Analyzed weekly demand for parts")
+
+        cached = chart_canvas.panel.cached(key)
+        if cached is not None:
+            show(cached)
+        else:
+            status.run(lambda job: analyze_demand(start_date, end_date, part_id), "Analyzing...", on_done=show)
+
     # Function to export weekly demand data as CSV
+    # Streams the weekly rollup rows to the file on a worker thread
     def export_weekly_demand():
-        filename = f"weekly_demand_{datetime.now().strftime('%Y%m%d_%H%M%S')}.csv"
-        
-        # Build query similar to the one in analyze_weekly_demand
-        query_parts = [
-            "SELECT s.part_id, i.part_name,",
-            "strftime('%Y-%W', s.date) AS week,",
-            "SUM(s.quantity) AS total_quantity,",
-            "ROUND(AVG(s.quantity), 2) AS avg_daily",
-            "FROM sales s",
-            "JOIN inventory i ON s.part_id = i.id",
-            "WHERE 1=1"
-        ]
-        
-        params = []
-        
-        if start_date_entry.get():
-            query_parts.append("AND s.date >= ?")
-            params.append(start_date_entry.get())
-        
-        if end_date_entry.get():
-            query_parts.append("AND s.date <= ?")
-            params.append(end_date_entry.get() + " 23:59:59")
-        
-        if part_entry.get():
-            query_parts.append("AND s.part_id = ?")
-            params.append(part_entry.get())
-        
-        query_parts.append("GROUP BY s.part_id, week")
-        query_parts.append("ORDER BY s.part_id, week")
-        
-        query = " ".join(query_parts)
-        cursor.execute(query, params)
-        weekly_data = cursor.fetchall()
-        
-        if not weekly_data:
-            messagebox.showinfo("No Data", "No data available to export.")
-            return
-            
-        with open(filename, 'w', newline='') as csvfile:
-            csvwriter = csv.writer(csvfile)
-            # Write header
-            csvwriter.writerow(["Part ID", "Part Name", "Week", "Total Quantity", "Average Daily"])
-            # Write data
-            csvwriter.writerows(weekly_data)
-        
-        # Add audit log entry
-        add_audit_log("EXPORT_WEEKLY_DEMAND", f"Exported weekly demand report to CSV: {filename}")
-        
-        messagebox.showinfo("Export Complete", f"Weekly demand data exported to {filename}")
+        filename = export_filename("weekly_demand", compress_var.get())
+        filters = (start_date_entry.get(), end_date_entry.get(), part_entry.get())
+
+        def exported(count):
+            if not count:
+                os.remove(filename)
+                messagebox.showinfo("No Data", "No data available to export.")
+                return
+
+            # Add audit log entry
+            add_audit_log("EXPORT_WEEKLY_DEMAND", f"Exported weekly demand report to CSV: {filename}")
+
+            messagebox.showinfo("Export Complete", f"Weekly demand data exported to {filename}")
+
+        status.run(lambda job: write_weekly_demand_csv(filename, *filters, progress=export_progress(job)),
+                   "Exporting...", on_done=exported)
     
     # Button frame
     button_frame = ttk.Frame(filter_frame)
@@ -805,6 +798,11 @@ def calculate_weekly_demand():
     
     ttk.Button(button_frame, text="Analyze Demand", command=analyze_weekly_demand).pack(side="left", padx=5)
     ttk.Button(button_frame, text="Export to CSV", command=export_weekly_demand).pack(side="left", padx=5)
+    compress_var = tk.BooleanVar()
+    ttk.Checkbutton(button_frame, text="Compress (gzip)", variable=compress_var).pack(side="left", padx=5)
+
+    status = JobStatus(button_frame)
+    status.frame.pack(side="left", padx=5)
     
     # Make some fields optional but with defaults
     current_date = datetime.now()
@@ -819,6 +817,44 @@ def calculate_weekly_demand():
     analyze_weekly_demand()
 
 
+# === PURCHASE ORDERS TAB (Admin only) ===
+
+# Create purchase orders tab function
+def create_purchase_orders_tab(notebook):
+    po_tab = ttk.Frame(notebook)
+    notebook.add(po_tab, text="Purchase Orders")
+
+    frm_filter = ttk.Frame(po_tab)
+    frm_filter.pack(pady=5, fill="x", padx=10)
+
+    global po_status_filter, purchase_order_table, po_lines_table
+    ttk.Label(frm_filter, text="Status").pack(side="left", padx=5)
+    po_status_filter = ttk.Combobox(frm_filter, values=["All"] + list(aspas.PO_STATUSES), state="readonly", width=12)
+    po_status_filter.set("All")
+    po_status_filter.pack(side="left", padx=5)
+    po_status_filter.bind("<<ComboboxSelected>>", lambda e: refresh_purchase_order_table())
+    ttk.Button(frm_filter, text="Check Reorders", command=check_and_auto_order).pack(side="right", padx=5)
+
+    purchase_order_table = ttk.Treeview(po_tab, columns=("PO ID", "Vendor", "Status", "Lines", "Units", "Cost", "Created"), show='headings', selectmode="browse")
+    for col in purchase_order_table["columns"]:
+        purchase_order_table.heading(col, text=col)
+    purchase_order_table.pack(pady=5, fill="both", expand=True)
+    purchase_order_table.bind("<<TreeviewSelect>>", lambda e: refresh_po_lines_table())
+
+    po_lines_table = ttk.Treeview(po_tab, columns=("Part ID", "Part Name", "Quantity", "Unit Cost", "Received"), show='headings', height=8)
+    for col in po_lines_table["columns"]:
+        po_lines_table.heading(col, text=col)
+    po_lines_table.pack(pady=5, fill="both", expand=True)
+
+    frm_po = ttk.Frame(po_tab)
+    frm_po.pack(pady=10)
+    ttk.Button(frm_po, text="Send", command=lambda: change_purchase_order(aspas.send_purchase_order)).pack(side="left", padx=5)
+    ttk.Button(frm_po, text="Receive", command=lambda: change_purchase_order(aspas.receive_purchase_order)).pack(side="left", padx=5)
+    ttk.Button(frm_po, text="Cancel Order", command=lambda: change_purchase_order(aspas.cancel_purchase_order)).pack(side="left", padx=5)
+
+    refresh_purchase_order_table()
+
+
 # === REPORTS TAB (Admin only) ===
 
 # Create reports tab function
@@ -838,32 +874,21 @@ def create_reports_tab(notebook):
     chart_frame = ttk.LabelFrame(report_tab, text="Monthly Sales Chart")
     chart_frame.pack(fill="both", expand=True, padx=20, pady=10)
 
+    sales_chart = ChartCanvas(ChartPanel(plot_monthly_revenue, figsize=(6, 4)), chart_frame)
+
+    # Redraws only when sales have changed since the chart was last shown
     def draw_sales_chart():
-        cursor.execute("""
-            SELECT strftime('%Y-%m', date) as month, SUM(amount) as revenue
-            FROM sales
-            GROUP BY month
-            ORDER BY month
-        """)
-        data = cursor.fetchall()
-        if not data:
-            messagebox.showinfo("No Data", "No sales data available for chart.")
+        key = chart_key()
+        if sales_chart.panel.current(key):
             return
 
-        months = [d[0] for d in data]
-        revenues = [d[1] for d in data]
+        def draw(totals):
+            if not totals:
+                messagebox.showinfo("No Data", "No sales data available for chart.")
+                return
+            sales_chart.show(key, totals)
 
-        fig, ax = plt.subplots(figsize=(6, 4))
-        ax.bar(months, revenues, color='skyblue')
-        ax.set_title("Monthly Revenue")
-        ax.set_xlabel("Month")
-        ax.set_ylabel("Revenue (₹)")
-        ax.tick_params(axis='x', rotation=45)
-        fig.tight_layout()
-
-        canvas = FigureCanvasTkAgg(fig, master=chart_frame)
-        canvas.draw()
-        canvas.get_tk_widget().pack(fill='both', expand=True)
+        reports_status.run(lambda job: monthly_totals(), "Loading chart...", on_done=draw)
 
     ttk.Button(chart_frame, text="Show Sales Chart", command=draw_sales_chart).pack(pady=5)
 
@@ -873,35 +898,23 @@ def create_reports_tab(notebook):
 
     ttk.Button(audit_frame, text="View Audit Logs", command=view_audit_logs).pack(side="left", padx=10, pady=10)
 
+    # Progress of the tab's background exports and charts
+    global reports_status
+    reports_status = JobStatus(report_tab)
+    reports_status.frame.pack(padx=20, pady=(0, 10), anchor="w")
+
 
 # Record sale from customer view function
 def record_sale_from_customer_view(part_id, quantity, method):
     try:
-        quantity = int(quantity)
-    except ValueError:
+        aspas.record_customer_sale(part_id, quantity, method)
+    except aspas.ValidationError:
         messagebox.showerror("Invalid", "Quantity must be a number.")
         return
-        
-    cursor.execute("SELECT stock, part_name FROM inventory WHERE id = ?", (part_id,))
-    result = cursor.fetchone()
-    if not result or result[0] < quantity:
+    except (aspas.PartNotFoundError, aspas.InsufficientStockError):
         messagebox.showerror("Error", "Insufficient stock.")
         return
-        
-    stock, part_name = result
-    
-    cursor.execute("UPDATE inventory SET stock = stock - ? WHERE id = ?", (quantity, part_id))
-    sale_id = generate_sale_id()
-    cursor.execute("INSERT INTO sales (id, part_id, quantity, date, payment_method) VALUES (?, ?, ?, ?, ?)",
-                   (sale_id, part_id, quantity, datetime.now().isoformat(), method))
-    conn.commit()
-    
-    # Add audit log entry
-    action_details = f"Customer sale recorded for '{part_name}' (ID: {part_id}), Quantity: {quantity}"
-    add_audit_log("CUSTOMER_SALE", action_details)
-    
-    refresh_inventory_table()
-    refresh_sales_table()
+
     messagebox.showinfo("Order Confirmed", f"Sale recorded successfully for Part ID {part_id}.")
 
 
@@ -924,22 +937,20 @@ def login_screen():
     def authenticate():
         username = username_entry.get()
         password = password_entry.get()
-        cursor.execute("SELECT role FROM users WHERE username = ? AND password = ?", (username, password))
-        result = cursor.fetchone()
-        if result:
-            global current_user
-            current_user = {'username': username, 'role': result[0]}
-            
-            # Add audit log entry for login
-            add_audit_log("LOGIN", f"User login: {username} ({result[0]})")
-            
-            login_win.destroy()
-            build_gui()
-        else:
+        try:
+            user = aspas.authenticate(username, password)
+        except aspas.AuthenticationError:
             messagebox.showerror("Login Failed", "Invalid credentials.")
-            
+
             # Optionally log failed login attempts
             # add_audit_log("FAILED_LOGIN", f"Failed login attempt for username: {username}")
+            return
+
+        # Add audit log entry for login
+        add_audit_log("LOGIN", f"User login: {username} ({user['role']})")
+
+        login_win.destroy()
+        build_gui()
 
     ttk.Button(login_win, text="Login", command=authenticate).pack(pady=10)
 
@@ -951,6 +962,13 @@ def build_gui():
     root = tk.Tk()
     root.title(f"ASPAS System - {current_user['username']} ({current_user['role']})")
 
+    # Report queries run on worker threads; their results come back through
+    # the Tk event loop so the window keeps responding while they run
+    global report_jobs
+    dispatcher = UIDispatcher(root)
+    dispatcher.start()
+    report_jobs = JobExecutor(dispatch=dispatcher)
+
     notebook = ttk.Notebook(root)
     notebook.pack(expand=True, fill='both')
 
@@ -958,11 +976,12 @@ def build_gui():
     inv_tab = ttk.Frame(notebook)
     notebook.add(inv_tab, text="Inventory")
 
-    global inventory_table
-    inventory_table = ttk.Treeview(inv_tab, columns=("ID", "Part Name", "Manufacturer", "Vehicle Type", "Stock", "Price"), show='headings')
+    global inventory_view, inventory_table
+    inventory_view = PagedTable(inv_tab, ("ID", "Part Name", "Manufacturer", "Vehicle Type", "Stock", "Price"), CACHED_INVENTORY_TABLE)
+    inventory_table = inventory_view.tree
     for col in inventory_table["columns"]:
         inventory_table.heading(col, text=col)
-    inventory_table.pack(pady=10, fill="both", expand=True)
+    inventory_view.frame.pack(pady=10, fill="both", expand=True)
 
     frm_inv = ttk.Frame(inv_tab)
     frm_inv.pack(pady=10)
@@ -997,6 +1016,7 @@ def build_gui():
     ttk.Button(frm_inv, text="Add Inventory", command=handle_add).grid(row=6, columnspan=2, pady=5)
     ttk.Button(frm_inv, text="Delete Selected", command=lambda: delete_inventory(
         inventory_table.item(inventory_table.selection()[0])['values'][0] if inventory_table.selection() else None)).grid(row=7, columnspan=2, pady=5)
+    ttk.Button(frm_inv, text="Import CSV...", command=import_inventory).grid(row=8, columnspan=2, pady=5)
 
     refresh_inventory_table()
 
@@ -1012,6 +1032,19 @@ def build_gui():
     # Populate the dropdown initially
     populate_part_dropdown()
 
+    # Type-ahead: refilter the dropdown once typing pauses
+    typeahead_job = None
+
+    def on_part_typed(event):
+        nonlocal typeahead_job
+        if event.keysym in ("Up", "Down", "Return", "Escape", "Tab"):
+            return
+        if typeahead_job:
+            sale_pid.after_cancel(typeahead_job)
+        typeahead_job = sale_pid.after(150, populate_part_dropdown)
+
+    sale_pid.bind("<KeyRelease>", on_part_typed)
+
     ttk.Label(sales_tab, text="Quantity").pack(pady=5)
     sale_qty = ttk.Entry(sales_tab)
     sale_qty.pack(pady=5)
@@ -1037,16 +1070,17 @@ def build_gui():
 
     ttk.Button(sales_tab, text="Record Sale", command=handle_sale).pack(pady=10)
 
-    global sales_table
+    global sales_view, sales_table
     # Update the sales table to include Unit Price column
-    sales_table = ttk.Treeview(sales_tab, columns=("ID", "Part ID", "Quantity", "Unit Price", "Amount", "Date", "Payment Method"), show='headings')
+    sales_view = PagedTable(sales_tab, ("ID", "Part ID", "Quantity", "Unit Price", "Amount", "Date", "Payment Method"), SALES_TABLE)
+    sales_table = sales_view.tree
 
     # Define headings and optional column widths
     for col in sales_table["columns"]:
         sales_table.heading(col, text=col)
         sales_table.column(col, anchor='center', width=100)
 
-    sales_table.pack(pady=10, fill="both", expand=True)
+    sales_view.frame.pack(pady=10, fill="both", expand=True)
 
     refresh_sales_table()
 
@@ -1075,17 +1109,82 @@ def build_gui():
 
         ttk.Button(frm_ven, text="Add Vendor", command=lambda: add_vendor(ven_name.get(), ven_contact.get(), ven_parts.get())).grid(row=3, columnspan=2, pady=5)
 
+        # Parts supplied by the selected vendor
+        global vendor_parts_table
+        vendor_parts_table = ttk.Treeview(vendor_tab, columns=("Part ID", "Part Name", "Manufacturer", "Stock", "Unit Cost", "Lead Time (days)"), show='headings', height=8)
+        for col in vendor_parts_table["columns"]:
+            vendor_parts_table.heading(col, text=col)
+        vendor_parts_table.pack(pady=5, fill="both", expand=True)
+        vendor_table.bind("<<TreeviewSelect>>", lambda e: refresh_vendor_parts_table())
+
+        frm_link = ttk.Frame(vendor_tab)
+        frm_link.pack(pady=10)
+
+        link_part = ttk.Entry(frm_link)
+        link_cost = ttk.Entry(frm_link, width=10)
+        link_lead = ttk.Entry(frm_link, width=6)
+        for i, (lbl, ent) in enumerate(zip(["Part ID", "Unit Cost", "Lead Time (days)"], [link_part, link_cost, link_lead])):
+            ttk.Label(frm_link, text=lbl).grid(row=0, column=i * 2, padx=5)
+            ent.grid(row=0, column=i * 2 + 1, padx=5)
+
+        ttk.Button(frm_link, text="Link Part", command=lambda: link_vendor_part(link_part.get(), link_cost.get(), link_lead.get())).grid(row=1, column=0, columnspan=3, pady=5)
+        ttk.Button(frm_link, text="Unlink Part", command=unlink_vendor_part).grid(row=1, column=3, columnspan=3, pady=5)
+
         refresh_vendor_table()
+        # === PURCHASE ORDERS TAB (Admin only) ===
+        create_purchase_orders_tab(notebook)
+
         # === REPORTS TAB (Admin only) ===
         create_reports_tab(notebook)
 
+    # === ENGINE EVENTS ===
+    # The engine publishes change events; the tabs refresh themselves from them
+    def on_inventory_changed(payload):
+        if payload['action'] == 'import':
+            # One reload for the whole file instead of one row at a time
+            refresh_inventory_table()
+        else:
+            inventory_view.apply_changes(payload['part_ids'])
+        populate_part_dropdown()
+        if current_user['role'] == 'admin':
+            refresh_vendor_parts_table()
+
+    def on_sales_changed(payload):
+        sales_view.apply_changes(payload['sale_ids'])
+
+    def on_vendors_changed(payload):
+        if current_user['role'] == 'admin':
+            refresh_vendor_table()
+
+    def on_purchase_orders_changed(payload):
+        if current_user['role'] == 'admin':
+            refresh_purchase_order_table()
+
+    subscriptions = [
+        (events.INVENTORY_CHANGED, on_inventory_changed),
+        (events.SALES_CHANGED, on_sales_changed),
+        (events.VENDORS_CHANGED, on_vendors_changed),
+        (events.PURCHASE_ORDERS_CHANGED, on_purchase_orders_changed),
+    ]
+    for event, callback in subscriptions:
+        events.subscribe(event, callback)
+
     # === LOGOUT BUTTON (All users) ===
 
 # Handle logout function
     def handle_logout():
-        # Add audit log entry for logout
+        # Add audit log entry for logout and make sure the session's entries are written
         add_audit_log("LOGOUT", f"User logout: {current_user['username']}")
-        
+        aspas.flush_audit_log(FLUSH_TIMEOUT)
+
+        # Stop this window's widgets from receiving engine events
+        for event, callback in subscriptions:
+            events.unsubscribe(event, callback)
+
+        # Cancel report queries still running for this session
+        report_jobs.shutdown()
+        dispatcher.stop()
+
         root.destroy()
         login_screen()
 
@@ -1096,4 +1195,6 @@ def build_gui():
 
 if __name__ == '__main__':
     setup_database()
+    # Buffer audit entries and write them in batches off the UI thread
+    aspas.start_audit_sink()
     login_screen()
\ No newline at end of file